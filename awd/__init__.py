@@ -0,0 +1 @@
+"""Core compute helpers for the AWD Compliance Analysis Dashboard"""
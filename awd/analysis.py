@@ -0,0 +1,118 @@
+"""Background analysis job and the scheduled standard-report build"""
+import pandas as pd
+
+from awd import payments, profiling, sheets, snapshots, sql_store, summary_cube
+from awd.cleaning import clean_master_data, clean_water_data
+from awd.compliance import analyze_farm_compliance, analyze_weekly_compliance
+from awd.incremental import compute_farm_fingerprints, get_incremental_farm_table, order_by_master
+from awd.tables import create_pipe_summary_table
+
+def compute_by_village(compute_fn, job, phase, order_keys=None):
+    """Wrap a per-farm compute function to run village by village with progress and partial results"""
+    def compute(master_df, water_df, farm_pipe_mapping, start_date, end_date):
+        villages = master_df.groupby('Village', sort=False, dropna=False)
+        parts = []
+        for done, (village, village_master) in enumerate(villages):
+            job.check_cancelled()
+            job.progress(phase, done, villages.ngroups, f"{village} ({done + 1}/{villages.ngroups})")
+            village_water = water_df[water_df['Farm_ID'].isin(set(village_master['Farm_ID']))]
+            part = compute_fn(village_master, village_water, farm_pipe_mapping, start_date, end_date)
+            if part is None:
+                raise RuntimeError(f"{phase} failed for village {village}")
+            parts.append(part)
+            job.add_partial(phase, part)
+        job.progress(phase, villages.ngroups, villages.ngroups)
+        if not parts:
+            return pd.DataFrame()
+        return order_by_master(pd.concat(parts, ignore_index=True), master_df, order_keys)
+    return compute
+
+def run_analysis_job(job, master_df, water_df, farm_pipe_mapping, start_date, end_date, fingerprints, table_cache):
+    """Background job: farm results, then the weekly breakdown, both incremental and village by village"""
+    tables = {}
+    for table_name, compute_fn, order_keys in [('results', analyze_farm_compliance, None),
+                                               ('weekly', analyze_weekly_compliance, ['Week'])]:
+        tables[table_name] = get_incremental_farm_table(
+            table_name, compute_by_village(compute_fn, job, table_name, order_keys), master_df, water_df, farm_pipe_mapping,
+            start_date, end_date, fingerprints, order_keys=order_keys, cache=table_cache,
+            notify=lambda message: job.add_partial('log', message)
+        )
+        if tables[table_name] is None:
+            raise RuntimeError(f"{table_name} could not be computed")
+    return tables
+
+def run_profiled_analysis_job(job, master_df, water_df, farm_pipe_mapping, start_date, end_date, fingerprints,
+                              table_cache, profile_label='analysis'):
+    """run_analysis_job under profiling.profile_run; the saved profile's path is logged to the job"""
+    dataset = profiling.dataset_size(master_df, water_df, farm_pipe_mapping, start_date, end_date)
+    with profiling.profile_run(profile_label, dataset) as run:
+        tables = run_analysis_job(job, master_df, water_df, farm_pipe_mapping, start_date, end_date, fingerprints,
+                                  table_cache)
+    job.add_partial('log', f"🔬 Profile saved to {run['paths']['prof']} (with .collapsed stacks and .json metadata)")
+    return tables
+
+SNAPSHOT_FARM_TABLES = ['results', 'weekly', 'pipe_summary']
+
+def build_standard_reports(inputs):
+    """Scheduler build: the standard full-season outputs for every farm"""
+    master_df, water_df, farm_pipe_mapping = inputs['master_df'], inputs['water_df'], inputs['farm_pipe_mapping']
+    start_date, end_date = inputs['start_date'], inputs['end_date']
+    tables = {'farm_fingerprints': compute_farm_fingerprints(master_df, water_df)}
+    for table_name, compute_fn in [('results', analyze_farm_compliance),
+                                   ('weekly', analyze_weekly_compliance),
+                                   ('pipe_summary', create_pipe_summary_table)]:
+        tables[table_name] = compute_fn(master_df, water_df, farm_pipe_mapping, start_date, end_date)
+        if tables[table_name] is None:
+            raise RuntimeError(f"{table_name} could not be computed")
+    cube = summary_cube.build_summary_cube(tables['results'], tables['weekly'])
+    tables['village_summary'] = summary_cube.village_summary(cube)
+    tables['group_summary'] = summary_cube.group_summary(cube)
+    tables['payment_summary'] = payments.payment_summary(tables['results'])
+    return tables, {'farms': len(master_df), 'readings': len(water_df)}
+
+def refresh_standard_inputs(master_cache, master_cache_key, credentials_dict, sheet_url, worksheet_name, use_arrow,
+                            db_path, water_dataset_id):
+    """Scheduler refresh: re-pull the master sheet into the shared cache and re-clean the stored readings with it
+
+    Returns (report_key, inputs) for the standard full-season report, or
+    None when the sheet or the readings cannot be loaded.
+    """
+    def load_master():
+        cleaned_master, cleaned_mapping = clean_master_data(
+            sheets.read_sheet(credentials_dict, sheet_url, worksheet_name), use_arrow)
+        if cleaned_master is None or cleaned_mapping is None:
+            return None
+        return cleaned_master, cleaned_mapping
+
+    master_cache.invalidate(master_cache_key)
+    master_entry = master_cache.get_or_load(master_cache_key, load_master)
+    if master_entry is None:
+        return None
+    master_df, farm_pipe_mapping = master_entry['master_df'], master_entry['farm_pipe_mapping']
+    master_entry['dataset_id'] = sql_store.save_master(db_path, master_df)
+
+    water_df, _ = clean_water_data(sql_store.load_readings(db_path, water_dataset_id), farm_pipe_mapping, use_arrow)
+    if water_df is None or water_df.empty:
+        return None
+    start_date, end_date = water_df['Date'].min().date(), water_df['Date'].max().date()
+    inputs = {'master_df': master_df, 'water_df': water_df, 'farm_pipe_mapping': farm_pipe_mapping,
+              'start_date': start_date, 'end_date': end_date}
+    key = snapshots.report_key(master_entry['dataset_id'], sql_store.save_readings(db_path, water_df),
+                               start_date, end_date)
+    return key, inputs
+
+def seed_table_cache_from_snapshot(table_cache, snapshot, start_date, end_date):
+    """Prime this session's farm table cache from a snapshot so the next job only computes changed farms"""
+    tables = snapshot['tables']
+    for table_name in SNAPSHOT_FARM_TABLES:
+        cached = table_cache.get(table_name)
+        if cached is not None and cached['date_range'] == (start_date, end_date):
+            continue
+        table_cache[table_name] = {
+            'generation': cached['generation'] + 1 if cached else 1,
+            'date_range': (start_date, end_date),
+            'fingerprints': tables['farm_fingerprints'],
+            'table': tables[table_name],
+            'changed_farms': set(tables['farm_fingerprints'].index),
+            'removed_farms': set()
+        }
@@ -0,0 +1,65 @@
+"""Optional Apache Arrow backed dtypes for the cleaned data frames"""
+import io
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    ARROW_AVAILABLE = True
+except ImportError:  # pragma: no cover - pyarrow ships with streamlit
+    pa = None
+    pq = None
+    ARROW_AVAILABLE = False
+
+def string_dtype():
+    """Arrow-backed UTF-8 string dtype"""
+    return pd.ArrowDtype(pa.string())
+
+def timestamp_dtype():
+    """Arrow-backed timezone-naive nanosecond timestamp dtype"""
+    return pd.ArrowDtype(pa.timestamp('ns'))
+
+def to_string_column(series, use_arrow=False, strip=False):
+    """Stringify a column the way the cleaners always have, optionally into Arrow strings
+
+    Arrow columns keep missing cells as <NA>. Text columns are cast straight
+    to Arrow strings; only numeric or mixed columns go through str() (so 101.0
+    still reads '101.0'), and then only their non-missing values.
+    """
+    if not use_arrow:
+        values = series.astype(str)
+    elif pd.api.types.infer_dtype(series, skipna=True) in ('string', 'empty'):
+        values = series.astype(string_dtype())
+    else:
+        values = series.astype(str).where(series.notna()).astype(string_dtype())
+    if strip:
+        values = values.str.strip()
+    return values
+
+def to_timestamp_column(series, use_arrow=False):
+    """Parse dates leniently (unparseable values become missing), optionally into Arrow timestamps"""
+    parsed = pd.to_datetime(series, errors='coerce')
+    if use_arrow:
+        parsed = parsed.astype(timestamp_dtype())
+    return parsed
+
+def to_numpy_datetimes(series):
+    """Plain datetime64[ns] view of a date column for numpy-level arithmetic"""
+    if isinstance(series.dtype, pd.ArrowDtype):
+        return series.astype('datetime64[ns]')
+    return series
+
+def is_arrow_backed(df):
+    """True when any column of the frame uses an Arrow dtype"""
+    return any(isinstance(dtype, pd.ArrowDtype) for dtype in df.dtypes)
+
+def to_arrow_table(df):
+    """Convert a frame to a pyarrow Table; Arrow-backed columns are passed through without copying"""
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+def to_parquet_bytes(df):
+    """Serialize a frame to Parquet bytes for downloads and on-disk caches"""
+    buffer = io.BytesIO()
+    pq.write_table(to_arrow_table(df), buffer)
+    return buffer.getvalue()
@@ -0,0 +1,85 @@
+"""Per-pipe water-level charts: LTTB downsampling and WebGL plotly traces
+
+plotly is imported on first use so pages without charts do not pay for it.
+"""
+import importlib.util
+
+import numpy as np
+
+from awd import timeseries
+
+PLOTLY_AVAILABLE = importlib.util.find_spec('plotly') is not None
+
+DEFAULT_MAX_POINTS = 20000  # points sent to the browser per chart
+MIN_POINTS_PER_SERIES = 3
+MAX_SEPARATE_TRACES = 30  # beyond this, pipes share one trace split by gaps
+
+def lttb_indices(x, y, threshold):
+    """Largest-Triangle-Three-Buckets: indices of at most threshold points preserving the visual shape
+
+    x must be increasing. First and last points are always kept.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    bucket_edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = bucket_edges[bucket], bucket_edges[bucket + 1]
+        # Average of the next bucket is the third triangle vertex
+        next_start, next_end = end, bucket_edges[bucket + 2] if bucket + 2 < len(bucket_edges) else n
+        next_x = x[next_start:next_end].mean()
+        next_y = y[next_start:next_end].mean()
+        areas = np.abs((x[previous] - next_x) * (y[start:end] - y[previous]) -
+                       (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected
+
+def level_figure(store, series, labels, title, max_points=DEFAULT_MAX_POINTS):
+    """WebGL line chart of the given reading-store series with the 100 mm / 200 mm bands
+
+    Returns (figure, points_plotted, points_total).
+    """
+    import plotly.graph_objects as go
+
+    dates = timeseries.reading_dates(store)
+    levels_mm = store['level'] / timeseries.LEVEL_SCALE
+    offsets = store['offsets']
+    per_series = max(MIN_POINTS_PER_SERIES, max_points // max(len(series), 1))
+
+    figure = go.Figure()
+    shared_x, shared_y, shared_text = [], [], []
+    points_plotted = points_total = 0
+    for series_index, label in zip(series, labels):
+        start, end = offsets[series_index], offsets[series_index + 1]
+        x, y = dates[start:end], levels_mm[start:end]
+        keep = lttb_indices(x.astype('datetime64[D]').astype(np.int64), y, per_series)
+        points_plotted += len(keep)
+        points_total += end - start
+        if len(series) <= MAX_SEPARATE_TRACES:
+            figure.add_trace(go.Scattergl(x=x[keep], y=y[keep], mode='lines+markers', name=label,
+                                          hovertemplate=f"{label}<br>%{{x|%d/%m/%Y}}: %{{y}} mm<extra></extra>"))
+        else:
+            # None breaks the line between pipes inside the single shared trace
+            shared_x.extend(list(x[keep]) + [None])
+            shared_y.extend(list(y[keep]) + [None])
+            shared_text.extend([label] * len(keep) + [None])
+    if shared_x:
+        figure.add_trace(go.Scattergl(x=shared_x, y=shared_y, text=shared_text, mode='lines+markers',
+                                      name=f"{len(series)} pipes", marker={'size': 4}, line={'width': 1},
+                                      hovertemplate="%{text}<br>%{x|%d/%m/%Y}: %{y} mm<extra></extra>"))
+
+    figure.add_hrect(y0=0, y1=100, fillcolor='green', opacity=0.08, line_width=0)
+    figure.add_hrect(y0=100, y1=200, fillcolor='gold', opacity=0.08, line_width=0)
+    figure.add_hline(y=200, line_dash='dash', line_color='red', annotation_text='200 mm (max)')
+    figure.add_hline(y=100, line_dash='dash', line_color='green', annotation_text='100 mm (≥1 reading at or below)')
+    figure.update_layout(title=title, height=450, xaxis_title='Date', yaxis_title='Water level (mm)',
+                         hovermode='closest', margin={'t': 50, 'b': 40})
+    return figure, points_plotted, points_total
@@ -0,0 +1,380 @@
+"""Loading and cleaning of the master sheet and water readings, with reading-level screening"""
+import numpy as np
+import pandas as pd
+
+from awd import arrow, instrumentation, payments
+from awd.data_quality import LEVEL_MIN_MM, LEVEL_MAX_MM
+from awd.reporting import LOG
+
+# Per-pipe robust outlier test: |reading - median| > threshold * scaled MAD
+OUTLIER_MAD_THRESHOLD = 3.5
+OUTLIER_MIN_READINGS = 5
+MAD_SCALE = 1.4826
+
+REJECTION_REASONS = ['out_of_range', 'exact_duplicate', 'near_duplicate', 'statistical_outlier']
+
+def screen_water_readings(df, reject_outliers=False, reject_near_duplicates=False):
+    """Drop implausible and duplicate readings; return (kept_df, rejection_report)
+
+    Exact duplicates share Pipe_ID, Date and level and are always dropped.
+    Near duplicates are further readings of the same pipe on the same
+    calendar day with a different level; readings are date-only, so neither
+    can be preferred and both count towards compliance. They are only
+    flagged unless reject_near_duplicates is set (the earliest in file order
+    is then kept). Statistical outliers are likewise only flagged unless
+    reject_outliers is set, since a genuine flood or dry spell can look like
+    an outlier for a short series.
+    """
+    with instrumentation.timed('water_cleaning.screen'):
+        # Stable sort by date so "first" below always means the earliest reading
+        df = df.sort_values('Date', kind='stable')
+        reason = pd.Series(None, index=df.index, dtype=object)
+
+        level = df['Water_Level_mm']
+        reason[(level < LEVEL_MIN_MM) | (level > LEVEL_MAX_MM)] = 'out_of_range'
+
+        # Hash-based duplicate detection over the readings still in play
+        in_play = reason.isna()
+        exact = df[in_play].duplicated(subset=['Pipe_ID', 'Date', 'Water_Level_mm'], keep='first')
+        reason[exact[exact].index] = 'exact_duplicate'
+
+        in_play = reason.isna()
+        reading_day = df.loc[in_play, 'Date'].dt.normalize()
+        near = pd.DataFrame({'Pipe_ID': df.loc[in_play, 'Pipe_ID'], 'Day': reading_day}).duplicated(keep='first')
+        reason[near[near].index] = 'near_duplicate'
+
+        # Robust z-score per pipe using grouped median / MAD over the readings that are kept
+        in_play = reason.isna() | ((reason == 'near_duplicate') & (not reject_near_duplicates))
+        remaining = df.loc[in_play, ['Pipe_ID', 'Water_Level_mm']]
+        by_pipe = remaining.groupby('Pipe_ID', sort=False)['Water_Level_mm']
+        median = by_pipe.transform('median')
+        abs_dev = (remaining['Water_Level_mm'] - median).abs()
+        mad = abs_dev.groupby(remaining['Pipe_ID'], sort=False).transform('median') * MAD_SCALE
+        count = by_pipe.transform('size')
+        outlier = (count >= OUTLIER_MIN_READINGS) & (mad > 0) & (abs_dev > OUTLIER_MAD_THRESHOLD * mad)
+        reason[outlier[outlier].index] = 'statistical_outlier'
+
+        rejected = reason.isin(['out_of_range', 'exact_duplicate'])
+        rejected |= (reason == 'near_duplicate') & reject_near_duplicates
+        rejected |= (reason == 'statistical_outlier') & reject_outliers
+
+        report_cols = [col for col in ['Date', 'Farm_ID', 'Pipe_ID', 'Water_Level_mm', 'Surveyor'] if col in df.columns]
+        report = df.loc[reason.notna(), report_cols].copy()
+        report['Reason'] = reason[reason.notna()]
+        report['Action'] = np.where(rejected[reason.notna()], 'rejected', 'flagged')
+        report = report.sort_index()
+
+    counts = report['Reason'].value_counts()
+    instrumentation.record('water_cleaning.rows_screened', len(df))
+    instrumentation.record('water_cleaning.rows_rejected', int(rejected.sum()))
+    for name in REJECTION_REASONS:
+        instrumentation.record(f'water_cleaning.{name}', int(counts.get(name, 0)))
+
+    return df[~rejected].sort_index(), report
+
+def process_uploaded_file(uploaded_file, file_type, report=LOG):
+    """Process uploaded files with error handling"""
+    try:
+        if uploaded_file.name.endswith('.xlsx'):
+            if file_type == 'master':
+                df = pd.read_excel(uploaded_file, sheet_name=0)
+            else:
+                df = pd.read_excel(uploaded_file)
+        else:
+            df = pd.read_csv(uploaded_file)
+        
+        report.success(f"1 File loaded successfully: {len(df)} rows")
+        return df
+    except Exception as e:
+        report.error(f"0 Error loading file: {str(e)}")
+        return None
+
+def find_column(df, keywords, default_name=None):
+    """Find column based on keywords with fallback"""
+    cols = [col for col in df.columns if any(kw.lower() in col.lower() for kw in keywords)]
+    if cols:
+        return cols[0]
+    return default_name
+
+def is_positive_value(value):
+    """Check if a value represents a positive/yes value (1, Y, Yes, etc.)"""
+    if pd.isna(value):
+        return False
+    
+    # Convert to string and clean
+    str_val = str(value).strip().upper()
+    
+    # Check for empty or null-like values - UPDATED: Empty cells = 0
+    if str_val in ['', '0', '0.0', 'NO', 'N', 'FALSE', 'F', 'NAN', 'NA', 'NONE']:
+        return False
+    
+    # Check for positive values
+    if str_val in ['1', '1.0', 'YES', 'Y', 'TRUE', 'T', 'X']:
+        return True
+    
+    return False
+
+def extract_pipe_codes(row):
+    """Extract pipe codes for a farm from the master data"""
+    pipe_codes = []
+    for i in range(1, 6):  # Pipes 1-5
+        pipe_col = f'Kharif 25 PVC Pipe code - {i}'
+        if pipe_col in row.index and pd.notna(row[pipe_col]):
+            pipe_code = str(row[pipe_col]).strip()
+            if pipe_code and pipe_code != '' and pipe_code.lower() != 'nan':
+                pipe_codes.append(pipe_code)
+    return pipe_codes
+
+def clean_master_data(df, use_arrow=False, report=LOG):
+    """Enhanced cleaning for master data with pipe mapping (optionally on Arrow-backed dtypes)"""
+    try:
+        df_clean = df.copy()
+        
+        # Find basic columns using exact names
+        farm_id_col = 'Kharif 25 Farm ID'
+        farmer_name_col = 'Kharif 25 Farmer Name'
+        village_col = 'Kharif 25 Village'
+        incentive_acres_col = 'Kharif 25 - AWD Study - acres for incentive'
+        awd_study_col = 'Kharif 25 - AWD Study (Y/N)'
+        
+        # Group A columns
+        group_a_col = 'Kharif 25 - AWD Study - Group A - Treatment (Y/N)'
+        group_a_complied_col = 'Kharif 25 - AWD Study - Group A - Treatment - complied (Y/N)'
+        group_a_non_complied_col = 'Kharif 25 - AWD Study - Group A - Treatment - Non-complied (Y/N)'
+        
+        # Group B columns
+        group_b_col = 'Kharif 25 - AWD Study - Group B -training only (Y/N)'
+        group_b_complied_col = 'Kharif 25 - AWD Study - Group B - Complied (Y/N)'
+        group_b_non_complied_col = 'Kharif 25 - AWD Study - Group B - Non-complied (Y/N)'
+        
+        # Group C columns
+        group_c_col = 'Kharif 25 - AWD Study - Group C - Control (Y/N)'
+        group_c_complied_col = 'Kharif 25 - AWD Study - Group C - Complied (Y/N)'
+        group_c_non_complied_col = 'Kharif 25 - AWD Study - Group C - non-complied (Y/N)'
+        
+        # Pipe code columns
+        pipe_code_cols = [f'Kharif 25 PVC Pipe code - {i}' for i in range(1, 6)]
+        
+        # Check if required columns exist
+        missing_cols = []
+        all_required_cols = [
+            farm_id_col, farmer_name_col, village_col, incentive_acres_col, awd_study_col,
+            group_a_col, group_a_complied_col, group_a_non_complied_col,
+            group_b_col, group_b_complied_col, group_b_non_complied_col,
+            group_c_col, group_c_complied_col, group_c_non_complied_col
+        ] + pipe_code_cols
+        
+        for col in all_required_cols:
+            if col not in df_clean.columns:
+                missing_cols.append(col)
+        
+        if missing_cols:
+            report.error(f"0 Missing required columns: {missing_cols}")
+            report.info("Available columns: " + ", ".join(df_clean.columns.tolist()))
+            return None, None
+        
+        # Standardize basic columns
+        df_clean['Farm_ID'] = arrow.to_string_column(df_clean[farm_id_col], use_arrow).fillna("Unknown_Farm")
+        df_clean['Farmer_Name'] = arrow.to_string_column(df_clean[farmer_name_col], use_arrow).fillna("Unknown_Farmer")
+        df_clean['Village'] = arrow.to_string_column(df_clean[village_col], use_arrow).fillna("Unknown_Village")
+        
+        # Handle incentive acres
+        df_clean['Incentive_Acres'] = pd.to_numeric(df_clean[incentive_acres_col], errors='coerce').fillna(0).clip(lower=0)
+        
+        # Filter by AWD Study participation
+        df_clean['awd_study_flag'] = df_clean[awd_study_col].apply(is_positive_value)
+        initial_count = len(df_clean)
+        df_clean = df_clean[df_clean['awd_study_flag'] == True].copy()
+        filtered_count = len(df_clean)
+        
+        if df_clean.empty:
+            report.warning("⚠️ No AWD study participants found after filtering")
+            return None, None
+        
+        report.info(f"📊 Filtered to {filtered_count} AWD study participants from {initial_count} total farms")
+        
+        # Assign groups with 6-group logic
+        def assign_group_with_compliance(row):
+            # Check Group A first
+            if is_positive_value(row[group_a_col]):
+                if is_positive_value(row[group_a_complied_col]):
+                    return 'A Complied'
+                elif is_positive_value(row[group_a_non_complied_col]):
+                    return 'A Non Complied'
+                else:
+                    return 'A Unassigned'
+            
+            # Check Group B 
+            elif is_positive_value(row[group_b_col]):
+                if is_positive_value(row[group_b_complied_col]):
+                    return 'B Complied'
+                elif is_positive_value(row[group_b_non_complied_col]):
+                    return 'B Non Complied'
+                else:
+                    return 'B Unassigned'
+            
+            # Check Group C
+            elif is_positive_value(row[group_c_col]):
+                if is_positive_value(row[group_c_complied_col]):
+                    return 'C Complied'
+                elif is_positive_value(row[group_c_non_complied_col]):
+                    return 'C Non Complied'
+                else:
+                    return 'C Unassigned'
+            
+            else:
+                return 'No Group Assigned'
+        
+        df_clean['Group'] = df_clean.apply(assign_group_with_compliance, axis=1)
+        if use_arrow:
+            df_clean['Group'] = df_clean['Group'].astype(arrow.string_dtype())
+        
+        # Filter out unassigned groups
+        before_filter = len(df_clean)
+        df_clean = df_clean[~df_clean['Group'].isin(['A Unassigned', 'B Unassigned', 'C Unassigned', 'No Group Assigned'])].copy()
+        after_filter = len(df_clean)
+        
+        report.info(f"📊 Removed {before_filter - after_filter} farms with unassigned groups")
+        
+        if df_clean.empty:
+            report.warning("⚠️ No farms remaining after removing unassigned groups")
+            return None, None
+        
+        # Payment eligibility and incentive calculation
+        df_clean['Payment_Eligible'] = df_clean['Group'] == payments.PAYMENT_ELIGIBLE_GROUP
+        df_clean['Incentive_To_Give'] = df_clean['Payment_Eligible'].astype(int)
+        
+        # Extract pipe codes for each farm
+        df_clean['Pipe_Codes'] = df_clean.apply(extract_pipe_codes, axis=1)
+        df_clean['Pipe_Count'] = df_clean['Pipe_Codes'].apply(len)
+        
+        # Create farm-pipe mapping
+        farm_pipe_mapping = {}
+        all_pipe_codes = set()
+        
+        for _, row in df_clean.iterrows():
+            farm_id = row['Farm_ID']
+            pipe_codes = row['Pipe_Codes']
+            farm_pipe_mapping[farm_id] = pipe_codes
+            all_pipe_codes.update(pipe_codes)
+        
+        # Show group distribution and pipe statistics
+        group_counts = df_clean['Group'].value_counts()
+        payment_eligible_count = df_clean['Payment_Eligible'].sum()
+        
+        report.success(f"1 Final Group Distribution: {group_counts.to_dict()}")
+        report.success(f"1 Payment Eligible Farms (A Complied): {payment_eligible_count} farms")
+        report.success(f"1 Total Unique Pipe Codes Found: {len(all_pipe_codes)} pipes")
+        report.success(f"1 Farms with Pipes: {len(df_clean[df_clean['Pipe_Count'] > 0])} farms")
+        
+        # Prepare final dataframe
+        final_df = df_clean[['Farm_ID', 'Farmer_Name', 'Village', 'Incentive_Acres', 'Group', 
+                           'Payment_Eligible', 'Incentive_To_Give', 'Pipe_Codes', 'Pipe_Count']].copy()
+        
+        # Remove farms with no valid Farm_ID
+        final_df = final_df.dropna(subset=['Farm_ID'])
+        final_df = final_df[final_df['Farm_ID'] != 'Unknown_Farm']
+        
+        report.success(f"1 Final clean data: {len(final_df)} farms ready for analysis")
+        
+        return final_df, farm_pipe_mapping
+        
+    except Exception as e:
+        report.error(f"0 Error cleaning master data: {str(e)}")
+        report.exception(e)
+        return None, None
+
+def clean_water_data(df, farm_pipe_mapping, use_arrow=False, report=LOG):
+    """Enhanced cleaning for water data with pipe mapping validation (optionally on Arrow-backed dtypes)"""
+    try:
+        df_clean = df.copy()
+        
+        # Find columns
+        date_col = find_column(df_clean, ['date'], 'Date')
+        pipe_id_col = find_column(df_clean, ['pipe id', 'pipe_id', 'pipe code', 'pipeid'], 'Pipe_ID')
+        water_col = find_column(df_clean, ['water level', 'water_level', 'depth'], 'Water_Level_mm')
+        surveyor_col = find_column(df_clean, ['surveyor', 'enumerator', 'collected by', 'submitted by'])
+        
+        if not all([date_col, pipe_id_col, water_col]):
+            report.error(f"0 Missing essential columns in water data. Found: Date={date_col}, Pipe_ID={pipe_id_col}, Water_Level={water_col}")
+            return None, None
+        
+        # Standardize column names
+        df_clean['Date'] = arrow.to_timestamp_column(df_clean[date_col], use_arrow)
+        df_clean['Pipe_ID'] = arrow.to_string_column(df_clean[pipe_id_col], use_arrow, strip=True)
+        df_clean['Water_Level_mm'] = pd.to_numeric(df_clean[water_col], errors='coerce')
+        if surveyor_col:
+            df_clean['Surveyor'] = arrow.to_string_column(df_clean[surveyor_col], use_arrow, strip=True)
+        
+        # Drop rows with missing essential data
+        initial_count = len(df_clean)
+        df_clean = df_clean.dropna(subset=['Date', 'Pipe_ID', 'Water_Level_mm'])
+        after_drop = len(df_clean)
+        
+        if after_drop < initial_count:
+            report.info(f"📊 Removed {initial_count - after_drop} rows with missing data")
+        
+        # Get all valid pipe codes from master data
+        all_valid_pipes = set()
+        for pipe_codes in farm_pipe_mapping.values():
+            all_valid_pipes.update(pipe_codes)
+        
+        # Filter water data to only include pipes from master data
+        before_filter = len(df_clean)
+        df_clean = df_clean[df_clean['Pipe_ID'].isin(all_valid_pipes)].copy()
+        after_filter = len(df_clean)
+        
+        # Add Farm_ID based on pipe mapping (a pipe listed by several farms goes to the first one)
+        pipe_to_farm = {}
+        for farm_id, pipe_codes in farm_pipe_mapping.items():
+            for pipe_id in pipe_codes:
+                pipe_to_farm.setdefault(pipe_id, farm_id)
+        
+        df_clean['Farm_ID'] = df_clean['Pipe_ID'].map(pipe_to_farm)
+        
+        # Remove readings for pipes not mapped to any farm
+        df_clean = df_clean.dropna(subset=['Farm_ID'])
+        if use_arrow:
+            df_clean['Farm_ID'] = df_clean['Farm_ID'].astype(arrow.string_dtype())
+        mapped_count = len(df_clean)
+        
+        # Reject out-of-range and duplicate readings before they reach the compliance checks
+        df_clean, rejection_report = screen_water_readings(df_clean)
+        final_count = len(df_clean)
+        
+        report.info(f"📊 Water data filtering results:")
+        report.info(f"   - Total valid pipes in master: {len(all_valid_pipes)}")
+        report.info(f"   - Before pipe filtering: {before_filter} readings")
+        report.info(f"   - After pipe filtering: {after_filter} readings")
+        report.info(f"   - Mapped readings: {mapped_count} readings")
+        
+        rejection_counts = rejection_report.loc[rejection_report['Action'] == 'rejected', 'Reason'].value_counts()
+        for reason, count in rejection_counts.items():
+            report.info(f"   - Rejected ({reason.replace('_', ' ')}): {count} readings")
+        flagged_counts = rejection_report.loc[rejection_report['Action'] == 'flagged', 'Reason'].value_counts()
+        for reason, count in flagged_counts.items():
+            report.info(f"   - Flagged ({reason.replace('_', ' ')}, kept): {count} readings")
+        report.info(f"   - Final clean readings: {final_count} readings")
+        
+        if df_clean.empty:
+            report.warning("⚠️ No water data matches the pipes from master data")
+            return None, None
+        
+        # Show pipe coverage statistics
+        unique_pipes_in_water = df_clean['Pipe_ID'].nunique()
+        unique_farms_in_water = df_clean['Farm_ID'].nunique()
+        
+        report.success(f"1 Water data summary:")
+        report.success(f"   - Unique pipes with data: {unique_pipes_in_water}")
+        report.success(f"   - Unique farms with data: {unique_farms_in_water}")
+        report.success(f"   - Date range: {df_clean['Date'].min().date()} to {df_clean['Date'].max().date()}")
+        
+        output_cols = ['Date', 'Farm_ID', 'Pipe_ID', 'Water_Level_mm']
+        if surveyor_col:
+            output_cols.append('Surveyor')
+        return df_clean[output_cols], rejection_report
+        
+    except Exception as e:
+        report.error(f"0 Error cleaning water data: {str(e)}")
+        report.exception(e)
+        return None, None
@@ -0,0 +1,342 @@
+"""Pipe, farm and weekly compliance analysis over the cleaned master and water data"""
+from datetime import timedelta
+
+import pandas as pd
+
+from awd import payments, pipe_masks
+from awd.reporting import LOG
+
+def get_week_number_dynamic(date, start_date):
+    """Get week number based on dynamic start date (day 1)"""
+    days_diff = (date.date() - start_date).days
+    week_number = (days_diff // 7) + 1
+    return max(1, week_number)
+
+def analyze_pipe_compliance(pipe_data):
+    """Check if a pipe meets compliance criteria (UPDATED: Single reading ≤200 is compliant)"""
+    if len(pipe_data) == 0:
+        return {'compliant': False, 'reason': 'No readings available'}
+    
+    # Sort readings by date
+    pipe_data = pipe_data.sort_values('Date')
+    
+    # Get all readings for compliance check
+    readings = pipe_data['Water_Level_mm'].tolist()
+    
+    # Special case: Single reading ≤200mm = compliant
+    if len(pipe_data) == 1:
+        single_reading = readings[0]
+        if single_reading <= 200:
+            return {
+                'compliant': True,
+                'reason': 'Single reading ≤200mm (compliant)'
+            }
+        else:
+            return {
+                'compliant': False,
+                'reason': 'Single reading >200mm (non-compliant)'
+            }
+    
+    # Multiple readings (≥2): All ≤200mm + at least one ≤100mm
+    if len(pipe_data) >= 2:
+        # Compliance checks (NO GAP CONSTRAINT)
+        both_below_200 = all(reading <= 200 for reading in readings)
+        one_below_100 = any(reading <= 100 for reading in readings)
+        
+        compliant = both_below_200 and one_below_100
+        
+        if compliant:
+            return {
+                'compliant': True,
+                'reason': 'All criteria met'
+            }
+        else:
+            failed_criteria = []
+            if not both_below_200:
+                failed_criteria.append('All readings must be ≤200mm')
+            if not one_below_100:
+                failed_criteria.append('At least one reading must be ≤100mm')
+            
+            return {
+                'compliant': False,
+                'reason': '; '.join(failed_criteria)
+            }
+    
+    # This should never be reached
+    return {'compliant': False, 'reason': 'Unknown error'}
+
+def validate_compliance_logic():
+    """Test function to validate that compliance logic is working correctly"""
+    test_results = []
+    
+    # Test 1: Single reading ≤200mm should be compliant
+    test_data_1 = pd.DataFrame({
+        'Date': [pd.Timestamp('2025-01-01')],
+        'Water_Level_mm': [150]
+    })
+    result_1 = analyze_pipe_compliance(test_data_1)
+    test_results.append(f"Test 1 - Single reading 150mm: {'1 PASS' if result_1['compliant'] else '0 FAIL'}")
+    
+    # Test 2: Single reading >200mm should be non-compliant
+    test_data_2 = pd.DataFrame({
+        'Date': [pd.Timestamp('2025-01-01')],
+        'Water_Level_mm': [250]
+    })
+    result_2 = analyze_pipe_compliance(test_data_2)
+    test_results.append(f"Test 2 - Single reading 250mm: {'0 FAIL (Expected)' if not result_2['compliant'] else '1 UNEXPECTED PASS'}")
+    
+    # Test 3: Multiple readings, all ≤200mm with one ≤100mm should be compliant
+    test_data_3 = pd.DataFrame({
+        'Date': [pd.Timestamp('2025-01-01'), pd.Timestamp('2025-01-02')],
+        'Water_Level_mm': [80, 150]
+    })
+    result_3 = analyze_pipe_compliance(test_data_3)
+    test_results.append(f"Test 3 - Multiple readings [80, 150]: {'1 PASS' if result_3['compliant'] else '0 FAIL'}")
+
+    # Test 4: Multiple readings, all ≤200mm but none ≤100mm should be non-compliant
+    test_data_4 = pd.DataFrame({
+        'Date': [pd.Timestamp('2025-01-01'), pd.Timestamp('2025-01-02')],
+        'Water_Level_mm': [150, 180]
+    })
+    result_4 = analyze_pipe_compliance(test_data_4)
+    test_results.append(f"Test 4 - Multiple readings [150, 180]: {'0 FAIL (Expected)' if not result_4['compliant'] else '1 UNEXPECTED PASS'}")
+
+    return test_results
+
+def analyze_farm_compliance(master_df, water_df, farm_pipe_mapping, start_date, end_date, report=LOG):
+    """Analyze compliance for each farm using ONLY pipes with ≥2 readings as denominator (FIXED)"""
+    try:
+        results = []
+        payment_eligible = []
+        
+        # Filter water data to date range
+        water_df_filtered = water_df[
+            (water_df['Date'].dt.date >= start_date) & 
+            (water_df['Date'].dt.date <= end_date)
+        ].copy()
+        
+        for _, farm_data in master_df.iterrows():
+            farm_id = farm_data['Farm_ID']
+            farm_pipe_codes = farm_data['Pipe_Codes']
+            payment_eligible.append(farm_data['Payment_Eligible'])
+            
+            # Get water data for this farm in the date range
+            farm_water_data = water_df_filtered[water_df_filtered['Farm_ID'] == farm_id].copy()
+            
+            # Initialize counters
+            valid_pipes = 0      # Pipes with ≥1 readings (VALID PIPE DEFINITION)
+            pipes_passing = 0     # Pipes meeting compliance criteria
+            compliant_pipe_ids = []
+            non_compliant_pipe_ids = []
+            pipe_readings_details = []
+            data_mask = compliant_mask = single_mask = 0  # One bit per assigned pipe
+            
+            # Analyze each pipe assigned to this farm
+            for pipe_index, pipe_id in enumerate(farm_pipe_codes):
+                pipe_data = farm_water_data[farm_water_data['Pipe_ID'] == pipe_id]
+                pipe_bit = pipe_masks.pipe_bit(pipe_index)
+                
+                # PIPE VALIDITY: ≥1 reading makes a pipe valid
+                if len(pipe_data) >= 1:  
+                    valid_pipes += 1  # Count as valid pipe
+                    data_mask |= pipe_bit
+                    if len(pipe_data) == 1:
+                        single_mask |= pipe_bit
+                    compliance_result = analyze_pipe_compliance(pipe_data)
+                    
+                    # Format readings for output
+                    readings_str = ", ".join([
+                        f"({row['Date'].strftime('%d/%m')}, {int(row['Water_Level_mm'])}mm)" 
+                        for _, row in pipe_data.sort_values('Date').iterrows()
+                    ])
+                    
+                    # Add compliance result to the details
+                    if len(pipe_data) == 1:
+                        pipe_readings_details.append(f"{pipe_id}: {readings_str} - Single reading")
+                    else:
+                        pipe_readings_details.append(f"{pipe_id}: {readings_str}")
+                    
+                    # COMPLIANCE CHECK: Apply the compliance rules
+                    if compliance_result['compliant']:
+                        pipes_passing += 1
+                        compliant_mask |= pipe_bit
+                        compliant_pipe_ids.append(pipe_id)
+                    else:
+                        non_compliant_pipe_ids.append(pipe_id)
+                else:
+                    # Pipe has no readings - not valid
+                    pipe_readings_details.append(f"{pipe_id}: No readings in period")
+            
+            # FARM COMPLIANCE CALCULATION: Use valid pipes (≥1 readings) as denominator
+            if valid_pipes > 0:
+                proportion_passing = pipes_passing / valid_pipes  
+            else:
+                proportion_passing = 0  # No valid pipes → 0% compliance
+            
+            # FARM VALIDITY: Farm is valid if it has ≥1 pipe with ≥1 readings
+            is_valid_farm = valid_pipes > 0
+            
+            results.append({
+                'Village': farm_data['Village'],
+                'Farm_ID': farm_id,
+                'Farmer_Name': farm_data['Farmer_Name'],
+                'Group': farm_data['Group'],
+                'Valid_Farm': '1' if is_valid_farm else '0',  # NEW: Valid farm indicator
+                'Total_Incentive_Acres': farm_data['Incentive_Acres'],
+                'All_Pipe_IDs': ', '.join(farm_pipe_codes) if farm_pipe_codes else 'None',
+                'Total_Assigned_Pipes': len(farm_pipe_codes),  # NEW: Total assigned
+                'Valid_Pipes_Count': valid_pipes,  # UPDATED: Pipes with ≥1 readings
+                'Pipes_Passing': pipes_passing,
+                'Pipes_Read': '\n'.join(pipe_readings_details),
+                'Compliant_Pipe_IDs': ', '.join(compliant_pipe_ids) if compliant_pipe_ids else 'None',
+                'Non_Compliant_Pipe_IDs': ', '.join(non_compliant_pipe_ids) if non_compliant_pipe_ids else 'None',
+                'Farm_Proportion_Passing': proportion_passing,  # UPDATED: Now based on pipes with ≥1 readings
+                pipe_masks.DATA_MASK: data_mask,
+                pipe_masks.COMPLIANT_MASK: compliant_mask,
+                pipe_masks.SINGLE_MASK: single_mask
+            })
+        
+        results_df = pd.DataFrame(results)
+        if results_df.empty:
+            return results_df
+        results_df = results_df.astype({column: pipe_masks.MASK_DTYPE for column in pipe_masks.PIPE_MASK_COLUMNS})
+        
+        # Eligible acres and payment for every farm in one vectorized step
+        results_df['Eligible_Acres'], results_df['Final_Incentive_Amount'] = payments.compute_incentives(
+            results_df['Farm_Proportion_Passing'], results_df['Total_Incentive_Acres'], payment_eligible
+        )
+        return results_df
+        
+    except Exception as e:
+        report.error(f"0 Error analyzing farm compliance: {str(e)}")
+        report.exception(e)
+        return None
+
+def analyze_weekly_compliance(master_df, water_df, farm_pipe_mapping, start_date, end_date, report=LOG):
+    """Analyze compliance week by week within the selected date range (FIXED)"""
+    try:
+        results = []
+        
+        # Generate week periods based on start_date
+        current_date = start_date
+        week_number = 1
+        
+        while current_date <= end_date:
+            week_end = min(current_date + timedelta(days=6), end_date)
+            
+            # Filter water data for this week
+            week_water_data = water_df[
+                (water_df['Date'].dt.date >= current_date) & 
+                (water_df['Date'].dt.date <= week_end)
+            ].copy()
+            
+            # Analyze each farm for this week
+            for _, farm_data in master_df.iterrows():
+                farm_id = farm_data['Farm_ID']
+                farm_pipe_codes = farm_data['Pipe_Codes']
+                
+                # Get water data for this farm this week
+                farm_water_data = week_water_data[week_water_data['Farm_ID'] == farm_id]
+                
+                # Initialize pipe analysis
+                pipe_details = []
+                total_assigned_pipes = len(farm_pipe_codes)
+                valid_pipes = 0  # Pipes with ≥1 readings this week (UPDATED)
+                pipes_passing = 0
+                non_compliant_pipe_ids = []
+                data_mask = compliant_mask = single_mask = 0  # One bit per assigned pipe
+                
+                for pipe_index, pipe_id in enumerate(farm_pipe_codes):
+                    pipe_data = farm_water_data[farm_water_data['Pipe_ID'] == pipe_id]
+                    pipe_bit = pipe_masks.pipe_bit(pipe_index)
+                    
+                    if len(pipe_data) >= 1:  # UPDATED: Consider pipes with ≥1 readings
+                        valid_pipes += 1
+                        data_mask |= pipe_bit
+                        if len(pipe_data) == 1:
+                            single_mask |= pipe_bit
+                        compliance_result = analyze_pipe_compliance(pipe_data)
+                        
+                        # Format readings
+                        readings_str = ", ".join([
+                            f"{row['Date'].strftime('%d/%m')} ({int(row['Water_Level_mm'])}mm)"
+                            for _, row in pipe_data.sort_values('Date').iterrows()
+                        ])
+                        
+                        if compliance_result['compliant']:
+                            pipes_passing += 1
+                            compliant_mask |= pipe_bit
+                            if len(pipe_data) == 1:
+                                pipe_detail = f"{pipe_id}: {readings_str} 🟢 PASS (Single reading ≤200mm)"
+                            else:
+                                pipe_detail = f"{pipe_id}: {readings_str} 🟢 PASS"
+                        else:
+                            non_compliant_pipe_ids.append(pipe_id)
+                            if len(pipe_data) == 1:
+                                pipe_detail = f"{pipe_id}: {readings_str} 🔴 FAIL (Single reading >200mm)"
+                            else:
+                                pipe_detail = f"{pipe_id}: {readings_str} � FAIL"
+                        
+                        pipe_details.append(pipe_detail)
+                    else:
+                        # No readings for this pipe
+                        pipe_detail = f"{pipe_id}: No data this week 🔴"
+                        pipe_details.append(pipe_detail)
+                        non_compliant_pipe_ids.append(pipe_id)
+                
+                # FIXED CALCULATION: Use valid pipes as denominator
+                if valid_pipes > 0:
+                    proportion_passing = pipes_passing / valid_pipes
+                else:
+                    proportion_passing = 0
+                
+                # Determine if farm is valid (has at least 1 pipe with ≥1 readings)
+                is_valid_farm = valid_pipes > 0
+                
+                results.append({
+                    'Week': week_number,
+                    'Week_Period': f"{current_date.strftime('%d/%m')} - {week_end.strftime('%d/%m')}",
+                    'Village': farm_data['Village'],
+                    'Farm_ID': farm_id,
+                    'Farmer_Name': farm_data['Farmer_Name'],
+                    'Group': farm_data['Group'],
+                    'Valid_Farm': '1' if is_valid_farm else '0',  # NEW: Valid farm indicator
+                    'Payment_Eligible': farm_data['Payment_Eligible'],
+                    'Total_Incentive_Acres': farm_data['Incentive_Acres'],
+                    'Assigned_Pipe_IDs': ', '.join(farm_pipe_codes),
+                    'Total_Assigned_Pipes': total_assigned_pipes,
+                    'Valid_Pipes_Count': valid_pipes,  # UPDATED: Pipes with ≥1 readings
+                    'Pipes_Passing': pipes_passing,
+                    'Non_Compliant_Pipe_IDs': ', '.join(non_compliant_pipe_ids) if non_compliant_pipe_ids else '',
+                    'Proportion_Passing': proportion_passing,  # UPDATED: Based on valid pipes (≥1 readings)
+                    'Incentive_To_Give': farm_data['Incentive_To_Give'],
+                    'Pipe_Details': '\n'.join(pipe_details),
+                    'Comments': f"Week {week_number} analysis - {valid_pipes}/{total_assigned_pipes} pipes valid (≥1 reading)",
+                    pipe_masks.DATA_MASK: data_mask,
+                    pipe_masks.COMPLIANT_MASK: compliant_mask,
+                    pipe_masks.SINGLE_MASK: single_mask
+                })
+            
+            # Move to next week
+            current_date = week_end + timedelta(days=1)
+            week_number += 1
+        
+        results_df = pd.DataFrame(results)
+        if results_df.empty:
+            return results_df
+        results_df = results_df.astype({column: pipe_masks.MASK_DTYPE for column in pipe_masks.PIPE_MASK_COLUMNS})
+        
+        # Weekly payments for every (farm, week) in one vectorized step
+        eligible_acres, final_incentive = payments.compute_incentives(
+            results_df['Proportion_Passing'], results_df['Total_Incentive_Acres'],
+            results_df['Payment_Eligible'], results_df.pop('Incentive_To_Give')
+        )
+        payment_col = results_df.columns.get_loc('Proportion_Passing') + 1
+        results_df.insert(payment_col, 'Eligible_Acres', eligible_acres)
+        results_df.insert(payment_col + 1, 'Final_Incentive_Amount', final_incentive)
+        return results_df
+        
+    except Exception as e:
+        report.error(f"0 Error analyzing weekly compliance: {str(e)}")
+        report.exception(e)
+        return None
@@ -0,0 +1,45 @@
+"""App configuration defaults and parsing of the [app_config] and [programs.*] secrets sections"""
+
+DEFAULT_APP_CONFIG = {
+    "sheet_url": "",
+    "worksheet_name": "Farm details",
+    "use_arrow_dtypes": False,
+    "analytics_db_path": "",  # SQLite analytics store (e.g. .awd_cache/awd_analytics.sqlite); empty string disables it
+    "master_cache_dir": "",  # Disk copy of the shared master cache (e.g. .awd_cache/master); empty string: memory only
+    "snapshot_dir": "",  # Standard report snapshots (e.g. .awd_cache/snapshots); empty string disables them
+    "snapshot_daily_at": "",  # Local time of the daily rebuild with snapshots on (e.g. "02:00"); empty string disables it
+    "reading_map_dir": "",  # Readings memory-mapped by every worker (e.g. .awd_cache/readings); empty string disables it
+    "memory_budget_mb": 512  # In-memory datasets kept for the program; 0 disables the limit
+}
+
+DEFAULT_PROGRAM = "default"
+DEFAULT_TOTAL_MEMORY_BUDGET_MB = 2048  # All programs of one server process; 0 disables the limit
+
+def parse_app_config(app_config, defaults=DEFAULT_APP_CONFIG):
+    """Full app config from an [app_config] mapping; sheet_url and worksheet_name are required (KeyError)"""
+    return {
+        "sheet_url": app_config["sheet_url"],
+        "worksheet_name": app_config["worksheet_name"],
+        "use_arrow_dtypes": bool(app_config.get("use_arrow_dtypes", False)),
+        "analytics_db_path": app_config.get("analytics_db_path", defaults["analytics_db_path"]),
+        "master_cache_dir": app_config.get("master_cache_dir", defaults["master_cache_dir"]),
+        "snapshot_dir": app_config.get("snapshot_dir", defaults["snapshot_dir"]),
+        "snapshot_daily_at": app_config.get("snapshot_daily_at", defaults["snapshot_daily_at"]),
+        "reading_map_dir": app_config.get("reading_map_dir", defaults["reading_map_dir"]),
+        "memory_budget_mb": float(app_config.get("memory_budget_mb", defaults["memory_budget_mb"]))
+    }
+
+def parse_programs(programs):
+    """{program: app config} from a [programs] mapping of [programs.<name>] sections
+
+    Each section takes the [app_config] keys; a section without sheet_url or
+    worksheet_name raises KeyError naming the program. Stores on disk are off
+    unless a section names their paths, and each program needs its own.
+    """
+    parsed = {}
+    for program, program_config in programs.items():
+        try:
+            parsed[program] = parse_app_config(program_config)
+        except KeyError as e:
+            raise KeyError(f"programs.{program}: {e.args[0]}") from e
+    return parsed
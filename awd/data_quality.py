@@ -0,0 +1,141 @@
+"""Precomputed data-quality and coverage metrics for cleaned water readings"""
+import numpy as np
+import pandas as pd
+
+from awd.arrow import to_numpy_datetimes
+
+# Plausible water level range for a field pipe reading
+LEVEL_MIN_MM = 0
+LEVEL_MAX_MM = 1000
+
+# Days with fewer readings than this share of the period's daily mean are flagged
+LOW_COVERAGE_RATIO = 0.5
+
+def build_data_quality_store(water_df, rejection_report=None):
+    """Compute every data-quality table for the readings in a single sorted pass
+
+    When the cleaning stage's rejection report is given, duplicate and
+    out-of-range readings are taken from it, since they no longer appear in
+    the cleaned readings.
+    """
+    day = to_numpy_datetimes(water_df['Date'].dt.normalize())
+    pipe_codes, pipe_ids = pd.factorize(water_df['Pipe_ID'])
+
+    # Sort once by (pipe, day); gaps and same-day duplicates fall out of adjacent differences
+    order = np.lexsort((day.values, pipe_codes))
+    pipe_sorted = pipe_codes[order]
+    day_sorted = day.values[order]
+    same_pipe = np.zeros(len(order), dtype=bool)
+    same_pipe[1:] = pipe_sorted[1:] == pipe_sorted[:-1]
+    gap_days = np.full(len(order), np.nan)
+    gap_days[1:] = (day_sorted[1:] - day_sorted[:-1]) / np.timedelta64(1, 'D')
+    gap_days[~same_pipe] = np.nan
+
+    is_duplicate = np.zeros(len(order), dtype=bool)
+    is_duplicate[order] = same_pipe & (gap_days == 0)
+
+    # Per-pipe reading counts, span and gaps
+    sorted_frame = pd.DataFrame({
+        'pipe': pipe_sorted,
+        'day': day_sorted,
+        'gap': np.where(gap_days > 0, gap_days, np.nan),
+        'new_day': ~(same_pipe & (gap_days == 0))
+    })
+    per_pipe = sorted_frame.groupby('pipe', sort=True).agg(
+        Readings=('day', 'size'),
+        Reading_Days=('new_day', 'sum'),
+        First_Reading=('day', 'min'),
+        Last_Reading=('day', 'max'),
+        Mean_Gap_Days=('gap', 'mean'),
+        Longest_Gap_Days=('gap', 'max')
+    )
+    pipe_farm = water_df.groupby(pipe_codes, sort=True)['Farm_ID'].first()
+    pipe_gaps = pd.DataFrame({
+        'Pipe_ID': pipe_ids[per_pipe.index],
+        'Farm_ID': pipe_farm.reindex(per_pipe.index).values,
+        'Readings': per_pipe['Readings'].values,
+        'Reading_Days': per_pipe['Reading_Days'].astype(int).values,
+        'First_Reading': per_pipe['First_Reading'].values,
+        'Last_Reading': per_pipe['Last_Reading'].values,
+        'Mean_Gap_Days': per_pipe['Mean_Gap_Days'].round(1).values,
+        'Longest_Gap_Days': per_pipe['Longest_Gap_Days'].fillna(0).astype(int).values
+    })
+
+    # Distinct (pipe, day) pairs, so pipe coverage of any date range is a cheap slice
+    pipe_days = pd.DataFrame({
+        'Pipe_ID': pipe_ids[pipe_sorted[sorted_frame['new_day'].values]],
+        'Date': day_sorted[sorted_frame['new_day'].values]
+    })
+
+    # Daily counts over the full span, including days with no readings at all
+    if len(day):
+        full_span = pd.date_range(day.min(), day.max(), freq='D')
+    else:
+        full_span = pd.DatetimeIndex([])
+    daily_counts = pd.DataFrame({
+        'Number_of_Readings': day.value_counts().reindex(full_span, fill_value=0),
+        'Pipes_Read': pipe_days['Date'].value_counts().reindex(full_span, fill_value=0)
+    })
+    daily_counts.index.name = 'Date'
+
+    if 'Surveyor' in water_df.columns:
+        surveyor_daily = water_df.assign(Date=day).groupby(['Surveyor', 'Date']).agg(
+            Readings=('Pipe_ID', 'size'),
+            Pipes_Read=('Pipe_ID', 'nunique')
+        ).reset_index()
+    else:
+        surveyor_daily = pd.DataFrame(columns=['Surveyor', 'Date', 'Readings', 'Pipes_Read'])
+
+    if rejection_report is not None:
+        duplicates = rejection_report[rejection_report['Reason'].isin(['exact_duplicate', 'near_duplicate'])]
+        out_of_range = rejection_report[rejection_report['Reason'] == 'out_of_range']
+    else:
+        out_of_range_mask = (water_df['Water_Level_mm'] < LEVEL_MIN_MM) | (water_df['Water_Level_mm'] > LEVEL_MAX_MM)
+        duplicates = water_df[is_duplicate]
+        out_of_range = water_df[out_of_range_mask.values]
+
+    return {
+        'pipe_gaps': pipe_gaps,
+        'pipe_days': pipe_days,
+        'daily_counts': daily_counts,
+        'surveyor_daily': surveyor_daily,
+        'duplicates': duplicates.sort_values(['Pipe_ID', 'Date']),
+        'out_of_range': out_of_range.sort_values(['Pipe_ID', 'Date'])
+    }
+
+def _in_range(dates, start_date, end_date):
+    """Boolean mask of datetime values falling on or between two calendar dates"""
+    return (dates >= pd.Timestamp(start_date)) & (dates < pd.Timestamp(end_date) + pd.Timedelta(days=1))
+
+def coverage_summary(store, start_date, end_date):
+    """Reading and pipe totals for a date range"""
+    daily = store['daily_counts']
+    pipe_days = store['pipe_days']
+    return {
+        'total_readings': int(daily.loc[_in_range(daily.index, start_date, end_date), 'Number_of_Readings'].sum()),
+        'pipes_with_data': pipe_days.loc[_in_range(pipe_days['Date'], start_date, end_date), 'Pipe_ID'].nunique()
+    }
+
+def daily_coverage(store, start_date, end_date):
+    """Daily reading counts for a date range with days below the coverage threshold flagged"""
+    daily = store['daily_counts']
+    daily = daily[_in_range(daily.index, start_date, end_date)].reset_index()
+    daily['Date'] = daily['Date'].dt.date
+    daily['Low_Coverage'] = daily['Number_of_Readings'] < daily['Number_of_Readings'].mean() * LOW_COVERAGE_RATIO
+    return daily
+
+def surveyor_coverage(store, start_date, end_date):
+    """Per-surveyor activity for a date range"""
+    surveyor_daily = store['surveyor_daily']
+    surveyor_daily = surveyor_daily[_in_range(surveyor_daily['Date'], start_date, end_date)]
+    return surveyor_daily.groupby('Surveyor').agg(
+        Days_Active=('Date', 'nunique'),
+        Total_Readings=('Readings', 'sum'),
+        Avg_Readings_per_Day=('Readings', 'mean'),
+        Max_Pipes_in_a_Day=('Pipes_Read', 'max')
+    ).round(1)
+
+def flagged_readings(store, table_name, start_date, end_date):
+    """Flagged reading rows (duplicates / out_of_range) within a date range"""
+    flagged = store[table_name]
+    return flagged[_in_range(flagged['Date'], start_date, end_date)]
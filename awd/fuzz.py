@@ -0,0 +1,362 @@
+"""Property-based fuzzing of the compliance pipeline
+
+    python -m awd.fuzz [--cases 2000] [--seed 0] [--batch 25] [--max-farms 8] [--jobs N]
+                       [--replay SEED --out DIR]
+
+Each case is generated from its own seed: a small master sheet whose Y/N
+cells mix the encodings is_positive_value must handle ('1.0', 'yes', 'X',
+blanks, NaN, numbers, booleans), pipe codes with padding, blanks and
+duplicates within and across farms, messy incentive acres, and random
+water readings (thresholds, missing levels, unmapped pipes, readings
+outside the window). The generator records what every cell means, and the
+case goes through cleaning, the farm and weekly analyses and the pipe
+tables. Then the invariants below are checked against that truth and
+against an independent per-pipe oracle over the cleaned readings:
+
+    cleaning    participants, Group and Payment_Eligible follow the Y/N truth;
+                Pipe_Codes and Incentive_Acres follow the sheet
+    farm        0 ≤ proportion ≤ 1; passing ≤ valid ≤ assigned pipes; valid
+                and passing pipes match the oracle; Valid_Farm and the pipe
+                masks agree with the counts
+    payments    only 'A Complied' farms are paid; acres and amount follow
+                the incentive formula
+    weekly      one row per farm and week, same invariants per week; the
+                period's pipe data mask is the OR of the weekly masks and a
+                pipe read once in the period is read once in some week
+    tables      pipe summary readings add up to the period's readings
+
+Farm IDs and pipe codes carry their case seed, so --batch cases share one
+sheet, upload and analysis window without interacting; that amortises the
+pipeline's fixed cost per run. Batches run in worker processes. A failure
+prints its batch, and --replay writes that batch's sheets as CSV for
+debugging. Exits 1 on any failure.
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from awd import payments, pipe_masks
+from awd.cleaning import clean_master_data, clean_water_data, is_positive_value
+from awd.compliance import analyze_farm_compliance, analyze_weekly_compliance
+from awd.golden import GROUP_COLUMNS, PIPE_CODE_COLUMNS
+from awd.tables import create_pipe_readings_table, create_pipe_summary_table
+
+DEFAULT_CASES = 2000
+DEFAULT_BATCH = 25
+DEFAULT_MAX_FARMS = 8
+SEASON_START = date(2025, 7, 1)
+SEASON_DAYS = 28
+MAX_FAILURES_SHOWN = 20
+
+# Sheet cells for yes and no as they turn up in the master sheet
+POSITIVE_ENCODINGS = ['1', '1.0', 'yes', 'Yes', 'YES', 'y', 'Y', ' Y ', 'x', 'X', 'TRUE', 'true', 't', 1, 1.0, True]
+NEGATIVE_ENCODINGS = ['', ' ', '0', '0.0', 'no', 'No', 'N', 'n', 'FALSE', 'f', 'nan', 'NA', 'None', 'maybe', '2',
+                      None, np.nan, 0, 0.0, False]
+ACRE_CELLS = [0, 0.5, 1, 2.5, 4, '3', ' 1.5 ', '', None, np.nan, -2, 'n/a']
+LEVEL_CHOICES = [0.0, 50.0, 99.0, 100.0, 100.5, 101.0, 150.0, 199.0, 200.0, 200.5, 201.0, 280.0, np.nan]
+
+def _yes_no(rng, yes):
+    encodings = POSITIVE_ENCODINGS if yes else NEGATIVE_ENCODINGS
+    return encodings[int(rng.integers(0, len(encodings)))]
+
+def _expected_acres(cell):
+    try:
+        value = float(str(cell).strip())
+    except ValueError:
+        return 0.0
+    return 0.0 if np.isnan(value) else max(0.0, value)
+
+def expected_group(membership, complied, non_complied):
+    """Group the sheet's truth implies: first group flagged wins; complied before non-complied"""
+    for group in GROUP_COLUMNS:
+        if membership[group]:
+            if complied[group]:
+                return f'{group} Complied'
+            if non_complied[group]:
+                return f'{group} Non Complied'
+            return f'{group} Unassigned'
+    return 'No Group Assigned'
+
+def generate_case(seed, max_farms=DEFAULT_MAX_FARMS):
+    """One fuzz case: {'seed', 'raw_master', 'raw_water', 'truth', 'start_date', 'end_date'}
+
+    truth maps each Farm ID in the sheet to its 'study' flag, expected
+    'group', 'pipes' (assigned codes in sheet order) and 'acres'.
+    """
+    rng = np.random.default_rng(seed)
+    farms = int(rng.integers(1, max_farms + 1))
+    pipe_pool = [f'P{seed}-{number}' for number in range(int(rng.integers(1, 3 * farms + 2)))]
+    rows, truth = [], {}
+    for farm in range(farms):
+        farm_id = f'F{seed}-{farm}'
+        study = rng.random() < 0.85
+        membership = {group: rng.random() < 0.4 for group in GROUP_COLUMNS}
+        complied = {group: rng.random() < 0.5 for group in GROUP_COLUMNS}
+        non_complied = {group: rng.random() < 0.5 for group in GROUP_COLUMNS}
+        acres_cell = ACRE_CELLS[int(rng.integers(0, len(ACRE_CELLS)))]
+        row = {
+            'Kharif 25 Farm ID': farm_id,
+            'Kharif 25 Farmer Name': f'Farmer {farm}',
+            'Kharif 25 Village': f'V{int(rng.integers(0, 3))}',
+            'Kharif 25 - AWD Study - acres for incentive': acres_cell,
+            'Kharif 25 - AWD Study (Y/N)': _yes_no(rng, study)
+        }
+        for group, (member_col, complied_col, non_complied_col) in GROUP_COLUMNS.items():
+            row[member_col] = _yes_no(rng, membership[group])
+            row[complied_col] = _yes_no(rng, complied[group])
+            row[non_complied_col] = _yes_no(rng, non_complied[group])
+        pipes = []
+        for column in PIPE_CODE_COLUMNS:
+            draw = rng.random()
+            if draw < 0.35:
+                row[column] = [None, np.nan, '', '  '][int(rng.integers(0, 4))]
+                continue
+            # Codes are shared across and within farms by drawing from a small pool
+            code = pipe_pool[int(rng.integers(0, len(pipe_pool)))]
+            row[column] = f' {code} ' if draw > 0.9 else code
+            pipes.append(code)
+        rows.append(row)
+        truth[farm_id] = {'study': study, 'group': expected_group(membership, complied, non_complied),
+                          'pipes': pipes, 'acres': _expected_acres(acres_cell)}
+
+    start_date = SEASON_START + timedelta(days=int(rng.integers(0, SEASON_DAYS // 2)))
+    end_date = start_date + timedelta(days=int(rng.integers(0, SEASON_DAYS)))
+    water_rows = []
+    for pipe in pipe_pool + [f'P{seed}-UNMAPPED']:
+        for _ in range(int(rng.integers(0, 7))):
+            day = int(rng.integers(-3, SEASON_DAYS + 3))
+            water_rows.append({
+                'Date': pd.Timestamp(SEASON_START) + pd.Timedelta(days=day, hours=int(rng.integers(0, 24))),
+                'Pipe ID': pipe,
+                'Water Level (mm)': LEVEL_CHOICES[int(rng.integers(0, len(LEVEL_CHOICES)))],
+                'Surveyor': 'S1'
+            })
+    return {'seed': seed, 'raw_master': pd.DataFrame(rows),
+            'raw_water': pd.DataFrame(water_rows, columns=['Date', 'Pipe ID', 'Water Level (mm)', 'Surveyor']),
+            'truth': truth, 'start_date': start_date, 'end_date': end_date}
+
+def generate_batch(first_seed, size, max_farms=DEFAULT_MAX_FARMS):
+    """size cases from consecutive seeds in one sheet and upload, analysed over the first case's window"""
+    cases = [generate_case(seed, max_farms) for seed in range(first_seed, first_seed + size)]
+    return {'seed': first_seed, 'raw_master': pd.concat([case['raw_master'] for case in cases], ignore_index=True),
+            'raw_water': pd.concat([case['raw_water'] for case in cases], ignore_index=True),
+            'truth': {farm_id: farm for case in cases for farm_id, farm in case['truth'].items()},
+            'start_date': cases[0]['start_date'], 'end_date': cases[0]['end_date']}
+
+def _empty_water():
+    return pd.DataFrame({'Date': pd.Series([], dtype='datetime64[ns]'), 'Farm_ID': pd.Series([], dtype=object),
+                         'Pipe_ID': pd.Series([], dtype=object), 'Water_Level_mm': pd.Series([], dtype=float)})
+
+def pipe_readings(water_df):
+    """{(farm, pipe): [(day, level), ...]} of the cleaned readings, for the oracle"""
+    readings = {}
+    for farm_id, pipe_id, day, level in zip(water_df['Farm_ID'], water_df['Pipe_ID'], water_df['Date'].dt.date,
+                                            water_df['Water_Level_mm']):
+        readings.setdefault((farm_id, pipe_id), []).append((day, level))
+    return readings
+
+def window_levels(readings, farm_id, pipe, start_date, end_date):
+    return [level for day, level in readings.get((farm_id, pipe), ()) if start_date <= day <= end_date]
+
+def oracle_pipe_counts(readings, farm_id, pipes, start_date, end_date):
+    """(valid pipes, passing pipes, single-reading pipes) of a farm from its readings in [start_date, end_date]"""
+    valid = passing = single = 0
+    for pipe in pipes:
+        levels = window_levels(readings, farm_id, pipe, start_date, end_date)
+        if not levels:
+            continue
+        valid += 1
+        single += len(levels) == 1
+        passing += max(levels) <= 200 and (len(levels) == 1 or min(levels) <= 100)
+    return valid, passing, single
+
+def _check_farm_rows(failures, table, rows_df, master_df, readings, windows):
+    """Per-row invariants shared by the farm and weekly tables; windows maps row index -> (start, end)"""
+    proportion_column = 'Farm_Proportion_Passing' if 'Farm_Proportion_Passing' in rows_df else 'Proportion_Passing'
+    master = master_df.set_index('Farm_ID')
+    for index, row in rows_df.iterrows():
+        farm = master.loc[row['Farm_ID']]
+        where = f"{table} {row['Farm_ID']}" + (f" week {row['Week']}" if 'Week' in row else '')
+        proportion = row[proportion_column]
+        if not 0 <= proportion <= 1:
+            failures.append(f"{where}: proportion {proportion} outside [0, 1]")
+        if not row['Pipes_Passing'] <= row['Valid_Pipes_Count'] <= row['Total_Assigned_Pipes']:
+            failures.append(f"{where}: passing {row['Pipes_Passing']} / valid {row['Valid_Pipes_Count']} / "
+                            f"assigned {row['Total_Assigned_Pipes']} out of order")
+        if row['Total_Assigned_Pipes'] != len(farm['Pipe_Codes']):
+            failures.append(f"{where}: {row['Total_Assigned_Pipes']} assigned pipes, sheet has {len(farm['Pipe_Codes'])}")
+        valid, passing, single = oracle_pipe_counts(readings, row['Farm_ID'], farm['Pipe_Codes'], *windows[index])
+        if (row['Valid_Pipes_Count'], row['Pipes_Passing']) != (valid, passing):
+            failures.append(f"{where}: valid/passing {row['Valid_Pipes_Count']}/{row['Pipes_Passing']}, "
+                            f"oracle {valid}/{passing}")
+        if (row['Valid_Farm'] == '1') != (row['Valid_Pipes_Count'] > 0):
+            failures.append(f"{where}: Valid_Farm {row['Valid_Farm']!r} with {row['Valid_Pipes_Count']} valid pipes")
+        expected_proportion = passing / valid if valid else 0
+        if not np.isclose(proportion, expected_proportion):
+            failures.append(f"{where}: proportion {proportion}, oracle {expected_proportion}")
+        masks = [int(row[column]) for column in pipe_masks.PIPE_MASK_COLUMNS]
+        if [int(count) for count in pipe_masks.popcount(masks)] != [valid, passing, single]:
+            failures.append(f"{where}: pipe masks {masks} disagree with oracle counts {[valid, passing, single]}")
+
+        # Payments
+        paid_group = farm['Group'] == payments.PAYMENT_ELIGIBLE_GROUP
+        expected_acres = round(proportion * farm['Incentive_Acres'], 2)
+        expected_amount = round(proportion * farm['Incentive_Acres'] * payments.INCENTIVE_RATE_PER_ACRE) if paid_group else 0
+        if row['Final_Incentive_Amount'] > 0 and not paid_group:
+            failures.append(f"{where}: {row['Group']} farm paid {row['Final_Incentive_Amount']}")
+        if not np.isclose(row['Eligible_Acres'], expected_acres) or not np.isclose(row['Final_Incentive_Amount'],
+                                                                                    expected_amount):
+            failures.append(f"{where}: acres/amount {row['Eligible_Acres']}/{row['Final_Incentive_Amount']}, "
+                            f"expected {expected_acres}/{expected_amount}")
+
+def check_case(case):
+    """Failures of one generated case, as readable strings"""
+    failures = []
+    truth = case['truth']
+    start_date, end_date = case['start_date'], case['end_date']
+
+    # Cleaning against the sheet truth
+    for encodings, expected in [(POSITIVE_ENCODINGS, True), (NEGATIVE_ENCODINGS, False)]:
+        for cell in encodings:
+            if is_positive_value(cell) != expected:
+                failures.append(f"is_positive_value({cell!r}) is {not expected}")
+    expected_farms = {farm_id for farm_id, farm in truth.items()
+                      if farm['study'] and farm['group'] not in ('A Unassigned', 'B Unassigned', 'C Unassigned',
+                                                                   'No Group Assigned')}
+    master_df, farm_pipe_mapping = clean_master_data(case['raw_master'])
+    if master_df is None:
+        if expected_farms:
+            failures.append(f"cleaning dropped every farm, expected {sorted(expected_farms)}")
+        return failures
+    if set(master_df['Farm_ID']) != expected_farms:
+        failures.append(f"cleaned farms {sorted(master_df['Farm_ID'])}, expected {sorted(expected_farms)}")
+        return failures
+    for farm in master_df.itertuples(index=False):
+        farm_truth = truth[farm.Farm_ID]
+        if farm.Group != farm_truth['group']:
+            failures.append(f"{farm.Farm_ID}: Group {farm.Group!r}, expected {farm_truth['group']!r}")
+        if bool(farm.Payment_Eligible) != (farm_truth['group'] == payments.PAYMENT_ELIGIBLE_GROUP):
+            failures.append(f"{farm.Farm_ID}: Payment_Eligible {farm.Payment_Eligible} for {farm.Group}")
+        if list(farm.Pipe_Codes) != farm_truth['pipes']:
+            failures.append(f"{farm.Farm_ID}: Pipe_Codes {farm.Pipe_Codes}, expected {farm_truth['pipes']}")
+        if not np.isclose(farm.Incentive_Acres, farm_truth['acres']):
+            failures.append(f"{farm.Farm_ID}: Incentive_Acres {farm.Incentive_Acres}, expected {farm_truth['acres']}")
+    if failures:
+        return failures
+
+    water_df, _ = clean_water_data(case['raw_water'], farm_pipe_mapping)
+    if water_df is None:
+        water_df = _empty_water()
+    inputs = (master_df, water_df, farm_pipe_mapping, start_date, end_date)
+    readings = pipe_readings(water_df)
+
+    # Period analysis
+    results_df = analyze_farm_compliance(*inputs)
+    if results_df is None or len(results_df) != len(master_df):
+        return failures + [f"farm analysis returned {None if results_df is None else len(results_df)} rows "
+                           f"for {len(master_df)} farms"]
+    _check_farm_rows(failures, 'farm', results_df, master_df, readings,
+                     {index: (start_date, end_date) for index in results_df.index})
+
+    # Weekly analysis against the period
+    weekly_df = analyze_weekly_compliance(*inputs)
+    weeks = ((end_date - start_date).days // 7) + 1
+    if weekly_df is None or len(weekly_df) != weeks * len(master_df):
+        return failures + [f"weekly analysis returned {None if weekly_df is None else len(weekly_df)} rows "
+                           f"for {len(master_df)} farms x {weeks} weeks"]
+    week_windows = {}
+    for index, week in weekly_df['Week'].items():
+        week_start = start_date + timedelta(days=7 * (int(week) - 1))
+        week_windows[index] = (week_start, min(week_start + timedelta(days=6), end_date))
+    _check_farm_rows(failures, 'weekly', weekly_df, master_df, readings, week_windows)
+    weekly_masks = weekly_df.groupby('Farm_ID', sort=False)[[pipe_masks.DATA_MASK, pipe_masks.SINGLE_MASK]].agg(
+        lambda masks: int(np.bitwise_or.reduce(masks.to_numpy(dtype=np.int64)))
+    )
+    for row in results_df.itertuples(index=False):
+        period_data, period_single = int(getattr(row, pipe_masks.DATA_MASK)), int(getattr(row, pipe_masks.SINGLE_MASK))
+        week_data, week_single = weekly_masks.loc[row.Farm_ID]
+        if period_data != week_data:
+            failures.append(f"{row.Farm_ID}: period data mask {period_data:05b}, weekly OR {week_data:05b}")
+        if period_single & ~week_single:
+            failures.append(f"{row.Farm_ID}: single-reading pipes {period_single:05b} not single in any week "
+                            f"({week_single:05b})")
+        if (row.Valid_Farm == '1') != (weekly_df.loc[weekly_df['Farm_ID'] == row.Farm_ID, 'Valid_Farm'] == '1').any():
+            failures.append(f"{row.Farm_ID}: Valid_Farm {row.Valid_Farm!r} disagrees with its weeks")
+
+    # Pipe tables against the period
+    pipe_summary_df = create_pipe_summary_table(*inputs)
+    pipe_readings_df = create_pipe_readings_table(*inputs)
+    if pipe_summary_df is None or pipe_readings_df is None:
+        return failures + ["pipe tables could not be built"]
+    expected_readings = sum(len(window_levels(readings, farm.Farm_ID, pipe, start_date, end_date))
+                            for farm in master_df.itertuples(index=False) for pipe in farm.Pipe_Codes)
+    summary_readings = int(pipe_summary_df['Total_number_of_readings'].sum()) if len(pipe_summary_df) else 0
+    if summary_readings != expected_readings:
+        failures.append(f"pipe summary counts {summary_readings} readings, period has {expected_readings}")
+    if len(pipe_readings_df) != len(master_df):
+        failures.append(f"pipe readings table has {len(pipe_readings_df)} rows for {len(master_df)} farms")
+    return failures
+
+def run_batch(first_seed, size=DEFAULT_BATCH, max_farms=DEFAULT_MAX_FARMS):
+    """(first_seed, failures) for one batch of cases; an exception is a failure too"""
+    try:
+        return first_seed, check_case(generate_batch(first_seed, size, max_farms))
+    except Exception as e:
+        return first_seed, [f"raised {type(e).__name__}: {e}"]
+
+def _quiet_worker():
+    logging.getLogger('awd').setLevel(logging.CRITICAL)
+
+def replay(first_seed, size, out_dir, max_farms=DEFAULT_MAX_FARMS):
+    """Write one batch's master sheet and water upload as CSV; returns the paths"""
+    batch = generate_batch(first_seed, size, max_farms)
+    os.makedirs(out_dir, exist_ok=True)
+    paths = [os.path.join(out_dir, f"fuzz_{first_seed}x{size}_master.csv"),
+             os.path.join(out_dir, f"fuzz_{first_seed}x{size}_water.csv")]
+    batch['raw_master'].to_csv(paths[0], index=False)
+    batch['raw_water'].to_csv(paths[1], index=False)
+    print(f"analysis window {batch['start_date']} to {batch['end_date']}")
+    return paths
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cases', type=int, default=DEFAULT_CASES, help='number of generated cases')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first case')
+    parser.add_argument('--batch', type=int, default=DEFAULT_BATCH, help='cases analysed together in one run')
+    parser.add_argument('--max-farms', type=int, default=DEFAULT_MAX_FARMS, help='most farms in one case')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help='worker processes')
+    parser.add_argument('--replay', type=int, help='write the sheets of the batch starting at this seed as CSV and exit')
+    parser.add_argument('--out', default='.', help='directory for --replay')
+    args = parser.parse_args(argv)
+    _quiet_worker()
+
+    if args.replay is not None:
+        for path in replay(args.replay, args.batch, args.out, args.max_farms):
+            print(path)
+        return 0
+
+    started = time.perf_counter()
+    first_seeds = list(range(args.seed, args.seed + args.cases, args.batch))
+    sizes = [min(args.batch, args.seed + args.cases - first_seed) for first_seed in first_seeds]
+    with ProcessPoolExecutor(max_workers=args.jobs, initializer=_quiet_worker) as executor:
+        outcomes = list(executor.map(run_batch, first_seeds, sizes, [args.max_farms] * len(first_seeds)))
+    failed = [(first_seed, size, failures) for (first_seed, failures), size in zip(outcomes, sizes) if failures]
+    elapsed = time.perf_counter() - started
+
+    for first_seed, size, failures in failed[:MAX_FAILURES_SHOWN]:
+        print(f"cases {first_seed}..{first_seed + size - 1} (farm F<seed>-<n> is case <seed>):")
+        for failure in failures[:5]:
+            print(f"  {failure}")
+    print(f"{args.cases} cases in {elapsed:.1f}s ({args.cases / elapsed:.0f}/s), {len(failed)} failed batches")
+    print("OK" if not failed else f"FAIL (replay with --replay {failed[0][0]} --batch {failed[0][1]})")
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,306 @@
+"""Golden-output regression harness: live (or candidate) engines against the frozen reference
+
+    python -m awd.golden [--seeds 0 1 2] [--farms 80] [--master sheet.csv --water readings.xlsx]
+                         [--start 2025-07-01 --end 2025-08-09] [--engine package.module:ENGINE]
+
+Every dataset (randomized master sheets and readings generated from a
+seed, plus an optional recorded master/water export) is compared end to
+end from the raw inputs: the frozen baseline cleaning feeds awd.reference,
+the current cleaning feeds the engine under test, so changes to cleaning
+and reading screens are checked along with the engines.
+Each output table is compared cell by cell on the reference's columns:
+numbers within a relative tolerance, everything else as text, missing
+values equal to each other. Columns the engine adds are not compared.
+Prints the speedup and mismatch count per table; exits 1 on any mismatch.
+
+An engine is a dict {table: fn(master_df, water_df, farm_pipe_mapping,
+start_date, end_date)} over ENGINE_TABLES; --engine names a module
+attribute holding one (tables it leaves out are not checked). The default
+is the engine the dashboard runs.
+"""
+import argparse
+import importlib
+import numbers
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from awd import reference
+from awd.cleaning import clean_master_data, clean_water_data
+from awd.compliance import analyze_farm_compliance, analyze_weekly_compliance
+from awd.tables import create_pipe_readings_table, create_pipe_summary_table
+
+ENGINE_TABLES = ['results', 'weekly', 'pipe_readings', 'pipe_summary']
+
+REFERENCE_ENGINE = {
+    'results': reference.analyze_farm_compliance,
+    'weekly': reference.analyze_weekly_compliance,
+    'pipe_readings': reference.create_pipe_readings_table,
+    'pipe_summary': reference.create_pipe_summary_table
+}
+
+CURRENT_ENGINE = {
+    'results': analyze_farm_compliance,
+    'weekly': analyze_weekly_compliance,
+    'pipe_readings': create_pipe_readings_table,
+    'pipe_summary': create_pipe_summary_table
+}
+
+DEFAULT_SEEDS = [0, 1, 2]
+DEFAULT_FARMS = 80
+SEASON_START = date(2025, 7, 1)
+SEASON_DAYS = 40
+RELATIVE_TOLERANCE = 1e-9
+MISMATCHES_SHOWN = 5
+
+# Master sheet columns of one study group: membership, complied, non-complied
+GROUP_COLUMNS = {
+    'A': ['Kharif 25 - AWD Study - Group A - Treatment (Y/N)',
+          'Kharif 25 - AWD Study - Group A - Treatment - complied (Y/N)',
+          'Kharif 25 - AWD Study - Group A - Treatment - Non-complied (Y/N)'],
+    'B': ['Kharif 25 - AWD Study - Group B -training only (Y/N)',
+          'Kharif 25 - AWD Study - Group B - Complied (Y/N)',
+          'Kharif 25 - AWD Study - Group B - Non-complied (Y/N)'],
+    'C': ['Kharif 25 - AWD Study - Group C - Control (Y/N)',
+          'Kharif 25 - AWD Study - Group C - Complied (Y/N)',
+          'Kharif 25 - AWD Study - Group C - non-complied (Y/N)']
+}
+PIPE_CODE_COLUMNS = [f'Kharif 25 PVC Pipe code - {i}' for i in range(1, 6)]
+
+# Water levels cluster around the 100 mm and 200 mm compliance thresholds,
+# including fractional readings just either side of them
+LEVEL_CHOICES = np.array([0, 40, 99, 99.5, 100, 100.04, 101, 150, 199, 199.96, 200, 200.04, 201, 250])
+SAME_DAY_REPEAT_RATE = 0.15
+
+def random_raw_master(farms=DEFAULT_FARMS, seed=0):
+    """A master sheet export as read from Google Sheets: 0-5 pipes per farm, some pipe codes shared"""
+    rng = np.random.default_rng(seed)
+    rows = []
+    pipe_number = 0
+    for farm in range(farms):
+        group = rng.choice(list(GROUP_COLUMNS))
+        row = {
+            'Kharif 25 Farm ID': f'F{farm:05d}',
+            'Kharif 25 Farmer Name': f'Farmer {farm}',
+            'Kharif 25 Village': f'Village {int(rng.integers(0, max(1, farms // 15)))}',
+            'Kharif 25 - AWD Study - acres for incentive': float(rng.integers(0, 9)) / 2,
+            'Kharif 25 - AWD Study (Y/N)': 'Y' if rng.random() < 0.9 else 'N'
+        }
+        for group_name, (member_col, complied_col, non_complied_col) in GROUP_COLUMNS.items():
+            complied = rng.random() < 0.5
+            row[member_col] = 'Y' if group_name == group else ''
+            row[complied_col] = 'Y' if group_name == group and complied else ''
+            row[non_complied_col] = 'Y' if group_name == group and not complied else ''
+        pipes = int(rng.integers(0, 6))
+        for position, column in enumerate(PIPE_CODE_COLUMNS):
+            if position < pipes:
+                pipe_number += 1
+                # A few pipe codes are entered twice in the sheet
+                shared = pipe_number > 3 and rng.random() < 0.05
+                row[column] = f'P{pipe_number - 2 if shared else pipe_number:06d}'
+            else:
+                row[column] = ''
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+def random_raw_water(raw_master, seed=0, days=SEASON_DAYS, max_readings=6):
+    """A water level upload for the master's pipes: 0..max_readings readings each, plus an unmapped pipe
+
+    Some readings are repeated the same day at a different level. Exact
+    repeats (same pipe, day and level) are not generated: the current
+    cleaning drops them on purpose, where the baseline counted them twice.
+    """
+    rng = np.random.default_rng(seed)
+    pipes = sorted({code for column in PIPE_CODE_COLUMNS for code in raw_master[column] if code}) + ['PUNMAPPED']
+    rows = []
+    for pipe in pipes:
+        taken = set()
+        for _ in range(int(rng.integers(0, max_readings + 1))):
+            day = int(rng.integers(0, days))
+            levels = [float(rng.choice(LEVEL_CHOICES))]
+            if rng.random() < SAME_DAY_REPEAT_RATE:
+                levels.append(float(rng.choice(LEVEL_CHOICES)))
+            for level in levels:
+                if (day, level) in taken:
+                    continue
+                taken.add((day, level))
+                rows.append({
+                    'Date': pd.Timestamp(SEASON_START) + pd.Timedelta(days=day),
+                    'Pipe ID': pipe,
+                    'Water Level (mm)': level,
+                    'Surveyor': f'S{int(rng.integers(1, 4))}'
+                })
+    return pd.DataFrame(rows, columns=['Date', 'Pipe ID', 'Water Level (mm)', 'Surveyor'])
+
+def make_dataset(name, raw_master, raw_water, start_date, end_date):
+    """Clean raw inputs both ways into a dataset
+
+    {'name', 'master_df', 'water_df', 'farm_pipe_mapping', 'start_date',
+    'end_date'} holds the current cleaning (the engine's inputs);
+    'reference_inputs' holds master_df, water_df and farm_pipe_mapping from
+    the baseline cleaning in awd.reference.
+    """
+    master_df, farm_pipe_mapping = clean_master_data(raw_master)
+    if master_df is None:
+        raise ValueError(f"{name}: master data could not be cleaned")
+    water_df, _ = clean_water_data(raw_water, farm_pipe_mapping)
+    if water_df is None:
+        raise ValueError(f"{name}: water data could not be cleaned")
+    reference_master_df, reference_mapping = reference.clean_master_data(raw_master)
+    if reference_master_df is None:
+        raise ValueError(f"{name}: master data could not be cleaned by the reference")
+    reference_water_df = reference.clean_water_data(raw_water, reference_mapping)
+    if reference_water_df is None:
+        raise ValueError(f"{name}: water data could not be cleaned by the reference")
+    return {'name': name, 'master_df': master_df, 'water_df': water_df, 'farm_pipe_mapping': farm_pipe_mapping,
+            'start_date': start_date, 'end_date': end_date,
+            'reference_inputs': {'master_df': reference_master_df, 'water_df': reference_water_df,
+                                 'farm_pipe_mapping': reference_mapping}}
+
+def random_dataset(seed, farms=DEFAULT_FARMS):
+    """Randomized dataset; the analysis window moves with the seed so date filtering is exercised"""
+    raw_master = random_raw_master(farms, seed)
+    start_date = SEASON_START + timedelta(days=seed % 5)
+    end_date = SEASON_START + timedelta(days=SEASON_DAYS - 1 - seed % 7)
+    return make_dataset(f"random seed={seed} farms={farms}", raw_master, random_raw_water(raw_master, seed + 1000),
+                        start_date, end_date)
+
+def _read_table(path):
+    if path.lower().endswith(('.xlsx', '.xls')):
+        return pd.read_excel(path)
+    return pd.read_csv(path)
+
+def recorded_dataset(master_path, water_path, start_date=None, end_date=None):
+    """Dataset from a recorded master sheet export and water upload (CSV or Excel); the window defaults to all readings"""
+    dataset = make_dataset(f"recorded {os.path.basename(master_path)} + {os.path.basename(water_path)}",
+                           _read_table(master_path), _read_table(water_path), start_date, end_date)
+    if dataset['start_date'] is None:
+        dataset['start_date'] = dataset['water_df']['Date'].min().date()
+    if dataset['end_date'] is None:
+        dataset['end_date'] = dataset['water_df']['Date'].max().date()
+    return dataset
+
+def _is_number(value):
+    return isinstance(value, numbers.Number) and not isinstance(value, bool)
+
+def _is_missing(value):
+    return value is None or value is pd.NA or value is pd.NaT or (isinstance(value, float) and value != value)
+
+def _cells_equal(expected, actual, rtol=RELATIVE_TOLERANCE):
+    expected_missing, actual_missing = _is_missing(expected), _is_missing(actual)
+    if expected_missing or actual_missing:
+        return expected_missing and actual_missing
+    if _is_number(expected) and _is_number(actual):
+        return bool(np.isclose(float(expected), float(actual), rtol=rtol, atol=0.0))
+    return str(expected) == str(actual)
+
+def compare_tables(expected, actual, rtol=RELATIVE_TOLERANCE):
+    """Cell mismatches of actual against expected: [{'row', 'column', 'expected', 'actual'}]
+
+    Rows are compared in order; a missing column or a different row count is
+    reported as one mismatch with row None.
+    """
+    if expected is None or actual is None:
+        if expected is None and actual is None:
+            return []
+        return [{'row': None, 'column': None, 'expected': 'None' if expected is None else f"{len(expected)} rows",
+                 'actual': 'None' if actual is None else f"{len(actual)} rows"}]
+    mismatches = []
+    if len(expected) != len(actual):
+        mismatches.append({'row': None, 'column': None, 'expected': f"{len(expected)} rows",
+                           'actual': f"{len(actual)} rows"})
+    rows = min(len(expected), len(actual))
+    for column in expected.columns:
+        if column not in actual.columns:
+            mismatches.append({'row': None, 'column': column, 'expected': 'column', 'actual': 'missing'})
+            continue
+        expected_values = expected[column].iloc[:rows].tolist()
+        actual_values = actual[column].iloc[:rows].tolist()
+        for row, (expected_value, actual_value) in enumerate(zip(expected_values, actual_values)):
+            if not _cells_equal(expected_value, actual_value, rtol):
+                mismatches.append({'row': row, 'column': column, 'expected': expected_value, 'actual': actual_value})
+    return mismatches
+
+def _timed(fn, inputs, dataset):
+    started = time.perf_counter()
+    table = fn(inputs['master_df'], inputs['water_df'], inputs['farm_pipe_mapping'],
+               dataset['start_date'], dataset['end_date'])
+    return table, time.perf_counter() - started
+
+def check_engine(dataset, engine=None, rtol=RELATIVE_TOLERANCE):
+    """Reference on the baseline-cleaned inputs vs engine on the current ones: one report row per table"""
+    engine = CURRENT_ENGINE if engine is None else engine
+    report = []
+    for table in ENGINE_TABLES:
+        if table not in engine:
+            continue
+        expected, reference_s = _timed(REFERENCE_ENGINE[table], dataset['reference_inputs'], dataset)
+        actual, engine_s = _timed(engine[table], dataset, dataset)
+        mismatches = compare_tables(expected, actual, rtol)
+        report.append({
+            'dataset': dataset['name'],
+            'table': table,
+            'rows': 0 if expected is None else len(expected),
+            'reference_s': reference_s,
+            'engine_s': engine_s,
+            'speedup': reference_s / engine_s if engine_s > 0 else float('inf'),
+            'mismatches': mismatches
+        })
+    return report
+
+def load_engine(spec):
+    """Engine dict from 'package.module' (its ENGINE attribute) or 'package.module:attribute'"""
+    module_name, _, attribute = spec.partition(':')
+    engine = getattr(importlib.import_module(module_name), attribute or 'ENGINE')
+    unknown = set(engine) - set(ENGINE_TABLES)
+    if unknown:
+        raise KeyError(f"{spec}: unknown tables {sorted(unknown)}")
+    return engine
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seeds', type=int, nargs='*', default=DEFAULT_SEEDS, help='randomized dataset seeds')
+    parser.add_argument('--farms', type=int, default=DEFAULT_FARMS, help='farms per randomized dataset')
+    parser.add_argument('--master', help='recorded master sheet export (CSV or Excel)')
+    parser.add_argument('--water', help='recorded water level upload (CSV or Excel)')
+    parser.add_argument('--start', type=date.fromisoformat, help='analysis start for the recorded dataset')
+    parser.add_argument('--end', type=date.fromisoformat, help='analysis end for the recorded dataset')
+    parser.add_argument('--engine', help='engine under test as package.module[:attribute]; default is the live engine')
+    parser.add_argument('--rtol', type=float, default=RELATIVE_TOLERANCE, help='relative tolerance for numbers')
+    args = parser.parse_args(argv)
+    if bool(args.master) != bool(args.water):
+        parser.error('--master and --water go together')
+
+    engine = load_engine(args.engine) if args.engine else CURRENT_ENGINE
+    datasets = [random_dataset(seed, args.farms) for seed in args.seeds]
+    if args.master:
+        datasets.append(recorded_dataset(args.master, args.water, args.start, args.end))
+
+    total_mismatches = 0
+    reference_total_s = engine_total_s = 0.0
+    for dataset in datasets:
+        print(f"{dataset['name']}: {len(dataset['master_df'])} farms, {len(dataset['water_df'])} readings, "
+              f"{dataset['start_date']} to {dataset['end_date']}")
+        for row in check_engine(dataset, engine, args.rtol):
+            total_mismatches += len(row['mismatches'])
+            reference_total_s += row['reference_s']
+            engine_total_s += row['engine_s']
+            print(f"  {row['table']:<14} {row['rows']:>6} rows  reference {row['reference_s']:.3f}s  "
+                  f"engine {row['engine_s']:.3f}s  speedup {row['speedup']:.1f}x  "
+                  f"mismatches {len(row['mismatches'])}")
+            for mismatch in row['mismatches'][:MISMATCHES_SHOWN]:
+                print(f"    row {mismatch['row']} {mismatch['column']}: "
+                      f"expected {mismatch['expected']!r}, got {mismatch['actual']!r}")
+
+    speedup = reference_total_s / engine_total_s if engine_total_s > 0 else float('inf')
+    print(f"total: reference {reference_total_s:.3f}s, engine {engine_total_s:.3f}s, speedup {speedup:.1f}x, "
+          f"mismatches {total_mismatches}")
+    print("OK" if total_mismatches == 0 else "FAIL")
+    return 1 if total_mismatches else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
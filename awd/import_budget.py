@@ -0,0 +1,156 @@
+"""Startup budget check: cold import time, per-rerun script time and lazily imported dependencies
+
+    python -m awd.import_budget [--app App.py] [--cold-budget 0.5] [--rerun-budget 1.0] [--farms 80]
+
+Cold start imports the modules App.py uses in a fresh interpreter, after
+streamlit/pandas/numpy, and times only the awd part; none of LAZY_MODULES
+may be loaded by it. Reruns execute App.py through streamlit's AppTest
+with placeholder credentials on a generated fixture (awd.golden): the
+cleaned master is seeded into the shared master cache on disk and the
+water readings are uploaded, so reruns time the cached data path with
+master and readings loaded, and must not load the Google stack either.
+Exits 1 when a budget is exceeded.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+DEFAULT_COLD_BUDGET_S = 0.5
+DEFAULT_RERUN_BUDGET_S = 1.0
+RERUNS = 5
+FIXTURE_FARMS = 80
+FIXTURE_SEED = 0
+# Never fetched: the fixture master is served from the seeded master cache
+FIXTURE_SHEET_URL = 'https://docs.google.com/spreadsheets/d/import-budget-fixture'
+FIXTURE_WORKSHEET = 'Farm details'
+
+# Heavy dependencies that must only load when a feature needs them
+LAZY_MODULES = ['gspread', 'google.oauth2', 'google.auth', 'matplotlib']
+
+APP_MODULES = ['awd.cleaning', 'awd.incremental', 'awd.rolling_compliance', 'awd.tables', 'awd.charts',
+               'awd.sql_store', 'awd.ui.caches', 'awd.ui.config', 'awd.ui.fragments', 'awd.ui.session']
+
+PLACEHOLDER_CREDENTIALS = {'type': 'service_account', 'project_id': 'budget', 'private_key_id': 'budget',
+                           'private_key': 'budget', 'client_email': 'budget@example.com', 'client_id': 'budget',
+                           'auth_uri': '', 'token_uri': '', 'auth_provider_x509_cert_url': '',
+                           'client_x509_cert_url': '', 'universe_domain': 'googleapis.com'}
+
+_COLD_PROBE = '''
+import importlib, json, sys, time
+import numpy, pandas, streamlit
+baseline = set(sys.modules)
+started = time.perf_counter()
+for name in {modules!r}:
+    importlib.import_module(name)
+elapsed = time.perf_counter() - started
+loaded = [name for name in sys.modules if name not in baseline]
+print(json.dumps({{'elapsed_s': elapsed, 'loaded': loaded}}))
+'''
+
+def _lazy_violations(module_names):
+    """Entries of LAZY_MODULES that were loaded (directly or through a submodule)"""
+    return [lazy for lazy in LAZY_MODULES
+            if any(name == lazy or name.startswith(lazy + '.') for name in module_names)]
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def measure_cold_import():
+    """Time the awd imports of App.py in a fresh interpreter; returns (seconds, lazily-imported modules loaded)"""
+    probe = subprocess.run([sys.executable, '-c', _COLD_PROBE.format(modules=APP_MODULES)], cwd=PACKAGE_ROOT,
+                           capture_output=True, text=True, check=True)
+    result = json.loads(probe.stdout.strip().splitlines()[-1])
+    return result['elapsed_s'], _lazy_violations(result['loaded'])
+
+def seed_fixture(cache_dir, farms=FIXTURE_FARMS, seed=FIXTURE_SEED):
+    """Seed the shared master cache in cache_dir with a generated master; returns the matching water upload (xlsx bytes)"""
+    from awd import golden
+    from awd.cleaning import clean_master_data
+    from awd.shared_cache import SharedMasterCache
+
+    raw_master = golden.random_raw_master(farms, seed)
+    master_df, farm_pipe_mapping = clean_master_data(raw_master)
+    if master_df is None:
+        raise RuntimeError("fixture master data could not be cleaned")
+    # Same key App.py builds: (sheet_url, worksheet_name, use_arrow_dtypes)
+    SharedMasterCache(cache_dir).get_or_load((FIXTURE_SHEET_URL, FIXTURE_WORKSHEET, False),
+                                             lambda: (master_df, farm_pipe_mapping))
+    water_file = BytesIO()
+    golden.random_raw_water(raw_master, seed + 1000).to_excel(water_file, index=False)
+    return water_file.getvalue()
+
+def measure_reruns(app_path, reruns=RERUNS, farms=FIXTURE_FARMS):
+    """Run App.py on the fixture once, then time reruns; returns (first run s, median rerun s, lazy modules loaded)"""
+    from streamlit.testing.v1 import AppTest
+
+    with tempfile.TemporaryDirectory(prefix='awd-import-budget-') as work_dir:
+        water_bytes = seed_fixture(os.path.join(work_dir, 'master'), farms)
+        app = AppTest.from_file(app_path, default_timeout=60)
+        app.secrets['gcp_service_account'] = PLACEHOLDER_CREDENTIALS
+        app.secrets['app_config'] = {'sheet_url': FIXTURE_SHEET_URL, 'worksheet_name': FIXTURE_WORKSHEET,
+                                     'use_arrow_dtypes': False,
+                                     'master_cache_dir': os.path.join(work_dir, 'master'),
+                                     'analytics_db_path': os.path.join(work_dir, 'awd_analytics.db'),
+                                     'reading_map_dir': os.path.join(work_dir, 'readings'),
+                                     'snapshot_dir': ''}
+
+        app.run()
+        if app.exception:
+            raise RuntimeError(f"App.py raised: {app.exception[0].value}")
+        # The first run after the upload parses and cleans the readings; reruns then hit the caches
+        app.file_uploader[0].upload('water.xlsx', water_bytes,
+                                    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+        started = time.perf_counter()
+        app.run()
+        first_s = time.perf_counter() - started
+        if app.exception:
+            raise RuntimeError(f"App.py raised: {app.exception[0].value}")
+        if not any('Water:' in element.value for element in app.success):
+            raise RuntimeError("App.py did not load the fixture water readings")
+
+        timings = []
+        for _ in range(reruns):
+            started = time.perf_counter()
+            app.run()
+            timings.append(time.perf_counter() - started)
+    return first_s, statistics.median(timings), _lazy_violations(sys.modules)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--app', default='App.py', help='Streamlit script to rerun')
+    parser.add_argument('--cold-budget', type=float, default=DEFAULT_COLD_BUDGET_S,
+                        help='seconds allowed for importing the awd modules')
+    parser.add_argument('--rerun-budget', type=float, default=DEFAULT_RERUN_BUDGET_S,
+                        help='seconds allowed for the median script rerun')
+    parser.add_argument('--farms', type=int, default=FIXTURE_FARMS, help='farms in the generated fixture')
+    args = parser.parse_args(argv)
+    app_path = os.path.abspath(args.app)
+
+    failures = []
+    cold_s, cold_lazy = measure_cold_import()
+    print(f"cold import of awd modules: {cold_s:.3f}s (budget {args.cold_budget:.3f}s)")
+    if cold_s > args.cold_budget:
+        failures.append('cold import over budget')
+    if cold_lazy:
+        failures.append(f"cold import loaded {', '.join(cold_lazy)}")
+
+    first_s, rerun_s, rerun_lazy = measure_reruns(app_path, farms=args.farms)
+    print(f"first script run: {first_s:.3f}s; median rerun: {rerun_s:.3f}s (budget {args.rerun_budget:.3f}s)")
+    if rerun_s > args.rerun_budget:
+        failures.append('rerun over budget')
+    if rerun_lazy:
+        failures.append(f"script runs loaded {', '.join(rerun_lazy)}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if not failures:
+        print("OK")
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""Per-farm fingerprints and incremental recomputation of per-farm tables"""
+import numpy as np
+import pandas as pd
+
+from awd.reporting import LOG
+
+# Master columns that feed the per-farm analyses; a change in any of them invalidates the farm
+MASTER_DIFF_COLUMNS = ['Farmer_Name', 'Village', 'Incentive_Acres', 'Group',
+                       'Payment_Eligible', 'Incentive_To_Give', 'Pipe_Codes']
+
+def compute_farm_fingerprints(master_df, water_df):
+    """Hash each farm's master attributes and mapped water readings, keyed by Farm_ID"""
+    master_cols = master_df[MASTER_DIFF_COLUMNS].copy()
+    master_cols['Pipe_Codes'] = master_cols['Pipe_Codes'].apply(lambda codes: '|'.join(codes))
+    master_hash = pd.Series(
+        pd.util.hash_pandas_object(master_cols, index=False).values,
+        index=master_df['Farm_ID'].values
+    ).groupby(level=0).sum()  # Duplicate Farm_IDs fold into one hash
+
+    # Readings are hashed per farm too, so a pipe that moves between farms or a
+    # re-uploaded water file only invalidates the farms whose readings changed
+    water_hash = pd.Series(
+        pd.util.hash_pandas_object(water_df[['Date', 'Pipe_ID', 'Water_Level_mm']], index=False).values,
+        index=water_df['Farm_ID'].values
+    ).groupby(level=0).sum()
+
+    fingerprints = pd.DataFrame({'master_hash': master_hash})
+    fingerprints['water_hash'] = water_hash.reindex(fingerprints.index).fillna(0).astype('uint64')
+    return fingerprints
+
+def diff_farm_fingerprints(old_fingerprints, new_fingerprints):
+    """Return (changed_or_added, removed) Farm_ID sets between two fingerprint frames"""
+    common = old_fingerprints.index.intersection(new_fingerprints.index)
+    differs = (old_fingerprints.loc[common] != new_fingerprints.loc[common]).any(axis=1)
+    changed = set(common[differs.values])
+    added = set(new_fingerprints.index.difference(old_fingerprints.index))
+    removed = set(old_fingerprints.index.difference(new_fingerprints.index))
+    return changed | added, removed
+
+def order_by_master(table_df, master_df, extra_keys=None):
+    """Restore master-sheet farm order (optionally after leading keys such as Week)"""
+    farm_position = pd.Series(range(len(master_df)), index=master_df['Farm_ID'].values).groupby(level=0).first()
+    ordered = table_df.assign(_farm_position=table_df['Farm_ID'].map(farm_position))
+    ordered = ordered.sort_values((extra_keys or []) + ['_farm_position'], kind='stable')
+    return ordered.drop(columns='_farm_position').reset_index(drop=True)
+
+def select_farms(master_df, water_df, farm_pipe_mapping, groups=None, villages=None):
+    """Restrict master data, readings and pipe mapping to the selected groups/villages
+
+    Applied before any compliance work so a filtered view only pays for its
+    own farms. Readings were already mapped to farms, so keeping the rows of
+    the selected Farm_IDs preserves the pipe-to-farm assignment.
+    """
+    keep = np.ones(len(master_df), dtype=bool)
+    if groups:
+        keep &= master_df['Group'].isin(groups).to_numpy()
+    if villages:
+        keep &= master_df['Village'].isin(villages).to_numpy()
+    if keep.all():
+        return master_df, water_df, farm_pipe_mapping
+
+    selected_master = master_df[keep]
+    selected_farms = set(selected_master['Farm_ID'])
+    selected_water = water_df[water_df['Farm_ID'].isin(selected_farms)]
+    selected_mapping = {farm_id: pipe_codes for farm_id, pipe_codes in farm_pipe_mapping.items()
+                        if farm_id in selected_farms}
+    return selected_master, selected_water, selected_mapping
+
+def get_incremental_farm_table(table_name, compute_fn, master_df, water_df, farm_pipe_mapping,
+                               start_date, end_date, fingerprints, cache, order_keys=None, notify=LOG.info):
+    """Return a per-farm analysis table, recomputing only farms changed since the run cached in cache
+
+    cache is a dict owned by the caller (a session's table cache); the new
+    table and its fingerprints are stored back into it under table_name.
+    """
+    cached = cache.get(table_name)
+
+    if cached is None or cached['date_range'] != (start_date, end_date):
+        table_df = compute_fn(master_df, water_df, farm_pipe_mapping, start_date, end_date)
+        changed_farms, removed_farms = set(fingerprints.index), set()
+    else:
+        changed_farms, removed_farms = diff_farm_fingerprints(cached['fingerprints'], fingerprints)
+        table_df = cached['table']
+
+        if changed_farms or removed_farms:
+            stale_farms = changed_farms | removed_farms
+            kept_df = table_df[~table_df['Farm_ID'].isin(stale_farms)]
+            fresh_df = compute_fn(master_df[master_df['Farm_ID'].isin(changed_farms)], water_df,
+                                  farm_pipe_mapping, start_date, end_date)
+            if fresh_df is None:
+                return None
+            if list(fresh_df.columns) != list(kept_df.columns):
+                # Data-dependent layout (e.g. one Reading_k column pair per reading) changed: rebuild whole table
+                table_df = compute_fn(master_df, water_df, farm_pipe_mapping, start_date, end_date)
+                if table_df is None:
+                    return None
+            else:
+                table_df = order_by_master(pd.concat([kept_df, fresh_df], ignore_index=True), master_df, order_keys)
+            notify(f"♻️ {table_name}: recomputed {len(changed_farms)} changed farms, "
+                    f"removed {len(removed_farms)}, reused {fingerprints.index.size - len(changed_farms)}")
+
+    if table_df is not None:
+        cache[table_name] = {
+            'generation': cached['generation'] + 1 if cached else 1,
+            'date_range': (start_date, end_date),
+            'fingerprints': fingerprints,
+            'table': table_df,
+            'changed_farms': changed_farms,
+            'removed_farms': removed_farms
+        }
+    return table_df
@@ -0,0 +1,46 @@
+"""Process-wide counters and timings for the analysis pipeline"""
+import threading
+import time
+from contextlib import contextmanager
+
+_lock = threading.Lock()
+_counters = {}
+_timings = {}
+
+def increment(name, value=1):
+    """Add to a running counter"""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+def record(name, value):
+    """Set a counter to the value seen on the latest run"""
+    with _lock:
+        _counters[name] = value
+
+@contextmanager
+def timed(name):
+    """Accumulate wall-clock time spent inside the block"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        with _lock:
+            timing = _timings.setdefault(name, {'calls': 0, 'total_s': 0.0, 'last_s': 0.0})
+            timing['calls'] += 1
+            timing['total_s'] += elapsed
+            timing['last_s'] = elapsed
+
+def snapshot():
+    """Copy of all counters and timings"""
+    with _lock:
+        return {
+            'counters': dict(_counters),
+            'timings': {name: dict(timing) for name, timing in _timings.items()}
+        }
+
+def reset():
+    """Clear all counters and timings"""
+    with _lock:
+        _counters.clear()
+        _timings.clear()
@@ -0,0 +1,144 @@
+"""Background analysis jobs with progress, partial results and cancellation"""
+import itertools
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from awd import instrumentation
+
+DEFAULT_MAX_WORKERS = 2
+POLL_INTERVAL_S = 0.5  # how often a session re-renders a running job
+MAX_FINISHED_JOBS = 50
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+ACTIVE_STATES = (QUEUED, RUNNING)
+
+class JobCancelled(Exception):
+    """Raised inside a job when cancellation was requested"""
+
+class Job:
+    """State of one submitted job; the worker updates it, sessions read it
+
+    The job function receives the Job as its first argument and reports
+    through progress() and add_partial(); it should call check_cancelled()
+    between units of work.
+    """
+
+    def __init__(self, job_id, label):
+        self.job_id = job_id
+        self.label = label
+        self.status = QUEUED
+        self.phase = ''
+        self.done = 0
+        self.total = 0
+        self.message = ''
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._partials = []
+        self._lock = threading.Lock()
+        self._cancel_event = threading.Event()
+
+    def progress(self, phase, done, total, message=''):
+        with self._lock:
+            self.phase, self.done, self.total, self.message = phase, done, total, message
+
+    def add_partial(self, key, value):
+        """Publish a partial result (e.g. one village's farm rows) as soon as it is ready"""
+        with self._lock:
+            self._partials.append((key, value))
+
+    def partials(self, key=None):
+        with self._lock:
+            return [value for partial_key, value in self._partials if key is None or partial_key == key]
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    @property
+    def cancel_requested(self):
+        return self._cancel_event.is_set()
+
+    def check_cancelled(self):
+        if self._cancel_event.is_set():
+            raise JobCancelled()
+
+    @property
+    def fraction(self):
+        return self.done / self.total if self.total else 0.0
+
+    @property
+    def elapsed_s(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+class JobRegistry:
+    """Local worker pool plus the jobs submitted to it, shared by all sessions
+
+    One instance lives for the whole process (see st.cache_resource in
+    App.py). Finished jobs are kept for retrieval until MAX_FINISHED_JOBS
+    newer ones have finished.
+    """
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='awd-job')
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._ids = itertools.count(1)
+
+    def submit(self, label, fn, *args, **kwargs):
+        """Run fn(job, *args, **kwargs) in the pool; returns the job_id"""
+        with self._lock:
+            job_id = f"job-{next(self._ids):05d}"
+            job = Job(job_id, label)
+            self._jobs[job_id] = job
+            self._prune()
+        instrumentation.increment('jobs.submitted')
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job_id
+
+    def _run(self, job, fn, args, kwargs):
+        job.started_at = time.time()
+        job.status = RUNNING
+        try:
+            job.check_cancelled()
+            job.result = fn(job, *args, **kwargs)
+            job.status = DONE
+        except JobCancelled:
+            job.status = CANCELLED
+        except Exception as e:
+            job.error = f"{e}\n{traceback.format_exc()}"
+            job.status = FAILED
+        finally:
+            job.finished_at = time.time()
+            instrumentation.increment(f'jobs.{job.status}')
+            instrumentation.record('jobs.last_elapsed_s', round(job.elapsed_s, 3))
+
+    def _prune(self):
+        finished = [job for job in self._jobs.values() if job.status not in ACTIVE_STATES]
+        finished.sort(key=lambda job: job.finished_at or job.submitted_at)
+        for job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job.job_id]
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        job = self._jobs.get(job_id)
+        if job is not None and job.status in ACTIVE_STATES:
+            job.cancel()
+            return True
+        return False
+
+    def stats(self):
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+        return {status: statuses.count(status) for status in (QUEUED, RUNNING, DONE, FAILED, CANCELLED)}
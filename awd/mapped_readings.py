@@ -0,0 +1,232 @@
+"""Cleaned readings in memory-mapped files shared by every server worker process
+
+A dataset (one cleaned water upload) lives under root/<dataset digest>/:
+
+    v0001/, v0002/, ...  one .npy file per water_df column plus the compact
+                         per-pipe reading store arrays (see timeseries);
+                         its series farm and pipe ids are mapped as
+                         categoricals
+    CURRENT              name of the version readers open
+
+Strings are dictionary-encoded: integer codes in the .npy file (in the
+width pandas uses for that many categories) and the distinct values in
+meta.json; dates are stored as int64 in their original unit. The cleaning
+rejection report and the original column dtypes are kept alongside as
+pickles. A version is written to a temporary directory and
+renamed into place under an exclusive lock on root/<dataset digest>/.lock,
+so workers publishing at once take consecutive version numbers. It is then
+published by atomically replacing CURRENT, so a worker never maps a
+half-written version and a republished dataset is swapped in as a whole.
+Workers map the files read-only (mmap_mode='r'); the pages are shared
+through the OS page cache, so adding workers does not add copies of
+the readings. Numeric and date columns whose dtype the file holds as is
+stay mapped; string columns and Arrow-backed columns are converted back to
+their original dtype, once per process and version.
+
+Only the last KEEP_VERSIONS versions of a dataset are kept, and only the
+KEEP_DATASETS most recently published or opened datasets under root: every
+master reload or new upload is a new dataset, and the older ones are
+removed when another is published.
+"""
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from awd import instrumentation, timeseries
+from awd.arrow import to_numpy_datetimes
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows: only threads of one process are serialized
+    fcntl = None
+
+DEFAULT_READING_MAP_DIR = os.path.join('.awd_cache', 'readings')
+KEEP_VERSIONS = 2
+KEEP_DATASETS = 4
+STORE_ARRAYS = ['offsets', 'day', 'level', 'level_rem']
+STORE_IDS = ['farm_ids', 'pipe_ids']
+
+def _write_pointer(path, value):
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, 'w') as handle:
+        handle.write(value)
+    os.replace(temp_path, path)
+
+@contextmanager
+def _dataset_lock(dataset_dir, blocking=True):
+    """Exclusive lock on dataset_dir/.lock shared by every process (a no-op where fcntl is unavailable)
+
+    Yields False instead of waiting when blocking is off and another process holds the lock.
+    """
+    if fcntl is None:
+        yield True
+        return
+    with open(os.path.join(dataset_dir, '.lock'), 'a') as handle:
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+def _last_used(dataset_dir):
+    try:
+        return os.path.getmtime(os.path.join(dataset_dir, 'CURRENT'))
+    except OSError:
+        return 0.0
+
+def _encode_column(values):
+    """(array to save, column meta) for one water_df column"""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        dates = to_numpy_datetimes(values).to_numpy()
+        return dates.view(np.int64), {'kind': 'datetime', 'dtype': str(dates.dtype)}
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        array = values.to_numpy(dtype=float, na_value=np.nan) if values.hasnans else values.to_numpy()
+        return array, {'kind': 'numeric'}
+    codes, uniques = pd.factorize(values.astype(object))
+    codes_dtype = np.int8 if len(uniques) < 2 ** 7 else np.int16 if len(uniques) < 2 ** 15 else np.int32
+    return codes.astype(codes_dtype), {'kind': 'codes', 'values': [str(value) for value in uniques]}
+
+def _decode_column(array, meta, dtype=None):
+    """Mapped column from its saved array; converted to dtype (the column's original) when that differs"""
+    if meta['kind'] == 'datetime':
+        values = array.view(meta['dtype'])
+    elif meta['kind'] == 'codes':
+        values = pd.Categorical.from_codes(array, categories=pd.Index(meta['values'], dtype=object), validate=False)
+    else:
+        values = array
+    if dtype is None or values.dtype == dtype:
+        return values
+    return pd.Series(values, copy=False).astype(dtype).array
+
+class MappedReadingStore:
+    """Memory-mapped water datasets under root, one CURRENT version per dataset key"""
+
+    def __init__(self, root=DEFAULT_READING_MAP_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+        self._opened = {}  # dataset key -> (version, mapped dataset) already mapped by this process
+
+    def _dataset_dir(self, key):
+        return os.path.join(self.root, hashlib.sha1(repr(key).encode('utf-8')).hexdigest())
+
+    def current_version(self, key):
+        try:
+            with open(os.path.join(self._dataset_dir(key), 'CURRENT')) as handle:
+                return handle.read().strip() or None
+        except OSError:
+            return None
+
+    def publish(self, key, water_df, rejections=None):
+        """Write water_df, its reading store and rejection report as the dataset's next version and make it current"""
+        dataset_dir = self._dataset_dir(key)
+        os.makedirs(dataset_dir, exist_ok=True)
+        temp_dir = os.path.join(dataset_dir, f".publish.{os.getpid()}.{threading.get_ident()}.tmp")
+        os.makedirs(temp_dir)
+
+        columns = {}
+        for position, column in enumerate(water_df.columns):
+            array, columns[column] = _encode_column(water_df[column])
+            columns[column]['file'] = f"column_{position}.npy"
+            np.save(os.path.join(temp_dir, columns[column]['file']), array)
+        reading_store = timeseries.build_reading_store(water_df)
+        store = {'epoch': str(reading_store['epoch'])}
+        for name in STORE_ARRAYS:
+            np.save(os.path.join(temp_dir, f"store_{name}.npy"), reading_store[name])
+        for name in STORE_IDS:
+            array, store[name] = _encode_column(pd.Series(reading_store[name], dtype=object))
+            np.save(os.path.join(temp_dir, f"store_{name}.npy"), array)
+        meta = {'columns': columns, 'rows': len(water_df), 'store': store}
+        with open(os.path.join(temp_dir, 'meta.json'), 'w') as handle:
+            json.dump(meta, handle)
+        with open(os.path.join(temp_dir, 'rejections.pkl'), 'wb') as handle:
+            pickle.dump(rejections, handle, protocol=pickle.HIGHEST_PROTOCOL)
+        with open(os.path.join(temp_dir, 'dtypes.pkl'), 'wb') as handle:
+            pickle.dump(water_df.dtypes.to_dict(), handle, protocol=pickle.HIGHEST_PROTOCOL)
+
+        # Workers in other processes publish to the same directory: the version
+        # number is chosen and renamed into place under the dataset's file lock
+        with self._lock, _dataset_lock(dataset_dir):
+            versions = [int(name[1:]) for name in os.listdir(dataset_dir) if name.startswith('v') and name[1:].isdigit()]
+            version = f"v{max(versions, default=0) + 1:04d}"
+            os.rename(temp_dir, os.path.join(dataset_dir, version))
+            _write_pointer(os.path.join(dataset_dir, 'CURRENT'), version)
+            self._prune(dataset_dir, version)
+        self._prune_datasets(dataset_dir)
+        instrumentation.increment('mapped_readings.published')
+        return version
+
+    def _prune(self, dataset_dir, current):
+        # Workers still mapping a removed version keep their pages until they reopen
+        for name in sorted(os.listdir(dataset_dir)):
+            if name.startswith('v') and name[1:].isdigit() and int(name[1:]) <= int(current[1:]) - KEEP_VERSIONS:
+                shutil.rmtree(os.path.join(dataset_dir, name), ignore_errors=True)
+
+    def _prune_datasets(self, keep_dir):
+        """Remove all but the KEEP_DATASETS most recently used datasets under root (never keep_dir)"""
+        dataset_dirs = [os.path.join(self.root, name) for name in os.listdir(self.root)
+                        if os.path.isdir(os.path.join(self.root, name))]
+        stale = sorted(dataset_dirs, key=_last_used, reverse=True)[KEEP_DATASETS:]
+        for dataset_dir in stale:
+            if os.path.samefile(dataset_dir, keep_dir):
+                continue
+            # A dataset another process is publishing right now is left for the next pass
+            with _dataset_lock(dataset_dir, blocking=False) as locked:
+                if locked:
+                    shutil.rmtree(dataset_dir, ignore_errors=True)
+                    instrumentation.increment('mapped_readings.datasets_pruned')
+
+    def open(self, key):
+        """Map the current version: {'version', 'water_df', 'reading_store', 'rejections'}, or None when there is none"""
+        version = self.current_version(key)
+        if version is None:
+            return None
+        dataset_dir = self._dataset_dir(key)
+        try:
+            # Every open counts as use, so datasets still being served are not pruned
+            os.utime(os.path.join(dataset_dir, 'CURRENT'))
+        except OSError:
+            pass
+        opened = self._opened.get(key)
+        if opened is not None and opened[0] == version:
+            return opened[1]
+
+        version_dir = os.path.join(dataset_dir, version)
+        try:
+            with open(os.path.join(version_dir, 'meta.json')) as handle:
+                meta = json.load(handle)
+            with open(os.path.join(version_dir, 'dtypes.pkl'), 'rb') as handle:
+                dtypes = pickle.load(handle)
+            water_df = pd.DataFrame({
+                column: _decode_column(np.load(os.path.join(version_dir, column_meta['file']), mmap_mode='r'),
+                                       column_meta, dtypes.get(column))
+                for column, column_meta in meta['columns'].items()
+            }, copy=False)
+            reading_store = {name: np.load(os.path.join(version_dir, f"store_{name}.npy"), mmap_mode='r')
+                             for name in STORE_ARRAYS}
+            for name in STORE_IDS:
+                reading_store[name] = _decode_column(
+                    np.load(os.path.join(version_dir, f"store_{name}.npy"), mmap_mode='r'), meta['store'][name]
+                )
+            with open(os.path.join(version_dir, 'rejections.pkl'), 'rb') as handle:
+                rejections = pickle.load(handle)
+        except (OSError, ValueError, KeyError, pickle.UnpicklingError):
+            # Pruned underneath us or unreadable: behave as if it was never published
+            return None
+        reading_store['epoch'] = np.datetime64(meta['store']['epoch'], 'D')
+
+        mapped = {'version': version, 'water_df': water_df, 'reading_store': reading_store, 'rejections': rejections}
+        with self._lock:
+            self._opened[key] = (version, mapped)
+        instrumentation.increment('mapped_readings.opened')
+        return mapped
@@ -0,0 +1,32 @@
+"""Payment run history and differential payment exports
+
+Every payment summary export is recorded as a payment run in the analytics
+store. The delta export records the current summary the same way and
+returns only the payees that are new, changed or reversed since the last
+run of the same period and group/village selection, so finance no longer
+diffs full payouts by hand.
+"""
+from awd import payments, sql_store
+
+def export_payment_summary(db_path, payment_summary, start_date, end_date, groups=None, villages=None):
+    """Record the summary as a payment run and return it as CSV text"""
+    sql_store.save_payment_run(db_path, payment_summary, start_date, end_date, groups, villages)
+    return payment_summary.to_csv(index=False)
+
+def payment_run_delta(db_path, payment_summary, start_date, end_date, groups=None, villages=None):
+    """Record the summary as a payment run; returns (payment_run_id, previous run id, delta rows)
+
+    The first recorded run of a period and selection has no previous run
+    and every payee is new.
+    """
+    payment_run_id = sql_store.save_payment_run(db_path, payment_summary, start_date, end_date, groups, villages)
+    previous_run_id = sql_store.previous_payment_run(db_path, payment_run_id)
+    if previous_run_id is None:
+        previous_summary = payment_summary.iloc[0:0]
+    else:
+        previous_summary = sql_store.load_payment_run(db_path, previous_run_id)
+    return payment_run_id, previous_run_id, payments.payment_delta(previous_summary, payment_summary)
+
+def export_payment_delta(db_path, payment_summary, start_date, end_date, groups=None, villages=None):
+    """Record the summary as a payment run and return only its changes since the previous run as CSV text"""
+    return payment_run_delta(db_path, payment_summary, start_date, end_date, groups, villages)[2].to_csv(index=False)
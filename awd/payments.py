@@ -0,0 +1,149 @@
+"""Vectorized incentive calculation and season payment ledger"""
+import numpy as np
+import pandas as pd
+
+INCENTIVE_RATE_PER_ACRE = 300  # ₹ per eligible acre
+PAYMENT_ELIGIBLE_GROUP = 'A Complied'
+
+PAYMENT_SUMMARY_COLUMNS = [
+    'Village', 'Farm_ID', 'Farmer_Name', 'Group', 'Valid_Farm', 'Total_Incentive_Acres',
+    'Valid_Pipes_Count', 'Pipes_Passing', 'Eligible_Acres', 'Farm_Proportion_Passing',
+    'Final_Incentive_Amount'
+]
+
+def compute_incentives(proportion, acres, payment_eligible, incentive_to_give=1):
+    """Return (eligible_acres, incentive_amount) arrays, rounded as reported
+
+    eligible acres = proportion × acres (2 dp); the amount is
+    eligible acres × rate for payment-eligible farms, times the
+    Incentive_To_Give flag, rounded to whole rupees from the unrounded acres.
+    """
+    eligible_acres = np.asarray(proportion, dtype=float) * np.asarray(acres, dtype=float)
+    amount = np.where(np.asarray(payment_eligible, dtype=bool), eligible_acres * INCENTIVE_RATE_PER_ACRE, 0.0)
+    amount = amount * np.asarray(incentive_to_give, dtype=float)
+    return np.round(eligible_acres, 2), np.round(amount, 0)
+
+def payment_summary(results_df):
+    """Farms receiving a payment for the period, highest payout first"""
+    payment_farms = results_df[results_df['Final_Incentive_Amount'] > 0]
+    if payment_farms.empty:
+        return pd.DataFrame()
+    return payment_farms[PAYMENT_SUMMARY_COLUMNS].sort_values('Final_Incentive_Amount', ascending=False)
+
+def build_payment_ledger(period_df, master_df, results_df=None):
+    """Build the farm × week payment ledger and its roll-ups in one vectorized pass
+
+    period_df holds one row per (Week, Farm_ID) with the week's
+    Proportion_Passing (the weekly breakdown table); acres and eligibility are
+    taken from master_df. Returns a dict of frames: ledger (with
+    cumulative-to-date amounts per farm), farm, week, village, group,
+    reconciliation and differences.
+
+    The ledger is reconciled per farm against amounts it did not compute:
+    the weekly breakdown's own Final_Incentive_Amount and, with results_df,
+    the period Final_Incentive_Amount of the farm analysis. differences
+    lists the farms where either disagrees with the ledger.
+    """
+    farm_terms = master_df.drop_duplicates('Farm_ID').set_index('Farm_ID')[
+        ['Incentive_Acres', 'Payment_Eligible', 'Incentive_To_Give']
+    ]
+    ledger = period_df[['Week', 'Week_Period', 'Village', 'Farm_ID', 'Farmer_Name', 'Group', 'Proportion_Passing']].join(
+        farm_terms, on='Farm_ID'
+    )
+    ledger['Eligible_Acres'], ledger['Amount'] = compute_incentives(
+        ledger['Proportion_Passing'], ledger['Incentive_Acres'],
+        ledger['Payment_Eligible'], ledger['Incentive_To_Give']
+    )
+    ledger = ledger.sort_values(['Farm_ID', 'Week'], kind='stable')
+    ledger['Cumulative_Amount'] = ledger.groupby('Farm_ID', sort=False)['Amount'].cumsum()
+    ledger['Cumulative_Eligible_Acres'] = ledger.groupby('Farm_ID', sort=False)['Eligible_Acres'].cumsum().round(2)
+    ledger = ledger.sort_values(['Week', 'Village', 'Farm_ID'], kind='stable').reset_index(drop=True)
+
+    paid = ledger.assign(Paid=ledger['Amount'] > 0)
+    farm = paid.groupby(['Village', 'Farm_ID', 'Farmer_Name', 'Group'], sort=True).agg(
+        Weeks=('Week', 'size'),
+        Weeks_Paid=('Paid', 'sum'),
+        Season_Eligible_Acres=('Eligible_Acres', 'sum'),
+        Season_Amount=('Amount', 'sum')
+    ).reset_index()
+    farm['Season_Eligible_Acres'] = farm['Season_Eligible_Acres'].round(2)
+
+    week = paid.groupby(['Week', 'Week_Period'], sort=True).agg(
+        Farms_Paid=('Paid', 'sum'),
+        Week_Amount=('Amount', 'sum')
+    ).reset_index()
+    week['Cumulative_Amount'] = week['Week_Amount'].cumsum()
+
+    village = ledger.groupby('Village', sort=True).agg(
+        Farms=('Farm_ID', 'nunique'),
+        Season_Amount=('Amount', 'sum')
+    )
+    group = ledger.groupby('Group', sort=True).agg(
+        Farms=('Farm_ID', 'nunique'),
+        Season_Amount=('Amount', 'sum')
+    )
+
+    # Per-farm amounts from the independent sources, next to the ledger's season amount
+    sources = {'Weekly_Table_Amount': period_df.groupby('Farm_ID', sort=True)['Final_Incentive_Amount'].sum()}
+    if results_df is not None:
+        sources['Period_Amount'] = results_df.groupby('Farm_ID', sort=True)['Final_Incentive_Amount'].sum()
+    comparison = farm.set_index('Farm_ID')[['Village', 'Farmer_Name', 'Group', 'Season_Amount']]
+    checks = {}
+    for column, amounts in sources.items():
+        comparison[column] = amounts.reindex(comparison.index, fill_value=0.0).astype(float)
+        differs = ~np.isclose(comparison['Season_Amount'], comparison[column])
+        checks[column] = {
+            'Ledger_Amount': comparison['Season_Amount'].sum(),
+            'Source_Amount': comparison[column].sum(),
+            'Difference': comparison['Season_Amount'].sum() - comparison[column].sum(),
+            'Farms_Different': int(differs.sum()),
+            'Reconciled': not differs.any()
+        }
+        comparison[column.replace('_Amount', '_Difference')] = comparison['Season_Amount'] - comparison[column]
+    reconciliation = pd.DataFrame.from_dict(checks, orient='index')
+    reconciliation.index = reconciliation.index.map({'Weekly_Table_Amount': 'Weekly breakdown',
+                                                     'Period_Amount': 'Period payment (farm analysis)'})
+    difference_columns = [column for column in comparison.columns if column.endswith('_Difference')]
+    differences = comparison[~np.isclose(comparison[difference_columns], 0).all(axis=1)].reset_index()
+
+    return {
+        'ledger': ledger,
+        'farm': farm,
+        'week': week,
+        'village': village,
+        'group': group,
+        'reconciliation': reconciliation,
+        'differences': differences
+    }
+
+PAYMENT_DELTA_COLUMNS = [
+    'Change', 'Village', 'Farm_ID', 'Farmer_Name', 'Group', 'Previous_Amount', 'Final_Incentive_Amount',
+    'Amount_Change'
+]
+
+def payment_delta(previous_summary, current_summary):
+    """Payees that changed between two payment summaries, joined on Farm_ID
+
+    Change is 'new' for farms paid now and not before, 'changed' when the
+    amount differs and 'reversed' for farms paid before and not now (their
+    Amount_Change is the negative of the earlier payment). Farms paid the
+    same amount are left out. One hash join, so linear in the ledger size.
+    """
+    identity = ['Village', 'Farm_ID', 'Farmer_Name', 'Group']
+    current = current_summary.reindex(columns=PAYMENT_SUMMARY_COLUMNS)[identity + ['Final_Incentive_Amount']]
+    previous = previous_summary.reindex(columns=PAYMENT_SUMMARY_COLUMNS)[identity + ['Final_Incentive_Amount']]
+    merged = current.astype({'Farm_ID': str}).merge(
+        previous.astype({'Farm_ID': str}).rename(columns={'Final_Incentive_Amount': 'Previous_Amount'}),
+        on='Farm_ID', how='outer', suffixes=('', '_Previous'), sort=False, indicator=True
+    )
+    for column in ['Village', 'Farmer_Name', 'Group']:
+        merged[column] = merged[column].fillna(merged.pop(f'{column}_Previous'))
+    merged['Final_Incentive_Amount'] = merged['Final_Incentive_Amount'].fillna(0.0)
+    merged['Previous_Amount'] = merged['Previous_Amount'].fillna(0.0)
+    merged['Amount_Change'] = merged['Final_Incentive_Amount'] - merged['Previous_Amount']
+    merged['Change'] = np.select(
+        [merged['_merge'] == 'left_only', merged['_merge'] == 'right_only', merged['Amount_Change'] != 0],
+        ['new', 'reversed', 'changed'], default=''
+    )
+    delta = merged[merged['Change'] != ''][PAYMENT_DELTA_COLUMNS]
+    return delta.sort_values(['Change', 'Village', 'Farm_ID'], kind='stable').reset_index(drop=True)
@@ -0,0 +1,63 @@
+"""Per-farm pipe status bitmasks
+
+The compliance engine emits three small integers per farm row, one bit per
+assigned pipe in Pipe_Codes order (bit 0 = first pipe, at most five pipes):
+
+    Pipe_Data_Mask       pipe has ≥1 reading in the period (a valid pipe)
+    Pipe_Compliant_Mask  pipe meets the compliance rule
+    Pipe_Single_Mask     pipe has exactly one reading
+
+Farm filters are bitwise tests on these columns instead of comparisons
+against the '1' / 'None' string sentinels of the display columns.
+"""
+import numpy as np
+
+MAX_PIPES = 5
+MASK_DTYPE = np.uint8
+
+DATA_MASK = 'Pipe_Data_Mask'
+COMPLIANT_MASK = 'Pipe_Compliant_Mask'
+SINGLE_MASK = 'Pipe_Single_Mask'
+PIPE_MASK_COLUMNS = [DATA_MASK, COMPLIANT_MASK, SINGLE_MASK]
+
+# Number of set bits for every mask value
+_POPCOUNT = np.array([bin(value).count('1') for value in range(1 << MAX_PIPES)], dtype=np.int64)
+
+def pipe_bit(pipe_index):
+    """Bit of the pipe at pipe_index in the farm's Pipe_Codes"""
+    return 1 << pipe_index
+
+def assigned_mask(pipe_counts):
+    """Mask with one bit set per assigned pipe"""
+    return ((1 << np.asarray(pipe_counts, dtype=np.int64)) - 1).astype(MASK_DTYPE)
+
+def popcount(masks):
+    """Pipes set in each mask"""
+    return _POPCOUNT[np.asarray(masks, dtype=np.int64)]
+
+def has_pipe_masks(farm_df):
+    return all(column in farm_df.columns for column in PIPE_MASK_COLUMNS)
+
+def _masks(farm_df, column):
+    return farm_df[column].to_numpy(dtype=np.int64)
+
+def valid_farms(farm_df):
+    """Farms with at least one valid pipe (Valid_Farm == '1')"""
+    return _masks(farm_df, DATA_MASK) != 0
+
+def no_valid_pipes(farm_df):
+    """Farms where no assigned pipe has a reading"""
+    return _masks(farm_df, DATA_MASK) == 0
+
+def missing_pipe_data(farm_df):
+    """Farms where some but not all assigned pipes have readings"""
+    data = _masks(farm_df, DATA_MASK)
+    return (data != 0) & (data != assigned_mask(farm_df['Total_Assigned_Pipes']))
+
+def non_compliant_pipes(farm_df):
+    """Farms with at least one valid pipe that fails the compliance rule"""
+    return (_masks(farm_df, DATA_MASK) & ~_masks(farm_df, COMPLIANT_MASK)) != 0
+
+def single_reading_pipes(farm_df):
+    """Farms with at least one pipe judged on a single reading"""
+    return _masks(farm_df, SINGLE_MASK) != 0
@@ -0,0 +1,132 @@
+"""Developer profiling of one analysis run
+
+Set AWD_PROFILE=1 in the server environment, or open the page with
+?profile=1, and the next "Run Compliance Analysis" is profiled from a cold
+table cache (so the engine does all the work a slow production run does).
+Each profiled step writes three files to AWD_PROFILE_DIR
+(.awd_cache/profiles by default):
+
+    <run>.prof       cProfile stats (python -m pstats, snakeviz)
+    <run>.collapsed  sampled stacks, one 'frame;frame;... count' line per
+                     distinct stack (flamegraph.pl, speedscope); frames are
+                     'function (file:line)', so the line that was running in
+                     each caller is kept
+    <run>.json       dataset size, elapsed time, sample count and the top
+                     functions by cumulative time
+
+cProfile and the sampler only follow the thread that runs the step.
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+PROFILE_ENV = 'AWD_PROFILE'
+PROFILE_DIR_ENV = 'AWD_PROFILE_DIR'
+PROFILE_QUERY_PARAM = 'profile'
+DEFAULT_PROFILE_DIR = os.path.join('.awd_cache', 'profiles')
+SAMPLE_INTERVAL_S = 0.005
+TOP_FUNCTIONS = 25
+
+def profiling_enabled(query_params=None):
+    """True when AWD_PROFILE or the ?profile= query parameter is set to 1/true/yes"""
+    values = [os.environ.get(PROFILE_ENV, '')]
+    if query_params is not None:
+        values.append(query_params.get(PROFILE_QUERY_PARAM, ''))
+    return any(str(value).strip().lower() in ('1', 'true', 'yes') for value in values)
+
+def profile_dir():
+    return os.environ.get(PROFILE_DIR_ENV) or DEFAULT_PROFILE_DIR
+
+def dataset_size(master_df, water_df, farm_pipe_mapping, start_date, end_date):
+    """Size of the analysis inputs, recorded with every profile"""
+    return {
+        'farms': int(len(master_df)),
+        'pipes': int(sum(len(pipes) for pipes in farm_pipe_mapping.values())),
+        'readings': int(len(water_df)),
+        'water_memory_mb': round(water_df.memory_usage(deep=True).sum() / 1e6, 1),
+        'start_date': str(start_date),
+        'end_date': str(end_date)
+    }
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})".replace(';', ',')
+
+class StackSampler:
+    """Counts the stacks of one thread, sampled every interval_s from a daemon thread"""
+
+    def __init__(self, thread_id, interval_s=SAMPLE_INTERVAL_S):
+        self.thread_id = thread_id
+        self.interval_s = interval_s
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, name='awd-stack-sampler', daemon=True)
+
+    def _sample(self):
+        while not self._stop.wait(self.interval_s):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self):
+        """Collapsed-stack text, heaviest stacks first"""
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+def _top_functions(profiler):
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    top = []
+    for (filename, line, function), (_, calls, total_s, cumulative_s, _) in stats.stats.items():
+        top.append({'function': f"{function} ({os.path.basename(filename)}:{line})", 'calls': calls,
+                    'total_s': round(total_s, 4), 'cumulative_s': round(cumulative_s, 4)})
+    return sorted(top, key=lambda entry: entry['cumulative_s'], reverse=True)[:TOP_FUNCTIONS]
+
+@contextmanager
+def profile_run(label, dataset=None, directory=None):
+    """Profile the block in the current thread; yields a dict whose 'paths' are filled in when it exits"""
+    directory = directory or profile_dir()
+    os.makedirs(directory, exist_ok=True)
+    run = {'name': f"{datetime.now():%Y%m%d-%H%M%S}-{label}", 'paths': {}}
+    base_path = os.path.join(directory, run['name'])
+
+    profiler = cProfile.Profile()
+    sampler = StackSampler(threading.get_ident()).start()
+    started = time.perf_counter()
+    profiler.enable()
+    try:
+        yield run
+    finally:
+        profiler.disable()
+        elapsed_s = time.perf_counter() - started
+        sampler.stop()
+
+        run['paths'] = {'prof': f"{base_path}.prof", 'collapsed': f"{base_path}.collapsed",
+                        'meta': f"{base_path}.json"}
+        profiler.dump_stats(run['paths']['prof'])
+        with open(run['paths']['collapsed'], 'w') as handle:
+            handle.write(sampler.collapsed())
+        meta = {'label': label, 'created_at': datetime.now().isoformat(timespec='seconds'),
+                'elapsed_s': round(elapsed_s, 4), 'samples': sum(sampler.stacks.values()),
+                'sample_interval_s': sampler.interval_s, 'dataset': dataset or {},
+                'python': sys.version.split()[0], 'top_functions': _top_functions(profiler)}
+        with open(run['paths']['meta'], 'w') as handle:
+            json.dump(meta, handle, indent=2)
@@ -0,0 +1,150 @@
+"""Several named programs (districts) served by one process
+
+Programs share the interpreter, the libraries and the background worker
+pool; their datasets live in per-program holders (the shared master cache,
+the snapshot store and a DatasetCache of cleaned uploads and the stores
+derived from them). A holder exposes memory_entries() -> [(key, bytes,
+last used)] and evict(key). After each use the registry
+trims a program that is over its own budget, least recently used dataset
+first, and when the process as a whole is over budget it empties idle
+programs in least-recently-used order. The program in use keeps at least
+its most recent dataset.
+"""
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+MB = 1024 * 1024
+
+def dataset_bytes(value):
+    """In-memory size of frames, series and arrays, also inside dicts, lists and tuples (memory-mapped arrays count 0)"""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.memmap):
+        return 0
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, dict):
+        return sum(dataset_bytes(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(dataset_bytes(item) for item in value)
+    return 0
+
+class DatasetCache:
+    """Datasets one program derives from its inputs, held in memory under the registry's budgets
+
+    get_or_build(key, build) calls build() once per key; concurrent misses
+    for the same key wait for it. An evicted dataset is rebuilt on its next
+    use.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._entries = {}  # key -> [dataset, bytes, last used]
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            entry[2] = time.time()
+            return True, entry[0]
+
+    def get_or_build(self, key, build):
+        found, dataset = self._get(key)
+        if found:
+            return dataset
+        with self._key_lock(key):
+            found, dataset = self._get(key)
+            if found:
+                return dataset
+            dataset = build()
+            with self._lock:
+                self._entries[key] = [dataset, dataset_bytes(dataset), time.time()]
+            return dataset
+
+    def memory_entries(self):
+        """[(key, bytes, last used)] of the datasets held"""
+        with self._lock:
+            return [(key, size, last_used) for key, (_, size, last_used) in self._entries.items()]
+
+    def evict(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+class ProgramRegistry:
+    """Memory budgets and LRU eviction across the programs of one process"""
+
+    def __init__(self, total_budget_bytes=None):
+        self.total_budget_bytes = total_budget_bytes or None
+        self._lock = threading.Lock()
+        self._programs = {}  # name -> {'holders', 'budget_bytes', 'last_used', 'evictions'}
+
+    def use(self, program, holders, budget_bytes=None):
+        """Record that program is in use with these holders, then enforce the budgets"""
+        with self._lock:
+            state = self._programs.setdefault(program, {'holders': [], 'evictions': 0})
+            state['holders'] = [holder for holder in holders if holder is not None]
+            state['budget_bytes'] = budget_bytes or None
+            state['last_used'] = time.time()
+            self._enforce(program)
+
+    def _entries(self, program):
+        """[(last used, bytes, holder, key)] of a program's in-memory datasets, oldest first"""
+        entries = []
+        for holder in self._programs[program]['holders']:
+            entries += [(last_used, size, holder, key) for key, size, last_used in holder.memory_entries()]
+        return sorted(entries, key=lambda entry: entry[0])
+
+    def _evict(self, program, entries):
+        for _, _, holder, key in entries:
+            holder.evict(key)
+        self._programs[program]['evictions'] += len(entries)
+
+    def _enforce(self, active):
+        for program, state in self._programs.items():
+            entries = self._entries(program)
+            if state['budget_bytes'] is None or sum(entry[1] for entry in entries) <= state['budget_bytes']:
+                continue
+            # Keep the newest datasets that fit; the active program always keeps its most recent one
+            keep, kept_bytes = (1, entries[-1][1]) if program == active else (0, 0)
+            for entry in reversed(entries[:len(entries) - keep]):
+                if kept_bytes + entry[1] > state['budget_bytes']:
+                    break
+                kept_bytes += entry[1]
+                keep += 1
+            self._evict(program, entries[:len(entries) - keep])
+
+        if self.total_budget_bytes is None:
+            return
+        idle = sorted((state['last_used'], program) for program, state in self._programs.items() if program != active)
+        for _, program in idle:
+            if self._total_bytes() <= self.total_budget_bytes:
+                break
+            self._evict(program, self._entries(program))
+
+    def _total_bytes(self):
+        return sum(entry[1] for program in self._programs for entry in self._entries(program))
+
+    def stats(self):
+        """Per-program memory use, budget, last use and eviction count"""
+        with self._lock:
+            return {
+                program: {
+                    'memory_mb': sum(entry[1] for entry in self._entries(program)) / MB,
+                    'budget_mb': state['budget_bytes'] / MB if state['budget_bytes'] else None,
+                    'datasets': len(self._entries(program)),
+                    'last_used': state['last_used'],
+                    'evictions': state['evictions']
+                }
+                for program, state in self._programs.items()
+            }
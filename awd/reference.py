@@ -0,0 +1,747 @@
+"""Frozen reference implementations of the cleaning and the compliance engine
+
+Row-by-row copies of clean_master_data, clean_water_data,
+analyze_farm_compliance, analyze_weekly_compliance,
+create_pipe_readings_table and create_pipe_summary_table as the dashboard
+first shipped them, before any of the vectorized engines or the reading
+screens. They are slow on purpose and must not be optimized or "fixed":
+awd.golden compares the live cleaning and engines against them, so a
+change here silently redefines what correct payments are.
+"""
+from datetime import timedelta
+
+import pandas as pd
+
+from awd.reporting import LOG
+
+def find_column(df, keywords, default_name=None):
+    """Find column based on keywords with fallback"""
+    cols = [col for col in df.columns if any(kw.lower() in col.lower() for kw in keywords)]
+    if cols:
+        return cols[0]
+    return default_name
+
+def is_positive_value(value):
+    """Check if a value represents a positive/yes value (1, Y, Yes, etc.)"""
+    if pd.isna(value):
+        return False
+    
+    # Convert to string and clean
+    str_val = str(value).strip().upper()
+    
+    # Check for empty or null-like values - UPDATED: Empty cells = 0
+    if str_val in ['', '0', '0.0', 'NO', 'N', 'FALSE', 'F', 'NAN', 'NA', 'NONE']:
+        return False
+    
+    # Check for positive values
+    if str_val in ['1', '1.0', 'YES', 'Y', 'TRUE', 'T', 'X']:
+        return True
+    
+    return False
+
+def extract_pipe_codes(row):
+    """Extract pipe codes for a farm from the master data"""
+    pipe_codes = []
+    for i in range(1, 6):  # Pipes 1-5
+        pipe_col = f'Kharif 25 PVC Pipe code - {i}'
+        if pipe_col in row.index and pd.notna(row[pipe_col]):
+            pipe_code = str(row[pipe_col]).strip()
+            if pipe_code and pipe_code != '' and pipe_code.lower() != 'nan':
+                pipe_codes.append(pipe_code)
+    return pipe_codes
+
+def clean_master_data(df, report=LOG):
+    """Enhanced cleaning for master data with pipe mapping"""
+    try:
+        df_clean = df.copy()
+        
+        # Find basic columns using exact names
+        farm_id_col = 'Kharif 25 Farm ID'
+        farmer_name_col = 'Kharif 25 Farmer Name'
+        village_col = 'Kharif 25 Village'
+        incentive_acres_col = 'Kharif 25 - AWD Study - acres for incentive'
+        awd_study_col = 'Kharif 25 - AWD Study (Y/N)'
+        
+        # Group A columns
+        group_a_col = 'Kharif 25 - AWD Study - Group A - Treatment (Y/N)'
+        group_a_complied_col = 'Kharif 25 - AWD Study - Group A - Treatment - complied (Y/N)'
+        group_a_non_complied_col = 'Kharif 25 - AWD Study - Group A - Treatment - Non-complied (Y/N)'
+        
+        # Group B columns
+        group_b_col = 'Kharif 25 - AWD Study - Group B -training only (Y/N)'
+        group_b_complied_col = 'Kharif 25 - AWD Study - Group B - Complied (Y/N)'
+        group_b_non_complied_col = 'Kharif 25 - AWD Study - Group B - Non-complied (Y/N)'
+        
+        # Group C columns
+        group_c_col = 'Kharif 25 - AWD Study - Group C - Control (Y/N)'
+        group_c_complied_col = 'Kharif 25 - AWD Study - Group C - Complied (Y/N)'
+        group_c_non_complied_col = 'Kharif 25 - AWD Study - Group C - non-complied (Y/N)'
+        
+        # Pipe code columns
+        pipe_code_cols = [f'Kharif 25 PVC Pipe code - {i}' for i in range(1, 6)]
+        
+        # Check if required columns exist
+        missing_cols = []
+        all_required_cols = [
+            farm_id_col, farmer_name_col, village_col, incentive_acres_col, awd_study_col,
+            group_a_col, group_a_complied_col, group_a_non_complied_col,
+            group_b_col, group_b_complied_col, group_b_non_complied_col,
+            group_c_col, group_c_complied_col, group_c_non_complied_col
+        ] + pipe_code_cols
+        
+        for col in all_required_cols:
+            if col not in df_clean.columns:
+                missing_cols.append(col)
+        
+        if missing_cols:
+            report.error(f"0 Missing required columns: {missing_cols}")
+            report.info("Available columns: " + ", ".join(df_clean.columns.tolist()))
+            return None, None
+        
+        # Standardize basic columns
+        df_clean['Farm_ID'] = df_clean[farm_id_col].astype(str).fillna("Unknown_Farm")
+        df_clean['Farmer_Name'] = df_clean[farmer_name_col].astype(str).fillna("Unknown_Farmer")
+        df_clean['Village'] = df_clean[village_col].astype(str).fillna("Unknown_Village")
+        
+        # Handle incentive acres
+        df_clean['Incentive_Acres'] = pd.to_numeric(df_clean[incentive_acres_col], errors='coerce').fillna(0).clip(lower=0)
+        
+        # Filter by AWD Study participation
+        df_clean['awd_study_flag'] = df_clean[awd_study_col].apply(is_positive_value)
+        initial_count = len(df_clean)
+        df_clean = df_clean[df_clean['awd_study_flag'] == True].copy()
+        filtered_count = len(df_clean)
+        
+        if df_clean.empty:
+            report.warning("⚠️ No AWD study participants found after filtering")
+            return None, None
+        
+        report.info(f"📊 Filtered to {filtered_count} AWD study participants from {initial_count} total farms")
+        
+        # Assign groups with 6-group logic
+        def assign_group_with_compliance(row):
+            # Check Group A first
+            if is_positive_value(row[group_a_col]):
+                if is_positive_value(row[group_a_complied_col]):
+                    return 'A Complied'
+                elif is_positive_value(row[group_a_non_complied_col]):
+                    return 'A Non Complied'
+                else:
+                    return 'A Unassigned'
+            
+            # Check Group B 
+            elif is_positive_value(row[group_b_col]):
+                if is_positive_value(row[group_b_complied_col]):
+                    return 'B Complied'
+                elif is_positive_value(row[group_b_non_complied_col]):
+                    return 'B Non Complied'
+                else:
+                    return 'B Unassigned'
+            
+            # Check Group C
+            elif is_positive_value(row[group_c_col]):
+                if is_positive_value(row[group_c_complied_col]):
+                    return 'C Complied'
+                elif is_positive_value(row[group_c_non_complied_col]):
+                    return 'C Non Complied'
+                else:
+                    return 'C Unassigned'
+            
+            else:
+                return 'No Group Assigned'
+        
+        df_clean['Group'] = df_clean.apply(assign_group_with_compliance, axis=1)
+        
+        # Filter out unassigned groups
+        before_filter = len(df_clean)
+        df_clean = df_clean[~df_clean['Group'].isin(['A Unassigned', 'B Unassigned', 'C Unassigned', 'No Group Assigned'])].copy()
+        after_filter = len(df_clean)
+        
+        report.info(f"📊 Removed {before_filter - after_filter} farms with unassigned groups")
+        
+        if df_clean.empty:
+            report.warning("⚠️ No farms remaining after removing unassigned groups")
+            return None, None
+        
+        # Payment eligibility and incentive calculation
+        df_clean['Payment_Eligible'] = df_clean['Group'] == 'A Complied'
+        df_clean['Incentive_To_Give'] = df_clean['Group'].apply(lambda x: 1 if x == 'A Complied' else 0)
+        
+        # Extract pipe codes for each farm
+        df_clean['Pipe_Codes'] = df_clean.apply(extract_pipe_codes, axis=1)
+        df_clean['Pipe_Count'] = df_clean['Pipe_Codes'].apply(len)
+        
+        # Create farm-pipe mapping
+        farm_pipe_mapping = {}
+        all_pipe_codes = set()
+        
+        for _, row in df_clean.iterrows():
+            farm_id = row['Farm_ID']
+            pipe_codes = row['Pipe_Codes']
+            farm_pipe_mapping[farm_id] = pipe_codes
+            all_pipe_codes.update(pipe_codes)
+        
+        # Show group distribution and pipe statistics
+        group_counts = df_clean['Group'].value_counts()
+        payment_eligible_count = df_clean['Payment_Eligible'].sum()
+        
+        report.success(f"1 Final Group Distribution: {group_counts.to_dict()}")
+        report.success(f"1 Payment Eligible Farms (A Complied): {payment_eligible_count} farms")
+        report.success(f"1 Total Unique Pipe Codes Found: {len(all_pipe_codes)} pipes")
+        report.success(f"1 Farms with Pipes: {len(df_clean[df_clean['Pipe_Count'] > 0])} farms")
+        
+        # Prepare final dataframe
+        final_df = df_clean[['Farm_ID', 'Farmer_Name', 'Village', 'Incentive_Acres', 'Group', 
+                           'Payment_Eligible', 'Incentive_To_Give', 'Pipe_Codes', 'Pipe_Count']].copy()
+        
+        # Remove farms with no valid Farm_ID
+        final_df = final_df.dropna(subset=['Farm_ID'])
+        final_df = final_df[final_df['Farm_ID'] != 'Unknown_Farm']
+        
+        report.success(f"1 Final clean data: {len(final_df)} farms ready for analysis")
+        
+        return final_df, farm_pipe_mapping
+        
+    except Exception as e:
+        report.error(f"0 Error cleaning master data: {str(e)}")
+        report.exception(e)
+        return None, None
+
+def clean_water_data(df, farm_pipe_mapping, report=LOG):
+    """Enhanced cleaning for water data with pipe mapping validation"""
+    try:
+        df_clean = df.copy()
+        
+        # Find columns
+        date_col = find_column(df_clean, ['date'], 'Date')
+        pipe_id_col = find_column(df_clean, ['pipe id', 'pipe_id', 'pipe code', 'pipeid'], 'Pipe_ID')
+        water_col = find_column(df_clean, ['water level', 'water_level', 'depth'], 'Water_Level_mm')
+        
+        if not all([date_col, pipe_id_col, water_col]):
+            report.error(f"0 Missing essential columns in water data. Found: Date={date_col}, Pipe_ID={pipe_id_col}, Water_Level={water_col}")
+            return None
+        
+        # Standardize column names
+        df_clean['Date'] = pd.to_datetime(df_clean[date_col], errors='coerce')
+        df_clean['Pipe_ID'] = df_clean[pipe_id_col].astype(str).str.strip()
+        df_clean['Water_Level_mm'] = pd.to_numeric(df_clean[water_col], errors='coerce')
+        
+        # Drop rows with missing essential data
+        initial_count = len(df_clean)
+        df_clean = df_clean.dropna(subset=['Date', 'Pipe_ID', 'Water_Level_mm'])
+        after_drop = len(df_clean)
+        
+        if after_drop < initial_count:
+            report.info(f"📊 Removed {initial_count - after_drop} rows with missing data")
+        
+        # Get all valid pipe codes from master data
+        all_valid_pipes = set()
+        for pipe_codes in farm_pipe_mapping.values():
+            all_valid_pipes.update(pipe_codes)
+        
+        # Filter water data to only include pipes from master data
+        before_filter = len(df_clean)
+        df_clean = df_clean[df_clean['Pipe_ID'].isin(all_valid_pipes)].copy()
+        after_filter = len(df_clean)
+        
+        # Add Farm_ID based on pipe mapping
+        def get_farm_id_for_pipe(pipe_id):
+            for farm_id, pipe_codes in farm_pipe_mapping.items():
+                if pipe_id in pipe_codes:
+                    return farm_id
+            return None
+        
+        df_clean['Farm_ID'] = df_clean['Pipe_ID'].apply(get_farm_id_for_pipe)
+        
+        # Remove readings for pipes not mapped to any farm
+        df_clean = df_clean.dropna(subset=['Farm_ID'])
+        final_count = len(df_clean)
+        
+        report.info(f"📊 Water data filtering results:")
+        report.info(f"   - Total valid pipes in master: {len(all_valid_pipes)}")
+        report.info(f"   - Before pipe filtering: {before_filter} readings")
+        report.info(f"   - After pipe filtering: {after_filter} readings")
+        report.info(f"   - Final mapped readings: {final_count} readings")
+        
+        if df_clean.empty:
+            report.warning("⚠️ No water data matches the pipes from master data")
+            return None
+        
+        # Show pipe coverage statistics
+        unique_pipes_in_water = df_clean['Pipe_ID'].nunique()
+        unique_farms_in_water = df_clean['Farm_ID'].nunique()
+        
+        report.success(f"1 Water data summary:")
+        report.success(f"   - Unique pipes with data: {unique_pipes_in_water}")
+        report.success(f"   - Unique farms with data: {unique_farms_in_water}")
+        report.success(f"   - Date range: {df_clean['Date'].min().date()} to {df_clean['Date'].max().date()}")
+        
+        return df_clean[['Date', 'Farm_ID', 'Pipe_ID', 'Water_Level_mm']]
+        
+    except Exception as e:
+        report.error(f"0 Error cleaning water data: {str(e)}")
+        report.exception(e)
+        return None
+
+def get_week_number_dynamic(date, start_date):
+    """Get week number based on dynamic start date (day 1)"""
+    days_diff = (date.date() - start_date).days
+    week_number = (days_diff // 7) + 1
+    return max(1, week_number)
+
+def analyze_pipe_compliance(pipe_data):
+    """Check if a pipe meets compliance criteria (UPDATED: Single reading ≤200 is compliant)"""
+    if len(pipe_data) == 0:
+        return {'compliant': False, 'reason': 'No readings available'}
+    
+    # Sort readings by date
+    pipe_data = pipe_data.sort_values('Date')
+    
+    # Get all readings for compliance check
+    readings = pipe_data['Water_Level_mm'].tolist()
+    
+    # Special case: Single reading ≤200mm = compliant
+    if len(pipe_data) == 1:
+        single_reading = readings[0]
+        if single_reading <= 200:
+            return {
+                'compliant': True,
+                'reason': 'Single reading ≤200mm (compliant)'
+            }
+        else:
+            return {
+                'compliant': False,
+                'reason': 'Single reading >200mm (non-compliant)'
+            }
+    
+    # Multiple readings (≥2): All ≤200mm + at least one ≤100mm
+    if len(pipe_data) >= 2:
+        # Compliance checks (NO GAP CONSTRAINT)
+        both_below_200 = all(reading <= 200 for reading in readings)
+        one_below_100 = any(reading <= 100 for reading in readings)
+        
+        compliant = both_below_200 and one_below_100
+        
+        if compliant:
+            return {
+                'compliant': True,
+                'reason': 'All criteria met'
+            }
+        else:
+            failed_criteria = []
+            if not both_below_200:
+                failed_criteria.append('All readings must be ≤200mm')
+            if not one_below_100:
+                failed_criteria.append('At least one reading must be ≤100mm')
+            
+            return {
+                'compliant': False,
+                'reason': '; '.join(failed_criteria)
+            }
+    
+    # This should never be reached
+    return {'compliant': False, 'reason': 'Unknown error'}
+
+
+def analyze_farm_compliance(master_df, water_df, farm_pipe_mapping, start_date, end_date, report=LOG):
+    """Analyze compliance for each farm using ONLY pipes with ≥2 readings as denominator (FIXED)"""
+    try:
+        results = []
+        
+        # Filter water data to date range
+        water_df_filtered = water_df[
+            (water_df['Date'].dt.date >= start_date) & 
+            (water_df['Date'].dt.date <= end_date)
+        ].copy()
+        
+        for _, farm_data in master_df.iterrows():
+            farm_id = farm_data['Farm_ID']
+            farm_pipe_codes = farm_data['Pipe_Codes']
+            
+            # Get water data for this farm in the date range
+            farm_water_data = water_df_filtered[water_df_filtered['Farm_ID'] == farm_id].copy()
+            
+            # Initialize counters
+            valid_pipes = 0      # Pipes with ≥1 readings (VALID PIPE DEFINITION)
+            pipes_passing = 0     # Pipes meeting compliance criteria
+            compliant_pipe_ids = []
+            non_compliant_pipe_ids = []
+            pipe_readings_details = []
+            
+            # Analyze each pipe assigned to this farm
+            for pipe_id in farm_pipe_codes:
+                pipe_data = farm_water_data[farm_water_data['Pipe_ID'] == pipe_id]
+                
+                # PIPE VALIDITY: ≥1 reading makes a pipe valid
+                if len(pipe_data) >= 1:  
+                    valid_pipes += 1  # Count as valid pipe
+                    compliance_result = analyze_pipe_compliance(pipe_data)
+                    
+                    # Format readings for output
+                    readings_str = ", ".join([
+                        f"({row['Date'].strftime('%d/%m')}, {int(row['Water_Level_mm'])}mm)" 
+                        for _, row in pipe_data.sort_values('Date').iterrows()
+                    ])
+                    
+                    # Add compliance result to the details
+                    if len(pipe_data) == 1:
+                        pipe_readings_details.append(f"{pipe_id}: {readings_str} - Single reading")
+                    else:
+                        pipe_readings_details.append(f"{pipe_id}: {readings_str}")
+                    
+                    # COMPLIANCE CHECK: Apply the compliance rules
+                    if compliance_result['compliant']:
+                        pipes_passing += 1
+                        compliant_pipe_ids.append(pipe_id)
+                    else:
+                        non_compliant_pipe_ids.append(pipe_id)
+                else:
+                    # Pipe has no readings - not valid
+                    pipe_readings_details.append(f"{pipe_id}: No readings in period")
+            
+            # FARM COMPLIANCE CALCULATION: Use valid pipes (≥1 readings) as denominator
+            if valid_pipes > 0:
+                proportion_passing = pipes_passing / valid_pipes  
+            else:
+                proportion_passing = 0  # No valid pipes → 0% compliance
+            
+            # Calculate eligible acres and payment
+            eligible_acres = proportion_passing * farm_data['Incentive_Acres']
+            final_incentive_amount = eligible_acres * 300 if farm_data['Payment_Eligible'] else 0
+            
+            # FARM VALIDITY: Farm is valid if it has ≥1 pipe with ≥1 readings
+            is_valid_farm = valid_pipes > 0
+            
+            results.append({
+                'Village': farm_data['Village'],
+                'Farm_ID': farm_id,
+                'Farmer_Name': farm_data['Farmer_Name'],
+                'Group': farm_data['Group'],
+                'Valid_Farm': '1' if is_valid_farm else '0',  # NEW: Valid farm indicator
+                'Total_Incentive_Acres': farm_data['Incentive_Acres'],
+                'All_Pipe_IDs': ', '.join(farm_pipe_codes) if farm_pipe_codes else 'None',
+                'Total_Assigned_Pipes': len(farm_pipe_codes),  # NEW: Total assigned
+                'Valid_Pipes_Count': valid_pipes,  # UPDATED: Pipes with ≥1 readings
+                'Pipes_Passing': pipes_passing,
+                'Pipes_Read': '\n'.join(pipe_readings_details),
+                'Compliant_Pipe_IDs': ', '.join(compliant_pipe_ids) if compliant_pipe_ids else 'None',
+                'Non_Compliant_Pipe_IDs': ', '.join(non_compliant_pipe_ids) if non_compliant_pipe_ids else 'None',
+                'Farm_Proportion_Passing': proportion_passing,  # UPDATED: Now based on pipes with ≥1 readings
+                'Eligible_Acres': round(eligible_acres, 2),
+                'Final_Incentive_Amount': round(final_incentive_amount, 0)
+            })
+        
+        return pd.DataFrame(results)
+        
+    except Exception as e:
+        report.error(f"0 Error analyzing farm compliance: {str(e)}")
+        report.exception(e)
+        return None
+
+def analyze_weekly_compliance(master_df, water_df, farm_pipe_mapping, start_date, end_date, report=LOG):
+    """Analyze compliance week by week within the selected date range (FIXED)"""
+    try:
+        results = []
+        
+        # Generate week periods based on start_date
+        current_date = start_date
+        week_number = 1
+        
+        while current_date <= end_date:
+            week_end = min(current_date + timedelta(days=6), end_date)
+            
+            # Filter water data for this week
+            week_water_data = water_df[
+                (water_df['Date'].dt.date >= current_date) & 
+                (water_df['Date'].dt.date <= week_end)
+            ].copy()
+            
+            # Analyze each farm for this week
+            for _, farm_data in master_df.iterrows():
+                farm_id = farm_data['Farm_ID']
+                farm_pipe_codes = farm_data['Pipe_Codes']
+                
+                # Get water data for this farm this week
+                farm_water_data = week_water_data[week_water_data['Farm_ID'] == farm_id]
+                
+                # Initialize pipe analysis
+                pipe_details = []
+                total_assigned_pipes = len(farm_pipe_codes)
+                valid_pipes = 0  # Pipes with ≥1 readings this week (UPDATED)
+                pipes_passing = 0
+                non_compliant_pipe_ids = []
+                
+                for pipe_id in farm_pipe_codes:
+                    pipe_data = farm_water_data[farm_water_data['Pipe_ID'] == pipe_id]
+                    
+                    if len(pipe_data) >= 1:  # UPDATED: Consider pipes with ≥1 readings
+                        valid_pipes += 1
+                        compliance_result = analyze_pipe_compliance(pipe_data)
+                        
+                        # Format readings
+                        readings_str = ", ".join([
+                            f"{row['Date'].strftime('%d/%m')} ({int(row['Water_Level_mm'])}mm)"
+                            for _, row in pipe_data.sort_values('Date').iterrows()
+                        ])
+                        
+                        if compliance_result['compliant']:
+                            pipes_passing += 1
+                            if len(pipe_data) == 1:
+                                pipe_detail = f"{pipe_id}: {readings_str} 🟢 PASS (Single reading ≤200mm)"
+                            else:
+                                pipe_detail = f"{pipe_id}: {readings_str} 🟢 PASS"
+                        else:
+                            non_compliant_pipe_ids.append(pipe_id)
+                            if len(pipe_data) == 1:
+                                pipe_detail = f"{pipe_id}: {readings_str} 🔴 FAIL (Single reading >200mm)"
+                            else:
+                                pipe_detail = f"{pipe_id}: {readings_str} � FAIL"
+                        
+                        pipe_details.append(pipe_detail)
+                    else:
+                        # No readings for this pipe
+                        pipe_detail = f"{pipe_id}: No data this week 🔴"
+                        pipe_details.append(pipe_detail)
+                        non_compliant_pipe_ids.append(pipe_id)
+                
+                # FIXED CALCULATION: Use valid pipes as denominator
+                if valid_pipes > 0:
+                    proportion_passing = pipes_passing / valid_pipes
+                else:
+                    proportion_passing = 0
+                
+                eligible_acres = proportion_passing * farm_data['Incentive_Acres']
+                
+                # Payment calculation
+                if farm_data['Payment_Eligible']:
+                    amount_to_pay = eligible_acres * 300
+                else:
+                    amount_to_pay = 0
+                
+                final_incentive = farm_data['Incentive_To_Give'] * amount_to_pay
+                
+                # Determine if farm is valid (has at least 1 pipe with ≥1 readings)
+                is_valid_farm = valid_pipes > 0
+                
+                results.append({
+                    'Week': week_number,
+                    'Week_Period': f"{current_date.strftime('%d/%m')} - {week_end.strftime('%d/%m')}",
+                    'Village': farm_data['Village'],
+                    'Farm_ID': farm_id,
+                    'Farmer_Name': farm_data['Farmer_Name'],
+                    'Group': farm_data['Group'],
+                    'Valid_Farm': '1' if is_valid_farm else '0',  # NEW: Valid farm indicator
+                    'Payment_Eligible': farm_data['Payment_Eligible'],
+                    'Total_Incentive_Acres': farm_data['Incentive_Acres'],
+                    'Assigned_Pipe_IDs': ', '.join(farm_pipe_codes),
+                    'Total_Assigned_Pipes': total_assigned_pipes,
+                    'Valid_Pipes_Count': valid_pipes,  # UPDATED: Pipes with ≥1 readings
+                    'Pipes_Passing': pipes_passing,
+                    'Non_Compliant_Pipe_IDs': ', '.join(non_compliant_pipe_ids) if non_compliant_pipe_ids else '',
+                    'Proportion_Passing': proportion_passing,  # UPDATED: Based on valid pipes (≥1 readings)
+                    'Eligible_Acres': round(eligible_acres, 2),
+                    'Final_Incentive_Amount': round(final_incentive, 0),
+                    'Pipe_Details': '\n'.join(pipe_details),
+                    'Comments': f"Week {week_number} analysis - {valid_pipes}/{total_assigned_pipes} pipes valid (≥1 reading)"
+                })
+            
+            # Move to next week
+            current_date = week_end + timedelta(days=1)
+            week_number += 1
+        
+        return pd.DataFrame(results)
+        
+    except Exception as e:
+        report.error(f"0 Error analyzing weekly compliance: {str(e)}")
+        report.exception(e)
+        return None
+
+def create_pipe_readings_table(master_df, water_df, farm_pipe_mapping, start_date, end_date, report=LOG):
+    """Create detailed pipe readings table (FIXED)"""
+    try:
+        results = []
+        
+        # Filter water data to date range
+        water_df_filtered = water_df[
+            (water_df['Date'].dt.date >= start_date) & 
+            (water_df['Date'].dt.date <= end_date)
+        ].copy()
+        
+        for _, farm_data in master_df.iterrows():
+            farm_id = farm_data['Farm_ID']
+            farm_pipe_codes = farm_data['Pipe_Codes']
+            
+            # Get water data for this farm in the date range
+            farm_water_data = water_df_filtered[water_df_filtered['Farm_ID'] == farm_id].copy()
+            
+            # Initialize pipe columns
+            pipe_columns = {}
+            
+            # Process each pipe assigned to this farm (up to 5)
+            for i in range(5):
+                pipe_col = f'Pipe_{i+1}'
+                
+                if i < len(farm_pipe_codes):
+                    pipe_id = farm_pipe_codes[i]
+                    pipe_data = farm_water_data[farm_water_data['Pipe_ID'] == pipe_id]
+                    
+                    if pipe_data.empty:
+                        pipe_columns[pipe_col] = f"{pipe_id}: No data"
+                    else:
+                        # Format readings
+                        readings_list = []
+                        for _, reading in pipe_data.sort_values('Date').iterrows():
+                            date_str = reading['Date'].strftime('%d/%m')
+                            reading_val = int(reading['Water_Level_mm'])
+                            readings_list.append(f"({date_str}, {reading_val}mm)")
+                        
+                        pipe_columns[pipe_col] = f"{pipe_id}: " + ", ".join(readings_list)
+                else:
+                    pipe_columns[pipe_col] = 'Not assigned'
+            
+            # Determine non-compliant pipes (UPDATED: Consider pipes with ≥1 readings)
+            non_compliant_pipes = []
+            for pipe_id in farm_pipe_codes:
+                pipe_data = farm_water_data[farm_water_data['Pipe_ID'] == pipe_id]
+                if len(pipe_data) >= 1:  # UPDATED: Evaluate pipes with ≥1 reading
+                    compliance_result = analyze_pipe_compliance(pipe_data)
+                    if not compliance_result['compliant']:
+                        # Find pipe number for this pipe_id
+                        pipe_num = farm_pipe_codes.index(pipe_id) + 1
+                        if len(pipe_data) == 1:
+                            non_compliant_pipes.append(f"{pipe_num}(single reading >200mm)")
+                        else:
+                            non_compliant_pipes.append(str(pipe_num))
+                else:
+                    # Pipes with no data
+                    pipe_num = farm_pipe_codes.index(pipe_id) + 1
+                    non_compliant_pipes.append(f"{pipe_num}(no data)")
+            
+            # Create comments (UPDATED)
+            if non_compliant_pipes:
+                comments = f"Pipe {','.join(non_compliant_pipes)} did not follow compliance"
+            elif farm_pipe_codes and not farm_water_data.empty:
+                # Check if any pipes have ≥1 readings
+                pipes_with_data = [
+                    pipe_id for pipe_id in farm_pipe_codes 
+                    if len(farm_water_data[farm_water_data['Pipe_ID'] == pipe_id]) >= 1
+                ]
+                if pipes_with_data:
+                    comments = "All evaluated pipes compliant"
+                else:
+                    comments = "No pipes have any data"
+            else:
+                comments = "No pipe data"
+            
+            # Determine if farm is valid (has at least 1 pipe with ≥1 readings)
+            pipes_with_data = [
+                pipe_id for pipe_id in farm_pipe_codes 
+                if len(farm_water_data[farm_water_data['Pipe_ID'] == pipe_id]) >= 1
+            ]
+            is_valid_farm = len(pipes_with_data) > 0
+            
+            results.append({
+                'Date_Range': f"{start_date} to {end_date}",
+                'Village': farm_data['Village'],
+                'Farm_ID': farm_id,
+                'Farmer_Name': farm_data['Farmer_Name'],
+                'Group': farm_data['Group'],
+                'Valid_Farm': '1' if is_valid_farm else '0',  # NEW: Valid farm indicator
+                **pipe_columns,
+                'Comments': comments
+            })
+        
+        return pd.DataFrame(results)
+        
+    except Exception as e:
+        report.error(f"0 Error creating pipe readings table: {str(e)}")
+        return None
+
+def create_pipe_summary_table(master_df, water_df, farm_pipe_mapping, start_date, end_date, report=LOG):
+    """Create pipe summary table with new column structure including dates and readings count"""
+    try:
+        results = []
+        
+        # Filter water data to date range
+        water_df_filtered = water_df[
+            (water_df['Date'].dt.date >= start_date) & 
+            (water_df['Date'].dt.date <= end_date)
+        ].copy()
+        
+        for _, farm_data in master_df.iterrows():
+            farm_id = farm_data['Farm_ID']
+            farm_pipe_codes = farm_data['Pipe_Codes']
+            farmer_name = farm_data['Farmer_Name']
+            group = farm_data['Group']
+            
+            # Get water data for this farm in the date range
+            farm_water_data = water_df_filtered[water_df_filtered['Farm_ID'] == farm_id].copy()
+            
+            # Determine if farm is valid (has at least 1 pipe with ≥1 readings)
+            pipes_with_data = [
+                pipe_id for pipe_id in farm_pipe_codes 
+                if len(farm_water_data[farm_water_data['Pipe_ID'] == pipe_id]) >= 1
+            ]
+            is_valid_farm = len(pipes_with_data) > 0
+            farm_valid_status = '1' if is_valid_farm else '0'
+            
+            # Process each pipe assigned to this farm
+            for pipe_id in farm_pipe_codes:
+                pipe_data = farm_water_data[farm_water_data['Pipe_ID'] == pipe_id].copy()
+                
+                # Initialize reading columns (up to 6 readings)
+                reading_data = {
+                    'Reading_1_mm': '',
+                    'Reading_1_Date': '',
+                    'Reading_2_mm': '',
+                    'Reading_2_Date': '',
+                    'Reading_3_mm': '',
+                    'Reading_3_Date': '',
+                    'Reading_4_mm': '',
+                    'Reading_4_Date': '',
+                    'Reading_5_mm': '',
+                    'Reading_5_Date': '',
+                    'Reading_6_mm': '',
+                    'Reading_6_Date': ''
+                }
+                
+                total_readings = len(pipe_data)
+                
+                if not pipe_data.empty:
+                    # Sort by date and get up to 6 readings
+                    pipe_data_sorted = pipe_data.sort_values('Date')
+                    for i, (_, reading) in enumerate(pipe_data_sorted.iterrows()):
+                        if i < 6:  # Only take first 6 readings
+                            reading_data[f'Reading_{i+1}_mm'] = int(reading['Water_Level_mm'])
+                            reading_data[f'Reading_{i+1}_Date'] = reading['Date'].strftime('%d/%m/%Y')
+                
+                # Determine if pipe is valid (has at least 1 reading)
+                valid_pipe_status = '1' if total_readings >= 1 else '0'
+
+                # Determine compliance for this pipe
+                compliance_status = "No Data"
+                if len(pipe_data) >= 1:
+                    compliance_result = analyze_pipe_compliance(pipe_data)
+                    if compliance_result['compliant']:
+                        compliance_status = 1
+                    else:
+                        compliance_status = 0
+                
+                # Add row for this pipe
+                results.append({
+                    'Farm_ID': farm_id,
+                    'Pipe_ID': pipe_id,
+                    'Farm_Valid': farm_valid_status,
+                    'Valid_pipe': valid_pipe_status,
+                    'Farmer_Name': farmer_name,
+                    'Group': group,
+                    'Abiding_AWD_method': compliance_status,
+                    **reading_data,
+                    'Total_number_of_readings': total_readings
+                })
+        
+        return pd.DataFrame(results)
+        
+    except Exception as e:
+        report.error(f"0 Error creating pipe summary table: {str(e)}")
+        return None
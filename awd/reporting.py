@@ -0,0 +1,31 @@
+"""Where core functions send user-facing status messages
+
+Core modules never import streamlit. Functions that report progress or
+problems take a `report` object with info/success/warning/error/exception
+methods: the UI passes the streamlit module itself, background jobs and
+command-line tools get LOG, which forwards to the logging module.
+"""
+import logging
+
+class LogReport:
+    """report object backed by a logger"""
+
+    def __init__(self, logger):
+        self._logger = logger
+
+    def info(self, body):
+        self._logger.info(body)
+
+    def success(self, body):
+        self._logger.info(body)
+
+    def warning(self, body):
+        self._logger.warning(body)
+
+    def error(self, body):
+        self._logger.error(body)
+
+    def exception(self, exception):
+        self._logger.error("%s", exception, exc_info=exception)
+
+LOG = LogReport(logging.getLogger('awd'))
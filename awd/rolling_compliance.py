@@ -0,0 +1,116 @@
+"""Season-to-date and rolling-window weekly compliance in one linear pass
+
+Readings are bucketed into the same 7-day weeks as analyze_weekly_compliance
+(week 1 starts on the analysis start date). For every (farm, pipe, week) we
+keep the reading count, max and min; pipe compliance only depends on those
+three numbers, so cumulative windows are running sums / maxima / minima and
+rolling windows are sliding ones. Every (farm, week) gets its weekly,
+cumulative and rolling status without re-running the period analysis per
+end date.
+"""
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from awd.arrow import to_numpy_datetimes
+
+DEFAULT_ROLLING_WEEKS = 3
+
+def _pipe_compliant(count, max_level, min_level):
+    """Vectorized analyze_pipe_compliance on (count, max, min) summaries"""
+    return (count >= 1) & (max_level <= 200) & ((count == 1) | (min_level <= 100))
+
+def _rolling(values, window, reducer, fill):
+    """Trailing window reduction along axis 1 (weeks), shorter at the season start"""
+    padded = np.concatenate([np.full((values.shape[0], window - 1), fill), values], axis=1)
+    return reducer(sliding_window_view(padded, window, axis=1), axis=-1)
+
+def _status(valid_pipes, proportion):
+    """Readable status per (farm, week)"""
+    return np.select(
+        [valid_pipes == 0, proportion >= 1, proportion > 0],
+        ['No data', 'Compliant', 'Partially compliant'],
+        'Non-compliant'
+    )
+
+def analyze_cumulative_compliance(master_df, water_df, start_date, end_date, rolling_weeks=DEFAULT_ROLLING_WEEKS):
+    """Weekly, cumulative (season-to-date) and rolling-window compliance for every (farm, week)"""
+    n_weeks = (end_date - start_date).days // 7 + 1
+    n_farms = len(master_df)
+
+    # One row per assigned (farm, pipe) slot, in master order
+    slots = pd.DataFrame({
+        'farm_pos': np.repeat(np.arange(n_farms), master_df['Pipe_Count'].to_numpy()),
+        'Farm_ID': np.repeat(master_df['Farm_ID'].astype(str).to_numpy(), master_df['Pipe_Count'].to_numpy()),
+        'Pipe_ID': [pipe_id for pipe_codes in master_df['Pipe_Codes'] for pipe_id in pipe_codes]
+    })
+    keys = slots[['Farm_ID', 'Pipe_ID']].drop_duplicates().reset_index(drop=True)
+    keys['key_id'] = np.arange(len(keys))
+    slot_key = slots.merge(keys, on=['Farm_ID', 'Pipe_ID'], how='left')['key_id'].to_numpy()
+
+    # Bucket readings into weeks and scatter per-(key, week) count / max / min
+    day = to_numpy_datetimes(water_df['Date']).to_numpy().astype('datetime64[D]')
+    day_offset = (day - np.datetime64(start_date, 'D')).astype(int)
+    in_range = (day_offset >= 0) & (day_offset <= (end_date - start_date).days)
+    readings = pd.DataFrame({
+        'Farm_ID': water_df['Farm_ID'].astype(str).to_numpy()[in_range],
+        'Pipe_ID': water_df['Pipe_ID'].astype(str).to_numpy()[in_range],
+        'week': day_offset[in_range] // 7,
+        'level': water_df['Water_Level_mm'].to_numpy(dtype=float)[in_range]
+    }).merge(keys, on=['Farm_ID', 'Pipe_ID'], how='inner')
+
+    shape = (len(keys), n_weeks)
+    count = np.zeros(shape)
+    max_level = np.full(shape, -np.inf)
+    min_level = np.full(shape, np.inf)
+    cells = (readings['key_id'].to_numpy(), readings['week'].to_numpy())
+    np.add.at(count, cells, 1)
+    np.maximum.at(max_level, cells, readings['level'].to_numpy())
+    np.minimum.at(min_level, cells, readings['level'].to_numpy())
+
+    windows = {
+        'Week': (count, max_level, min_level),
+        'Cumulative': (np.cumsum(count, axis=1), np.maximum.accumulate(max_level, axis=1),
+                       np.minimum.accumulate(min_level, axis=1)),
+        'Rolling': (_rolling(count, rolling_weeks, np.sum, 0), _rolling(max_level, rolling_weeks, np.max, -np.inf),
+                    _rolling(min_level, rolling_weeks, np.min, np.inf))
+    }
+
+    # Week labels match analyze_weekly_compliance
+    week_starts = [start_date + timedelta(days=7 * week) for week in range(n_weeks)]
+    week_periods = [
+        f"{week_start.strftime('%d/%m')} - {min(week_start + timedelta(days=6), end_date).strftime('%d/%m')}"
+        for week_start in week_starts
+    ]
+
+    # Long format: week-major, master order within a week
+    output = pd.DataFrame({
+        'Week': np.repeat(np.arange(1, n_weeks + 1), n_farms),
+        'Week_Period': np.repeat(week_periods, n_farms),
+        'Village': np.tile(master_df['Village'].to_numpy(), n_weeks),
+        'Farm_ID': np.tile(master_df['Farm_ID'].to_numpy(), n_weeks),
+        'Farmer_Name': np.tile(master_df['Farmer_Name'].to_numpy(), n_weeks),
+        'Group': np.tile(master_df['Group'].to_numpy(), n_weeks),
+        'Total_Assigned_Pipes': np.tile(master_df['Pipe_Count'].to_numpy(), n_weeks)
+    })
+
+    for label, (win_count, win_max, win_min) in windows.items():
+        # Per-key status, broadcast to every slot, then summed per farm
+        valid = (win_count >= 1)[slot_key]
+        passing = _pipe_compliant(win_count, win_max, win_min)[slot_key]
+        farm_valid = np.zeros((n_farms, n_weeks))
+        farm_passing = np.zeros((n_farms, n_weeks))
+        np.add.at(farm_valid, slots['farm_pos'].to_numpy(), valid)
+        np.add.at(farm_passing, slots['farm_pos'].to_numpy(), passing)
+        proportion = np.divide(farm_passing, farm_valid, out=np.zeros_like(farm_passing), where=farm_valid > 0)
+
+        # Transpose to week-major to line up with the output rows
+        output[f'{label}_Valid_Pipes'] = farm_valid.T.ravel().astype(int)
+        output[f'{label}_Pipes_Passing'] = farm_passing.T.ravel().astype(int)
+        output[f'{label}_Proportion_Passing'] = proportion.T.ravel()
+        if label != 'Week':
+            output[f'{label}_Status'] = _status(farm_valid.T.ravel(), proportion.T.ravel())
+
+    return output
@@ -0,0 +1,144 @@
+"""Local scheduler that precomputes the standard reports into the snapshot store
+
+Sessions call notify() with the data they have loaded. A single background
+thread builds a snapshot as soon as a dataset pair without one appears
+(new water upload or refreshed master data). Once a day at a fixed local
+time it calls the latest session's refresh function, which re-pulls the
+source data, and builds a snapshot only if that gives a dataset pair
+without one. Snapshots are keyed by content, so rebuilding an unchanged
+pair would only repeat the same snapshot.
+"""
+import threading
+import time
+import traceback
+from datetime import datetime
+
+from awd import instrumentation
+
+DEFAULT_DAILY_AT = '02:00'
+POLL_INTERVAL_S = 60
+
+def _parse_daily_at(daily_at):
+    if not daily_at:
+        return None
+    hours, minutes = daily_at.split(':')
+    return int(hours), int(minutes)
+
+class ReportScheduler:
+    """Builds snapshots with build_fn(inputs) -> (tables, meta) on new data and daily at daily_at ('HH:MM')"""
+
+    def __init__(self, store, build_fn, daily_at=DEFAULT_DAILY_AT, poll_interval_s=POLL_INTERVAL_S):
+        self.store = store
+        self.build_fn = build_fn
+        self.daily_at = _parse_daily_at(daily_at)
+        self.poll_interval_s = poll_interval_s
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._latest = None  # (report_key, refresh) of the most recent notify; the inputs are not kept
+        self._pending = {}  # report_key -> inputs waiting for a first snapshot
+        self._failed = set()  # keys whose build failed are not retried until run_now
+        # Starting after today's slot does not trigger an immediate rebuild; the next one is tomorrow
+        now = datetime.now()
+        self._last_daily_run = now.date() if self.daily_at and (now.hour, now.minute) >= self.daily_at else None
+        self._thread = None
+        self.building = None
+        self.last_built = None
+        self.last_error = None
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._loop, name='awd-report-scheduler', daemon=True)
+            self._thread.start()
+
+    def notify(self, key, inputs, refresh=None):
+        """Register the data a session is working with; queues a build if it has no snapshot yet
+
+        refresh() -> (report_key, inputs) or None re-pulls the source data for
+        the daily run; without it the daily run is skipped.
+        """
+        with self._lock:
+            self._latest = (key, refresh)
+            if (self.store.latest_version(key) is None and key not in self._pending and
+                    key not in self._failed and key != self.building):
+                self._pending[key] = inputs
+                self._wake.set()
+            self._ensure_thread()
+
+    def _daily_run_due(self, now):
+        if self.daily_at is None or self._latest is None or self._latest[1] is None:
+            return False
+        scheduled = now.replace(hour=self.daily_at[0], minute=self.daily_at[1], second=0, microsecond=0)
+        return now >= scheduled and self._last_daily_run != now.date()
+
+    def _next_job(self):
+        with self._lock:
+            if self._pending:
+                key = next(iter(self._pending))
+                return key, self._pending.pop(key)
+            now = datetime.now()
+            if not self._daily_run_due(now):
+                return None
+            self._last_daily_run = now.date()
+            refresh = self._latest[1]
+        return self._refreshed_job(refresh)
+
+    def _refreshed_job(self, refresh):
+        """(key, inputs) to build from freshly pulled source data, None when it has a snapshot already"""
+        try:
+            refreshed = refresh()
+        except Exception as e:
+            self.last_error = f"Daily refresh failed: {e}\n{traceback.format_exc()}"
+            instrumentation.increment('scheduler.failures')
+            return None
+        if refreshed is None:
+            return None
+        key = refreshed[0]
+        with self._lock:
+            self._latest = (key, refresh)
+        if self.store.latest_version(key) is not None:
+            instrumentation.increment('scheduler.daily_unchanged')
+            return None
+        return refreshed
+
+    def _loop(self):
+        while True:
+            self._wake.wait(timeout=self.poll_interval_s)
+            self._wake.clear()
+            job = self._next_job()
+            while job is not None:
+                self._build(*job)
+                job = self._next_job()
+
+    def _build(self, key, inputs):
+        self.building = key
+        started = time.perf_counter()
+        try:
+            tables, meta = self.build_fn(inputs)
+            meta = dict(meta, build_seconds=round(time.perf_counter() - started, 3))
+            version = self.store.save(key, tables, meta)
+            self.last_built = {'report_key': key, 'version': version, 'built_at': datetime.now().isoformat(timespec='seconds')}
+            self.last_error = None
+            self._failed.discard(key)
+            instrumentation.increment('scheduler.builds')
+        except Exception as e:
+            self.last_error = f"{e}\n{traceback.format_exc()}"
+            self._failed.add(key)
+            instrumentation.increment('scheduler.failures')
+        finally:
+            self.building = None
+
+    def run_now(self, key, inputs):
+        """Queue an immediate rebuild (a new snapshot version) of the given report"""
+        with self._lock:
+            self._pending[key] = inputs
+            self._wake.set()
+            self._ensure_thread()
+
+    def status(self):
+        return {
+            'building': self.building is not None,
+            'pending': len(self._pending),
+            'last_built': self.last_built,
+            'last_error': self.last_error.splitlines()[0] if self.last_error else None,
+            'daily_at': f"{self.daily_at[0]:02d}:{self.daily_at[1]:02d}" if self.daily_at else None
+        }
@@ -0,0 +1,88 @@
+"""Search index over farms: prefix and fuzzy matching on Farm_ID, pipe codes, farmer name and village
+
+Terms are kept in one sorted list, so a prefix query is two bisections
+plus a scan of the matching range. Fuzzy matching (difflib) only runs
+when nothing matches as a prefix. Detail records are looked up by
+Farm_ID through a dict.
+"""
+import difflib
+from bisect import bisect_left
+
+# Lower rank sorts first among equally good matches
+FIELD_RANKS = {'Farm_ID': 0, 'Pipe_ID': 1, 'Farmer_Name': 2, 'Village': 3}
+DEFAULT_LIMIT = 20
+MAX_PREFIX_SCAN = 5000  # cap on index entries looked at for very short prefixes
+FUZZY_CUTOFF = 0.75
+
+def _terms(value):
+    """The whole lowercased value plus each of its words"""
+    text = str(value).strip().lower()
+    if not text or text == 'nan':
+        return []
+    words = text.split()
+    return [text] + words if len(words) > 1 else [text]
+
+class FarmSearchIndex:
+    """Index over the rows of a farm results table (one row per Farm_ID)
+
+    pipe_codes optionally maps Farm_ID to its assigned pipe codes.
+    """
+
+    def __init__(self, results_df, pipe_codes=None):
+        self.farm_ids = results_df['Farm_ID'].astype(str).tolist()
+        self.records = dict(zip(self.farm_ids, results_df.to_dict('records')))
+
+        columns = {'Farm_ID': [[farm_id] for farm_id in self.farm_ids],
+                   'Pipe_ID': [(pipe_codes or {}).get(farm_id, []) for farm_id in self.farm_ids]}
+        for field in ('Farmer_Name', 'Village'):
+            if field in results_df.columns:
+                columns[field] = [[value] for value in results_df[field].tolist()]
+
+        entries = set()
+        for field, values_per_farm in columns.items():
+            field_rank = FIELD_RANKS[field]
+            for position, values in enumerate(values_per_farm):
+                for value in values:
+                    for term in _terms(value):
+                        entries.add((term, field_rank, position))
+
+        entries = sorted(entries)
+        self._keys = [term for term, _, _ in entries]
+        self._entries = entries
+        self._by_term = {}
+        for term, field_rank, position in entries:
+            self._by_term.setdefault(term, []).append((field_rank, position))
+        self._unique_terms = list(self._by_term)
+
+    def __len__(self):
+        return len(self.farm_ids)
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """Farm_IDs best matching query: exact, then prefix, then fuzzy matches"""
+        query = str(query).strip().lower()
+        if not query:
+            return []
+
+        best = {}  # position -> (match kind, field rank)
+        start = bisect_left(self._keys, query)
+        end = min(bisect_left(self._keys, query + '\uffff'), start + MAX_PREFIX_SCAN)
+        for term, field_rank, position in self._entries[start:end]:
+            score = (0 if term == query else 1, field_rank)
+            if position not in best or score < best[position]:
+                best[position] = score
+
+        if not best:
+            for term in difflib.get_close_matches(query, self._unique_terms, n=limit, cutoff=FUZZY_CUTOFF):
+                for field_rank, position in self._by_term[term]:
+                    best.setdefault(position, (2, field_rank))
+
+        ranked = sorted(best, key=lambda position: (best[position], position))
+        return [self.farm_ids[position] for position in ranked[:limit]]
+
+    def record(self, farm_id):
+        """Result row of a farm as a dict, or None"""
+        return self.records.get(str(farm_id))
+
+    def label(self, farm_id):
+        record = self.records.get(str(farm_id)) or {}
+        return f"{farm_id} - {record.get('Farmer_Name', '')} ({record.get('Village', '')})"
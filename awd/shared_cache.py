@@ -0,0 +1,160 @@
+"""Process-wide cache of cleaned master data shared by every dashboard session"""
+import hashlib
+import os
+import pickle
+import threading
+import time
+from datetime import datetime
+
+from awd import instrumentation
+
+DEFAULT_PERSIST_DIR = os.path.join('.awd_cache', 'master')
+# Disk copies older than this process (from an earlier run of the server) are never served
+PROCESS_STARTED_AT = time.time()
+
+def _entry_bytes(entry):
+    return int(entry['master_df'].memory_usage(deep=True).sum())
+
+class SharedMasterCache:
+    """Cleaned master data keyed by sheet configuration, with optional disk persistence
+
+    One instance is shared by all sessions (see st.cache_resource in App.py).
+    Concurrent misses for the same key wait on a per-key lock, so a burst of
+    new sessions triggers a single Google Sheets pull and clean.
+
+    The disk copy lets the worker processes of one server share a pull; a
+    copy written before this process started (an earlier run of the server)
+    is stale and treated as a miss, so a restart always pulls the current
+    sheet.
+    """
+
+    def __init__(self, persist_dir=None):
+        self.persist_dir = persist_dir
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._entries = {}
+        self._memory = {}  # key -> (bytes, last used) of the entries held in memory
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _disk_path(self, key):
+        digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        return os.path.join(self.persist_dir, f"{digest}.pkl")
+
+    def _load_from_disk(self, key):
+        if not self.persist_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            if os.path.getmtime(path) < PROCESS_STARTED_AT:
+                return None
+        except OSError:
+            return None
+        try:
+            with open(path, 'rb') as handle:
+                return pickle.load(handle)
+        except Exception:
+            # A corrupt or incompatible file is treated as a miss and rewritten
+            return None
+
+    def _save_to_disk(self, key, entry):
+        if not self.persist_dir:
+            return
+        os.makedirs(self.persist_dir, exist_ok=True)
+        path = self._disk_path(key)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as handle:
+            pickle.dump(entry, handle, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+
+    def _count(self, outcome):
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+        instrumentation.increment(f'master_cache.{outcome}')
+
+    def get_or_load(self, key, loader):
+        """Return the cached entry for key, calling loader() -> (master_df, farm_pipe_mapping) on a miss
+
+        Entries are dicts with master_df, farm_pipe_mapping and loaded_at
+        (which doubles as a version tag). Returns None when loader fails.
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._count('hits')
+            self._touch(key, entry)
+            return entry
+
+        with self._key_lock(key):
+            # Another session may have filled the entry while we waited
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._count('hits')
+                self._touch(key, entry)
+                return entry
+
+            entry = self._load_from_disk(key)
+            if entry is not None:
+                self._count('disk_hits')
+            else:
+                self._count('misses')
+                loaded = loader()
+                if loaded is None:
+                    return None
+                master_df, farm_pipe_mapping = loaded
+                entry = {
+                    'master_df': master_df,
+                    'farm_pipe_mapping': farm_pipe_mapping,
+                    'loaded_at': datetime.now().isoformat(timespec='seconds')
+                }
+                self._save_to_disk(key, entry)
+
+            self._entries[key] = entry
+            self._touch(key, entry)
+            return entry
+
+    def _touch(self, key, entry):
+        with self._lock:
+            size = self._memory[key][0] if key in self._memory else _entry_bytes(entry)
+            self._memory[key] = (size, time.time())
+
+    def memory_entries(self):
+        """[(key, bytes, last used)] of the entries held in memory"""
+        with self._lock:
+            return [(key, size, last_used) for key, (size, last_used) in self._memory.items()]
+
+    def evict(self, key):
+        """Drop an entry from memory only; the disk copy (if any) makes the next load a disk hit"""
+        with self._key_lock(key):
+            self._entries.pop(key, None)
+            with self._lock:
+                self._memory.pop(key, None)
+        self._count('evictions')
+
+    def invalidate(self, key):
+        """Drop an entry from memory and disk (the Refresh Master Data path)"""
+        with self._key_lock(key):
+            self._entries.pop(key, None)
+            with self._lock:
+                self._memory.pop(key, None)
+            if self.persist_dir:
+                path = self._disk_path(key)
+                if os.path.exists(path):
+                    os.remove(path)
+        instrumentation.increment('master_cache.invalidations')
+
+    def stats(self):
+        """Hit/miss counts and number of cached entries"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries)
+            }
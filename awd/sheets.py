@@ -0,0 +1,169 @@
+"""Google Sheets access for the master data
+
+gspread and the google-auth stack are imported on first use, so sessions
+that never touch the sheet (cached master data, water-only work) do not
+load them.
+"""
+import json
+
+import pandas as pd
+
+SCOPES = ['https://spreadsheets.google.com/feeds',
+          'https://www.googleapis.com/auth/drive']
+
+SERVICE_ACCOUNT_FIELDS = ["type", "project_id", "private_key_id", "private_key", "client_email", "client_id",
+                          "auth_uri", "token_uri", "auth_provider_x509_cert_url", "client_x509_cert_url",
+                          "universe_domain"]
+
+def credentials_from_secrets(google_secrets):
+    """Service-account dict from the [gcp_service_account] secrets section (KeyError when a field is missing)"""
+    return {field: google_secrets[field] for field in SERVICE_ACCOUNT_FIELDS}
+
+def open_worksheet(credentials_dict, sheet_url, worksheet_name=None):
+    """Authorize and open a worksheet by spreadsheet URL or name (first worksheet by default)"""
+    import gspread
+    from google.oauth2.service_account import Credentials
+
+    # Parse credentials
+    if isinstance(credentials_dict, str):
+        creds_dict = json.loads(credentials_dict)
+    else:
+        creds_dict = credentials_dict
+
+    credentials = Credentials.from_service_account_info(creds_dict, scopes=SCOPES)
+    gc = gspread.authorize(credentials)
+
+    # Open the spreadsheet
+    if sheet_url.startswith('https://docs.google.com/spreadsheets/d/'):
+        # Extract sheet ID from URL
+        sheet_id = sheet_url.split('/d/')[1].split('/')[0]
+        sheet = gc.open_by_key(sheet_id)
+    else:
+        # Assume it's a sheet name
+        sheet = gc.open(sheet_url)
+
+    if worksheet_name:
+        return sheet.worksheet(worksheet_name)
+    return sheet.get_worksheet(0)  # First worksheet
+
+def read_sheet(credentials_dict, sheet_url, worksheet_name=None):
+    """All records of a worksheet as a DataFrame"""
+    return pd.DataFrame(open_worksheet(credentials_dict, sheet_url, worksheet_name).get_all_records())
+
+# Write-back of computed results into the master sheet
+
+SHEET_FARM_ID_COLUMN = 'Kharif 25 Farm ID'
+
+# Result column -> sheet header it is written to (created at the end of the header row when missing)
+WRITEBACK_COLUMNS = {
+    'Farm_Proportion_Passing': 'Farm_Proportion_Passing',
+    'Eligible_Acres': 'Eligible_Acres',
+    'Final_Incentive_Amount': 'Final_Incentive_Amount'
+}
+WRITEBACK_DECIMALS = {'Farm_Proportion_Passing': 4, 'Eligible_Acres': 2, 'Final_Incentive_Amount': 2}
+MAX_RANGES_PER_REQUEST = 1000
+
+def column_letter(column_number):
+    """A1 column letters of a 1-based column number (1 -> A, 27 -> AA)"""
+    letters = ''
+    while column_number > 0:
+        column_number, remainder = divmod(column_number - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+def _same_cell(current, value):
+    if current is None or current == '':
+        return False
+    try:
+        return abs(float(current) - value) < 1e-9
+    except (TypeError, ValueError):
+        return False
+
+def plan_writeback(sheet_values, results_df, columns=WRITEBACK_COLUMNS, id_column=SHEET_FARM_ID_COLUMN):
+    """Range updates that bring the sheet's result columns in line with results_df
+
+    sheet_values are the worksheet's unformatted values, header row first.
+    Every sheet row whose farm ID appears in results_df gets that farm's
+    values; only cells whose value differs are written, with runs of
+    consecutive changed rows in a column merged into one range. Farms not in
+    results_df are left untouched. Returns (updates, stats) where updates
+    is the batch_update data: [{'range': 'C2:C5', 'values': [[...], ...]}].
+    """
+    header = [str(name).strip() for name in sheet_values[0]] if sheet_values else []
+    if id_column not in header:
+        raise KeyError(f"Sheet has no '{id_column}' column")
+    id_position = header.index(id_column)
+
+    updates = []
+    added_columns = []
+    for result_column, sheet_column in columns.items():
+        if sheet_column not in header:
+            header.append(sheet_column)
+            added_columns.append(sheet_column)
+            updates.append({'range': f"{column_letter(len(header))}1", 'values': [[sheet_column]]})
+    if results_df.empty:
+        return updates, {'changed_cells': 0, 'ranges': len(updates), 'added_columns': added_columns,
+                         'matched_rows': 0}
+
+    latest = results_df.drop_duplicates('Farm_ID', keep='last')
+    farm_ids = latest['Farm_ID'].astype(str).str.strip()
+    farm_values = {
+        # Missing values are left as they are in the sheet
+        result_column: pd.Series(latest[result_column].astype(float).round(WRITEBACK_DECIMALS.get(result_column, 6))
+                                 .to_numpy(), index=farm_ids.to_numpy()).dropna().to_dict()
+        for result_column in columns
+    }
+    row_ids = [str(row[id_position]).strip() if id_position < len(row) else '' for row in sheet_values[1:]]
+    known_ids = set(farm_ids)
+    matched_rows = sum(farm_id in known_ids for farm_id in row_ids)
+
+    changed_cells = 0
+    for result_column, sheet_column in columns.items():
+        position = header.index(sheet_column)
+        letter = column_letter(position + 1)
+        values = farm_values[result_column]
+        run_start, run_values = None, []
+        for row_number, (farm_id, row) in enumerate(zip(row_ids, sheet_values[1:]), start=2):
+            value = values.get(farm_id)
+            if value is not None and not _same_cell(row[position] if position < len(row) else None, value):
+                if run_start is None:
+                    run_start = row_number
+                run_values.append([value])
+                changed_cells += 1
+            elif run_start is not None:
+                updates.append({'range': f"{letter}{run_start}:{letter}{row_number - 1}", 'values': run_values})
+                run_start, run_values = None, []
+        if run_start is not None:
+            updates.append({'range': f"{letter}{run_start}:{letter}{run_start + len(run_values) - 1}",
+                            'values': run_values})
+
+    return updates, {'changed_cells': changed_cells, 'ranges': len(updates), 'added_columns': added_columns,
+                     'matched_rows': matched_rows}
+
+def write_back(worksheet, results_df, columns=WRITEBACK_COLUMNS, id_column=SHEET_FARM_ID_COLUMN):
+    """Write the result columns of results_df into a worksheet, changed cells only
+
+    worksheet is anything with gspread's get_all_values(value_render_option=...)
+    and batch_update(data, value_input_option=...) (plus col_count and
+    add_cols when result columns have to be created), so a local mock of
+    the Sheets API can stand in for it (awd.sheets_check runs it on one). One read plus one batch_update per
+    MAX_RANGES_PER_REQUEST ranges; returns the plan stats with the number of
+    'requests' made.
+    """
+    sheet_values = worksheet.get_all_values(value_render_option='UNFORMATTED_VALUE')
+    updates, stats = plan_writeback(sheet_values, results_df, columns, id_column)
+    requests = 1
+    header_width = len(sheet_values[0]) + len(stats['added_columns']) if sheet_values else 0
+    col_count = getattr(worksheet, 'col_count', None)
+    if col_count is not None and header_width > col_count:
+        # New result columns must fit in the sheet grid before values can land there
+        worksheet.add_cols(header_width - col_count)
+        requests += 1
+    for start in range(0, len(updates), MAX_RANGES_PER_REQUEST):
+        worksheet.batch_update(updates[start:start + MAX_RANGES_PER_REQUEST], value_input_option='RAW')
+        requests += 1
+    return dict(stats, requests=requests)
+
+def write_back_results(credentials_dict, sheet_url, worksheet_name, results_df):
+    """Open the master worksheet and write the computed results into it (see write_back)"""
+    return write_back(open_worksheet(credentials_dict, sheet_url, worksheet_name), results_df)
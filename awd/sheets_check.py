@@ -0,0 +1,187 @@
+"""Offline check of the Sheets write-back against an in-memory worksheet
+
+    python -m awd.sheets_check
+
+Runs awd.sheets.write_back on a MemoryWorksheet, a stand-in for the
+gspread worksheet that applies batch_update's A1 ranges to a grid (and,
+like the Sheets API, rejects writes outside it). Each case checks the
+planned ranges, the request count and the resulting sheet:
+
+    unchanged      cells that already hold the result are not written; no
+                   batch_update is sent when nothing changed
+    runs           consecutive changed rows of a column share one range
+    new columns    missing result columns are appended to the header row
+                   (after growing the grid) and filled
+    missing farm   a Farm_ID that is not in the sheet is not written, and
+                   sheet farms without results are left untouched
+    batching       more than MAX_RANGES_PER_REQUEST ranges are split over
+                   several batch_update requests
+    idempotent     writing the same results again changes nothing
+
+Exits 1 on any failure.
+"""
+import argparse
+import re
+import sys
+
+import pandas as pd
+
+from awd import sheets
+
+FARM_ID = sheets.SHEET_FARM_ID_COLUMN
+RESULT_COLUMNS = list(sheets.WRITEBACK_COLUMNS.values())
+
+_A1_RANGE = re.compile(r'^([A-Z]+)(\d+)(?::([A-Z]+)(\d+))?$')
+
+def _column_number(letters):
+    number = 0
+    for letter in letters:
+        number = number * 26 + ord(letter) - ord('A') + 1
+    return number
+
+class MemoryWorksheet:
+    """The slice of a gspread worksheet write_back uses, over a list of rows"""
+
+    def __init__(self, rows, col_count=None):
+        width = max((len(row) for row in rows), default=0)
+        self.rows = [list(row) + [''] * (width - len(row)) for row in rows]
+        self.col_count = width if col_count is None else col_count
+        self.batches = []  # data of every batch_update call
+        self.added_cols = 0
+
+    def get_all_values(self, value_render_option=None):
+        width = max((len(row) for row in self.rows), default=0)
+        return [list(row) + [''] * (width - len(row)) for row in self.rows]
+
+    def add_cols(self, cols):
+        self.col_count += cols
+        self.added_cols += cols
+
+    def batch_update(self, data, value_input_option=None):
+        self.batches.append(data)
+        for update in data:
+            match = _A1_RANGE.match(update['range'])
+            if match is None:
+                raise ValueError(f"Unsupported range {update['range']!r}")
+            first_col, first_row = _column_number(match.group(1)), int(match.group(2))
+            last_col = _column_number(match.group(3)) if match.group(3) else first_col
+            last_row = int(match.group(4)) if match.group(4) else first_row
+            if last_col > self.col_count or last_row > len(self.rows):
+                raise ValueError(f"Range {update['range']} exceeds grid limits")
+            if len(update['values']) != last_row - first_row + 1:
+                raise ValueError(f"Range {update['range']} got {len(update['values'])} rows")
+            for row_number, values in enumerate(update['values'], start=first_row):
+                row = self.rows[row_number - 1]
+                row.extend([''] * (last_col - len(row)))
+                row[first_col - 1:first_col - 1 + len(values)] = values
+
+    def column(self, name):
+        """{farm ID: cell} of one column"""
+        header = self.rows[0]
+        id_position, position = header.index(FARM_ID), header.index(name)
+        return {row[id_position]: row[position] if position < len(row) else '' for row in self.rows[1:]}
+
+def results_frame(farms):
+    """Result rows for {farm ID: (proportion, eligible acres, amount)}"""
+    return pd.DataFrame([
+        {'Farm_ID': farm_id, 'Farm_Proportion_Passing': proportion, 'Eligible_Acres': acres,
+         'Final_Incentive_Amount': amount}
+        for farm_id, (proportion, acres, amount) in farms.items()
+    ])
+
+def sheet_rows(farms, with_results=True):
+    """Master sheet rows for {farm ID: (proportion, eligible acres, amount)}, the result columns optional"""
+    header = [FARM_ID, 'Kharif 25 Farmer Name'] + (RESULT_COLUMNS if with_results else [])
+    rows = [header]
+    for farm_id, values in farms.items():
+        rows.append([farm_id, f'Farmer {farm_id}'] + (list(values) if with_results else []))
+    return rows
+
+def _expect(failures, case, condition, message):
+    if not condition:
+        failures.append(f"{case}: {message}")
+
+def check_unchanged(failures):
+    farms = {'F1': (0.5, 1.25, 1500.0), 'F2': (1.0, 2.0, 3000.0)}
+    worksheet = MemoryWorksheet(sheet_rows(farms))
+    stats = sheets.write_back(worksheet, results_frame(farms))
+    _expect(failures, 'unchanged', stats['changed_cells'] == 0, f"{stats['changed_cells']} cells changed")
+    _expect(failures, 'unchanged', worksheet.batches == [], f"{len(worksheet.batches)} batch_update calls")
+    _expect(failures, 'unchanged', stats['requests'] == 1, f"{stats['requests']} requests, expected the read only")
+
+def check_runs(failures):
+    sheet_farms = {f'F{i}': (0.0, 0.0, 0.0) for i in range(1, 7)}
+    results = dict(sheet_farms, F2=(0.0, 0.0, 100.0), F3=(0.0, 0.0, 200.0), F5=(0.0, 0.0, 300.0))
+    worksheet = MemoryWorksheet(sheet_rows(sheet_farms))
+    stats = sheets.write_back(worksheet, results_frame(results))
+    ranges = [update['range'] for batch in worksheet.batches for update in batch]
+    _expect(failures, 'runs', ranges == ['E3:E4', 'E6:E6'], f"ranges {ranges}")
+    _expect(failures, 'runs', stats['changed_cells'] == 3, f"{stats['changed_cells']} cells changed")
+    _expect(failures, 'runs', stats['requests'] == 2, f"{stats['requests']} requests")
+    amounts = worksheet.column('Final_Incentive_Amount')
+    _expect(failures, 'runs', [amounts[f'F{i}'] for i in range(1, 7)] == [0.0, 100.0, 200.0, 0.0, 300.0, 0.0],
+            f"amounts {amounts}")
+
+def check_new_columns(failures):
+    farms = {'F1': (0.25, 0.5, 600.0), 'F2': (0.75, 1.5, 1800.0)}
+    worksheet = MemoryWorksheet(sheet_rows(farms, with_results=False))
+    stats = sheets.write_back(worksheet, results_frame(farms))
+    _expect(failures, 'new columns', stats['added_columns'] == RESULT_COLUMNS, f"added {stats['added_columns']}")
+    _expect(failures, 'new columns', worksheet.rows[0] == [FARM_ID, 'Kharif 25 Farmer Name'] + RESULT_COLUMNS,
+            f"header {worksheet.rows[0]}")
+    _expect(failures, 'new columns', worksheet.added_cols == len(RESULT_COLUMNS),
+            f"grid grew by {worksheet.added_cols} columns")
+    _expect(failures, 'new columns', stats['requests'] == 3, f"{stats['requests']} requests (read, add_cols, update)")
+    for position, column in enumerate(RESULT_COLUMNS):
+        written = worksheet.column(column)
+        expected = {farm_id: values[position] for farm_id, values in farms.items()}
+        _expect(failures, 'new columns', written == expected, f"{column} {written}, expected {expected}")
+
+def check_missing_farm(failures):
+    sheet_farms = {'F1': (0.0, 0.0, 0.0), 'F2': (0.9, 9.0, 9.0)}
+    worksheet = MemoryWorksheet(sheet_rows(sheet_farms))
+    stats = sheets.write_back(worksheet, results_frame({'F1': (0.5, 1.0, 1200.0), 'F9': (1.0, 3.0, 3600.0)}))
+    _expect(failures, 'missing farm', stats['matched_rows'] == 1, f"{stats['matched_rows']} rows matched")
+    _expect(failures, 'missing farm', stats['changed_cells'] == 3, f"{stats['changed_cells']} cells changed")
+    _expect(failures, 'missing farm', len(worksheet.rows) == 3, f"sheet has {len(worksheet.rows)} rows")
+    _expect(failures, 'missing farm', 'F9' not in worksheet.column('Final_Incentive_Amount'), "F9 was written")
+    _expect(failures, 'missing farm', worksheet.rows[2][2:] == [0.9, 9.0, 9.0], f"F2 changed to {worksheet.rows[2]}")
+
+def check_batching(failures):
+    # Every other row changes, so each changed cell is its own range
+    ranges_wanted = sheets.MAX_RANGES_PER_REQUEST + 1
+    sheet_farms = {f'F{i}': (0.0, 0.0, 0.0) for i in range(2 * ranges_wanted)}
+    results = {farm_id: (0.0, 0.0, 1.0 if i % 2 == 0 else 0.0) for i, farm_id in enumerate(sheet_farms)}
+    worksheet = MemoryWorksheet(sheet_rows(sheet_farms))
+    stats = sheets.write_back(worksheet, results_frame(results))
+    _expect(failures, 'batching', stats['ranges'] == ranges_wanted, f"{stats['ranges']} ranges")
+    _expect(failures, 'batching', [len(batch) for batch in worksheet.batches] == [sheets.MAX_RANGES_PER_REQUEST, 1],
+            f"batch sizes {[len(batch) for batch in worksheet.batches]}")
+    _expect(failures, 'batching', stats['requests'] == 3, f"{stats['requests']} requests")
+
+def check_idempotent(failures):
+    farms = {'F1': (1 / 3, 1.0, 1000.0), 'F2': (0.0, 0.0, 0.0)}
+    worksheet = MemoryWorksheet(sheet_rows(farms, with_results=False))
+    sheets.write_back(worksheet, results_frame(farms))
+    stats = sheets.write_back(worksheet, results_frame(farms))
+    _expect(failures, 'idempotent', stats['changed_cells'] == 0 and stats['added_columns'] == [],
+            f"second write changed {stats['changed_cells']} cells, added {stats['added_columns']}")
+
+CHECKS = [check_unchanged, check_runs, check_new_columns, check_missing_farm, check_batching, check_idempotent]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.parse_args(argv)
+
+    failures = []
+    for check in CHECKS:
+        before = len(failures)
+        check(failures)
+        print(f"  {check.__name__[len('check_'):]:<14} {'OK' if len(failures) == before else 'FAIL'}")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    print("OK" if not failures else "FAIL")
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,151 @@
+"""Versioned on-disk snapshots of precomputed standard reports
+
+A report is identified by (master_dataset_id, water_dataset_id, start, end).
+Each save writes a new numbered version directory and then swaps the
+report's LATEST pointer, so readers never see a half-written snapshot.
+Only the last KEEP_VERSIONS versions of a report are kept, and only the
+KEEP_REPORTS most recently saved or loaded reports: a daily rebuild on
+new source data saves a new report, and the older ones are removed.
+"""
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import threading
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from awd import instrumentation
+
+DEFAULT_SNAPSHOT_DIR = os.path.join('.awd_cache', 'snapshots')
+KEEP_VERSIONS = 5
+KEEP_REPORTS = 8
+
+def report_key(master_dataset_id, water_dataset_id, start_date, end_date):
+    return (str(master_dataset_id), str(water_dataset_id), str(start_date), str(end_date))
+
+def _write_atomic(path, payload, mode='wb'):
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, mode) as handle:
+        handle.write(payload)
+    os.replace(temp_path, path)
+
+def _tables_bytes(tables):
+    total = 0
+    for table in tables.values():
+        if isinstance(table, (pd.DataFrame, pd.Series)):
+            usage = table.memory_usage(deep=True)
+            total += int(usage.sum()) if isinstance(usage, pd.Series) else int(usage)
+    return total
+
+class SnapshotStore:
+    """Report snapshots under root/<report digest>/v<version>/ with a LATEST pointer per report"""
+
+    def __init__(self, root=DEFAULT_SNAPSHOT_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+        self._loaded = {}  # report key -> most recently loaded snapshot
+        self._memory = {}  # report key -> (bytes, last used) of the loaded snapshot
+
+    def _report_dir(self, key):
+        return os.path.join(self.root, hashlib.sha1(repr(key).encode('utf-8')).hexdigest())
+
+    def latest_version(self, key):
+        try:
+            with open(os.path.join(self._report_dir(key), 'LATEST')) as handle:
+                return int(handle.read().strip())
+        except (OSError, ValueError):
+            return None
+
+    def save(self, key, tables, meta=None):
+        """Write tables (dict of DataFrames) as the report's next version; returns the version number"""
+        with self._lock:
+            report_dir = self._report_dir(key)
+            version = (self.latest_version(key) or 0) + 1
+            version_dir = os.path.join(report_dir, f"v{version:04d}")
+            os.makedirs(version_dir, exist_ok=True)
+
+            meta = dict(meta or {}, report_key=list(key), version=version,
+                        built_at=datetime.now().isoformat(timespec='seconds'), tables=sorted(tables))
+            _write_atomic(os.path.join(version_dir, 'tables.pkl'),
+                          pickle.dumps(tables, protocol=pickle.HIGHEST_PROTOCOL))
+            _write_atomic(os.path.join(version_dir, 'meta.json'), json.dumps(meta, indent=2, default=str), mode='w')
+            _write_atomic(os.path.join(report_dir, 'LATEST'), str(version), mode='w')
+            self._prune(report_dir, version)
+            self._prune_reports(report_dir)
+
+        instrumentation.increment('snapshots.saved')
+        return version
+
+    def _prune(self, report_dir, latest_version):
+        for name in os.listdir(report_dir):
+            if name.startswith('v') and name[1:].isdigit() and int(name[1:]) <= latest_version - KEEP_VERSIONS:
+                version_dir = os.path.join(report_dir, name)
+                for file_name in os.listdir(version_dir):
+                    os.remove(os.path.join(version_dir, file_name))
+                os.rmdir(version_dir)
+
+    def _prune_reports(self, keep_dir):
+        """Remove all but the KEEP_REPORTS most recently used reports under root (never keep_dir)"""
+        def last_used(report_dir):
+            try:
+                return os.path.getmtime(os.path.join(report_dir, 'LATEST'))
+            except OSError:
+                return 0.0
+
+        report_dirs = [os.path.join(self.root, name) for name in os.listdir(self.root)
+                       if os.path.isdir(os.path.join(self.root, name))]
+        for report_dir in sorted(report_dirs, key=last_used, reverse=True)[KEEP_REPORTS:]:
+            if report_dir != keep_dir:
+                shutil.rmtree(report_dir, ignore_errors=True)
+                instrumentation.increment('snapshots.reports_pruned')
+
+    def load(self, key, version=None):
+        """Return {'meta', 'tables'} for a version (default latest), or None when there is none"""
+        version = version or self.latest_version(key)
+        if version is None:
+            return None
+        loaded = self._loaded.get(key)
+        if loaded is not None and loaded['meta']['version'] == version:
+            instrumentation.increment('snapshots.memory_hits')
+            with self._lock:
+                if key in self._memory:
+                    self._memory[key] = (self._memory[key][0], time.time())
+            return loaded
+
+        version_dir = os.path.join(self._report_dir(key), f"v{version:04d}")
+        try:
+            with open(os.path.join(version_dir, 'meta.json')) as handle:
+                meta = json.load(handle)
+            with open(os.path.join(version_dir, 'tables.pkl'), 'rb') as handle:
+                tables = pickle.load(handle)
+        except Exception:
+            # Pruned underneath us or unreadable: behave as if there is no snapshot
+            return None
+
+        try:
+            # Loading counts as use, so reports still being served are not pruned
+            os.utime(os.path.join(self._report_dir(key), 'LATEST'))
+        except OSError:
+            pass
+        snapshot = {'meta': meta, 'tables': tables}
+        self._loaded[key] = snapshot
+        with self._lock:
+            self._memory[key] = (_tables_bytes(tables), time.time())
+        instrumentation.increment('snapshots.disk_loads')
+        return snapshot
+
+    def memory_entries(self):
+        """[(report key, bytes, last used)] of the snapshots held in memory"""
+        with self._lock:
+            return [(key, size, last_used) for key, (size, last_used) in self._memory.items()]
+
+    def evict(self, key):
+        """Forget a loaded snapshot; the next load reads it from disk again"""
+        self._loaded.pop(key, None)
+        with self._lock:
+            self._memory.pop(key, None)
+        instrumentation.increment('snapshots.evictions')
@@ -0,0 +1,298 @@
+"""Embedded SQLite analytics store for cleaned readings, master data and analysis results
+
+The store persists across Streamlit sessions and users; every table is keyed
+by a content fingerprint (dataset_id), an analysis run (run_id) or a payment
+run (payment_run_id), so writes are idempotent. Summaries across stored runs
+are answered with SQL (the dashboard's query panel). The village, group and
+weekly summaries of the current run come from the roll-up cube in
+awd.summary_cube instead: it is built from the run's frames already in
+memory, so a round trip through SQLite would only add work.
+"""
+import json
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+
+import pandas as pd
+
+from awd.arrow import to_numpy_datetimes
+from awd.payments import PAYMENT_SUMMARY_COLUMNS
+
+DEFAULT_DB_PATH = os.path.join('.awd_cache', 'awd_analytics.sqlite')
+
+# Result columns persisted per run; the analysis table may carry extra display-only columns
+STORED_RESULT_COLUMNS = [
+    'Village', 'Farm_ID', 'Farmer_Name', 'Group', 'Valid_Farm', 'Total_Incentive_Acres',
+    'All_Pipe_IDs', 'Total_Assigned_Pipes', 'Valid_Pipes_Count', 'Pipes_Passing',
+    'Compliant_Pipe_IDs', 'Non_Compliant_Pipe_IDs', 'Farm_Proportion_Passing',
+    'Eligible_Acres', 'Final_Incentive_Amount'
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS datasets (
+    dataset_id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    row_count INTEGER NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS readings (
+    dataset_id TEXT NOT NULL,
+    Date TEXT NOT NULL,
+    Day TEXT NOT NULL,
+    Farm_ID TEXT NOT NULL,
+    Pipe_ID TEXT NOT NULL,
+    Water_Level_mm REAL NOT NULL,
+    Surveyor TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_readings_pipe ON readings (dataset_id, Pipe_ID);
+CREATE INDEX IF NOT EXISTS idx_readings_farm ON readings (dataset_id, Farm_ID);
+CREATE INDEX IF NOT EXISTS idx_readings_day ON readings (dataset_id, Day);
+CREATE TABLE IF NOT EXISTS master (
+    dataset_id TEXT NOT NULL,
+    Farm_ID TEXT NOT NULL,
+    Farmer_Name TEXT,
+    Village TEXT,
+    Incentive_Acres REAL,
+    "Group" TEXT,
+    Payment_Eligible INTEGER,
+    Pipe_Codes TEXT,
+    Pipe_Count INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_master_farm ON master (dataset_id, Farm_ID);
+CREATE INDEX IF NOT EXISTS idx_master_village ON master (dataset_id, Village);
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    start_date TEXT NOT NULL,
+    end_date TEXT NOT NULL,
+    master_dataset_id TEXT NOT NULL,
+    water_dataset_id TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS farm_results (
+    run_id TEXT NOT NULL,
+    Village TEXT,
+    Farm_ID TEXT NOT NULL,
+    Farmer_Name TEXT,
+    "Group" TEXT,
+    Valid_Farm TEXT,
+    Total_Incentive_Acres REAL,
+    All_Pipe_IDs TEXT,
+    Total_Assigned_Pipes INTEGER,
+    Valid_Pipes_Count INTEGER,
+    Pipes_Passing INTEGER,
+    Compliant_Pipe_IDs TEXT,
+    Non_Compliant_Pipe_IDs TEXT,
+    Farm_Proportion_Passing REAL,
+    Eligible_Acres REAL,
+    Final_Incentive_Amount REAL
+);
+CREATE INDEX IF NOT EXISTS idx_results_village ON farm_results (run_id, Village);
+CREATE INDEX IF NOT EXISTS idx_results_farm ON farm_results (run_id, Farm_ID);
+CREATE INDEX IF NOT EXISTS idx_results_group ON farm_results (run_id, "Group");
+CREATE TABLE IF NOT EXISTS payment_runs (
+    payment_run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    summary_id TEXT NOT NULL,
+    start_date TEXT NOT NULL,
+    end_date TEXT NOT NULL,
+    farm_count INTEGER NOT NULL,
+    total_amount REAL NOT NULL,
+    created_at TEXT NOT NULL,
+    scope TEXT
+);
+CREATE TABLE IF NOT EXISTS payment_rows (
+    payment_run_id INTEGER NOT NULL,
+    Village TEXT,
+    Farm_ID TEXT NOT NULL,
+    Farmer_Name TEXT,
+    "Group" TEXT,
+    Valid_Farm TEXT,
+    Total_Incentive_Acres REAL,
+    Valid_Pipes_Count INTEGER,
+    Pipes_Passing INTEGER,
+    Eligible_Acres REAL,
+    Farm_Proportion_Passing REAL,
+    Final_Incentive_Amount REAL
+);
+CREATE INDEX IF NOT EXISTS idx_payment_rows_run ON payment_rows (payment_run_id);
+"""
+
+def _connect(db_path):
+    """Open a connection with the schema in place (one per call keeps sessions thread-safe)"""
+    directory = os.path.dirname(db_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.executescript(SCHEMA)
+    _migrate(conn)
+    return conn
+
+def _migrate(conn):
+    """Add columns introduced after a store was created; old payment runs keep an unknown (NULL) scope"""
+    payment_run_columns = {row[1] for row in conn.execute('PRAGMA table_info(payment_runs)')}
+    if 'scope' not in payment_run_columns:
+        conn.execute('ALTER TABLE payment_runs ADD COLUMN scope TEXT')
+
+def dataset_fingerprint(df):
+    """Content hash of a frame, used as its dataset_id"""
+    hashable = df
+    if 'Pipe_Codes' in df.columns:
+        hashable = df.assign(Pipe_Codes=df['Pipe_Codes'].map(lambda codes: '|'.join(codes)))
+    return format(int(pd.util.hash_pandas_object(hashable, index=False).sum()), '016x')
+
+def _register_dataset(conn, dataset_id, kind, row_count):
+    """Record a dataset; returns False when it was already stored"""
+    exists = conn.execute('SELECT 1 FROM datasets WHERE dataset_id = ?', (dataset_id,)).fetchone()
+    if exists:
+        return False
+    conn.execute('INSERT INTO datasets VALUES (?, ?, ?, ?)',
+                 (dataset_id, kind, row_count, datetime.now().isoformat(timespec='seconds')))
+    return True
+
+def save_readings(db_path, water_df):
+    """Persist cleaned readings once per distinct dataset; returns the dataset_id"""
+    dataset_id = dataset_fingerprint(water_df)
+    with closing(_connect(db_path)) as conn, conn:
+        if _register_dataset(conn, dataset_id, 'readings', len(water_df)):
+            dates = to_numpy_datetimes(water_df['Date'])
+            readings = pd.DataFrame({
+                'dataset_id': dataset_id,
+                'Date': dates.dt.strftime('%Y-%m-%d %H:%M:%S'),
+                'Day': dates.dt.strftime('%Y-%m-%d'),
+                'Farm_ID': water_df['Farm_ID'].astype(str),
+                'Pipe_ID': water_df['Pipe_ID'].astype(str),
+                'Water_Level_mm': water_df['Water_Level_mm'].astype(float),
+                'Surveyor': water_df['Surveyor'].astype(str) if 'Surveyor' in water_df.columns else None
+            })
+            readings.to_sql('readings', conn, if_exists='append', index=False, chunksize=50000)
+    return dataset_id
+
+def load_readings(db_path, dataset_id):
+    """Stored readings of a dataset as a raw water frame (Date, Pipe_ID, Water_Level_mm[, Surveyor]) for re-cleaning"""
+    readings = query(db_path, 'SELECT Date, Pipe_ID, Water_Level_mm, Surveyor FROM readings WHERE dataset_id = ?',
+                     [dataset_id])
+    readings['Date'] = pd.to_datetime(readings['Date'])
+    if readings['Surveyor'].isna().all():
+        readings = readings.drop(columns='Surveyor')
+    return readings
+
+def save_master(db_path, master_df):
+    """Persist cleaned master data once per distinct dataset; returns the dataset_id"""
+    dataset_id = dataset_fingerprint(master_df)
+    with closing(_connect(db_path)) as conn, conn:
+        if _register_dataset(conn, dataset_id, 'master', len(master_df)):
+            master = pd.DataFrame({
+                'dataset_id': dataset_id,
+                'Farm_ID': master_df['Farm_ID'].astype(str),
+                'Farmer_Name': master_df['Farmer_Name'].astype(str),
+                'Village': master_df['Village'].astype(str),
+                'Incentive_Acres': master_df['Incentive_Acres'].astype(float),
+                'Group': master_df['Group'].astype(str),
+                'Payment_Eligible': master_df['Payment_Eligible'].astype(bool).astype(int),
+                'Pipe_Codes': master_df['Pipe_Codes'].map(lambda codes: '|'.join(codes)),
+                'Pipe_Count': master_df['Pipe_Count'].astype(int)
+            })
+            master.to_sql('master', conn, if_exists='append', index=False, chunksize=50000)
+    return dataset_id
+
+def make_run_id(start_date, end_date, master_dataset_id, water_dataset_id):
+    """Deterministic id for an analysis over one date range and pair of datasets"""
+    return f"{start_date}_{end_date}_{master_dataset_id}_{water_dataset_id}"
+
+def save_results(db_path, results_df, start_date, end_date, master_dataset_id, water_dataset_id):
+    """Persist (or replace) the farm results of one analysis run; returns the run_id"""
+    run_id = make_run_id(start_date, end_date, master_dataset_id, water_dataset_id)
+    with closing(_connect(db_path)) as conn, conn:
+        conn.execute('DELETE FROM farm_results WHERE run_id = ?', (run_id,))
+        conn.execute('INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?, ?)',
+                     (run_id, str(start_date), str(end_date), master_dataset_id, water_dataset_id,
+                      datetime.now().isoformat(timespec='seconds')))
+        stored = results_df[STORED_RESULT_COLUMNS].copy()
+        stored.insert(0, 'run_id', run_id)
+        stored.to_sql('farm_results', conn, if_exists='append', index=False, chunksize=50000)
+    return run_id
+
+def covering_selection(selected, available):
+    """selected, or [] when it holds every available value: both select every farm"""
+    selected = list(selected or [])
+    return [] if set(map(str, available)) <= set(map(str, selected)) else selected
+
+def payment_scope(groups=None, villages=None):
+    """Canonical text of the group/village selection a payment summary covers (empty lists: every farm)
+
+    Callers pass selections through covering_selection first, so picking
+    every group or village is the same scope as picking none.
+    """
+    return json.dumps({'groups': sorted(map(str, groups or [])), 'villages': sorted(map(str, villages or []))})
+
+def save_payment_run(db_path, payment_summary, start_date, end_date, groups=None, villages=None):
+    """Record an exported payment summary as the next payment run; returns its payment_run_id
+
+    A run is recorded with its period and group/village selection.
+    Exporting the same summary again right after keeps the latest run of
+    that period and selection instead of adding an identical one.
+    """
+    payment_summary = payment_summary.reindex(columns=PAYMENT_SUMMARY_COLUMNS)
+    summary_id = dataset_fingerprint(payment_summary)
+    scope = payment_scope(groups, villages)
+    with closing(_connect(db_path)) as conn, conn:
+        latest = conn.execute('SELECT payment_run_id, summary_id FROM payment_runs '
+                              'WHERE start_date = ? AND end_date = ? AND scope = ? '
+                              'ORDER BY payment_run_id DESC LIMIT 1',
+                              (str(start_date), str(end_date), scope)).fetchone()
+        if latest and latest[1] == summary_id:
+            return latest[0]
+        cursor = conn.execute(
+            'INSERT INTO payment_runs (summary_id, start_date, end_date, farm_count, total_amount, created_at, scope) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (summary_id, str(start_date), str(end_date), len(payment_summary),
+             float(payment_summary['Final_Incentive_Amount'].sum()), datetime.now().isoformat(timespec='seconds'),
+             scope)
+        )
+        payment_run_id = cursor.lastrowid
+        stored = payment_summary.copy()
+        stored.insert(0, 'payment_run_id', payment_run_id)
+        stored.to_sql('payment_rows', conn, if_exists='append', index=False, chunksize=50000)
+    return payment_run_id
+
+def previous_payment_run(db_path, payment_run_id):
+    """Id of the run recorded before payment_run_id for the same period and selection, or None
+
+    Runs of another period or selection (and runs recorded before the
+    selection was stored) are never compared against.
+    """
+    runs = query(db_path, """
+        SELECT MAX(previous.payment_run_id) AS payment_run_id
+        FROM payment_runs AS current
+        JOIN payment_runs AS previous
+          ON previous.start_date = current.start_date AND previous.end_date = current.end_date
+         AND previous.scope = current.scope AND previous.payment_run_id < current.payment_run_id
+        WHERE current.payment_run_id = ?
+    """, [payment_run_id])
+    previous = runs['payment_run_id'].iloc[0]
+    return None if pd.isna(previous) else int(previous)
+
+def load_payment_run(db_path, payment_run_id):
+    """Payment summary rows of a recorded payment run"""
+    columns = ', '.join(f'"{column}"' for column in PAYMENT_SUMMARY_COLUMNS)
+    return query(db_path, f'SELECT {columns} FROM payment_rows WHERE payment_run_id = ?', [payment_run_id])
+
+def list_payment_runs(db_path, start_date=None, end_date=None, groups=None, villages=None):
+    """Recorded payment runs, newest first; with start_date and end_date only those of that period and selection"""
+    if start_date is None or end_date is None:
+        return query(db_path, 'SELECT * FROM payment_runs ORDER BY payment_run_id DESC')
+    return query(db_path, 'SELECT * FROM payment_runs WHERE start_date = ? AND end_date = ? AND scope = ? '
+                          'ORDER BY payment_run_id DESC',
+                 [str(start_date), str(end_date), payment_scope(groups, villages)])
+
+def list_runs(db_path):
+    """All stored analysis runs, newest first"""
+    return query(db_path, 'SELECT * FROM runs ORDER BY created_at DESC')
+
+def query(db_path, sql, params=None, read_only=False):
+    """Run a SQL query against the store and return a DataFrame"""
+    with closing(_connect(db_path)) as conn:
+        if read_only:
+            conn.execute('PRAGMA query_only = ON')
+        return pd.read_sql_query(sql, conn, params=params)
@@ -0,0 +1,131 @@
+"""Pre-aggregated summary cube over (Village, Group, Week, Valid_Farm)
+
+Farm rows are aggregated once into additive measures (counts, sums and the
+sum of squares of the compliance proportion). Every village, group and
+weekly summary is a roll-up of that cube, so each summary re-sums a few
+hundred cube cells instead of re-aggregating farm rows. The cube is built
+over the farms an analysis run covered: the group/village selection is
+pushed down into the run (incremental.select_farms), and rollup's filters
+can narrow it further.
+Week 0 holds the full analysis period; weeks 1..N come from the weekly
+breakdown.
+"""
+import numpy as np
+import pandas as pd
+
+CUBE_DIMENSIONS = ['Village', 'Group', 'Week', 'Valid_Farm']
+FULL_PERIOD_WEEK = 0
+
+def _cube_rows(farm_df, proportion_column, valid_pipes_column):
+    """Additive measures for each (Village, Group, Week, Valid_Farm) cell"""
+    proportion = farm_df[proportion_column].astype(float)
+    measures = pd.DataFrame({
+        'Village': farm_df['Village'].to_numpy(),
+        'Group': farm_df['Group'].to_numpy(),
+        'Week': farm_df['Week'].to_numpy(),
+        'Valid_Farm': farm_df['Valid_Farm'].astype(str).to_numpy(),
+        'Farms': 1,
+        'Assigned_Pipes': farm_df['Total_Assigned_Pipes'].to_numpy(),
+        'Valid_Pipes': farm_df[valid_pipes_column].to_numpy(),
+        'Pipes_Passing': farm_df['Pipes_Passing'].to_numpy(),
+        'Incentive': farm_df['Final_Incentive_Amount'].astype(float).to_numpy(),
+        'Proportion_Sum': proportion.to_numpy(),
+        'Proportion_Sumsq': (proportion ** 2).to_numpy(),
+        'Farms_Passing': (proportion > 0).astype(int).to_numpy()
+    })
+    return measures.groupby(CUBE_DIMENSIONS, sort=True).sum()
+
+def build_summary_cube(results_df, weekly_df=None):
+    """Aggregate period results (week 0) and optional weekly results (weeks 1..N) into the cube"""
+    parts = [_cube_rows(results_df.assign(Week=FULL_PERIOD_WEEK), 'Farm_Proportion_Passing', 'Valid_Pipes_Count')]
+    if weekly_df is not None and not weekly_df.empty:
+        parts.append(_cube_rows(weekly_df, 'Proportion_Passing', 'Valid_Pipes_Count'))
+    return pd.concat(parts).sort_index()
+
+def rollup(cube, by, groups=None, villages=None, week=FULL_PERIOD_WEEK):
+    """Sum the cube cells matching the filters, grouped by the given dimension(s)
+
+    week=None keeps every week (including week 0 if present); empty filter
+    lists mean no filter, like the sidebar multiselects.
+    """
+    cells = cube.reset_index()
+    mask = np.ones(len(cells), dtype=bool)
+    if groups:
+        mask &= cells['Group'].isin(groups).to_numpy()
+    if villages:
+        mask &= cells['Village'].isin(villages).to_numpy()
+    if week is not None:
+        mask &= (cells['Week'] == week).to_numpy()
+    cells = cells[mask]
+
+    by = [by] if isinstance(by, str) else list(by)
+    totals = cells.groupby(by, sort=True)[['Farms', 'Assigned_Pipes', 'Valid_Pipes', 'Pipes_Passing',
+                                           'Incentive', 'Proportion_Sum', 'Proportion_Sumsq']].sum()
+    valid = cells[cells['Valid_Farm'] == '1'].groupby(by, sort=True)[['Farms', 'Proportion_Sum', 'Farms_Passing']].sum()
+    totals['Valid_Farms'] = valid['Farms'].reindex(totals.index, fill_value=0).astype(int)
+    totals['Valid_Proportion_Sum'] = valid['Proportion_Sum'].reindex(totals.index, fill_value=0.0)
+    totals['Valid_Farms_Passing'] = valid['Farms_Passing'].reindex(totals.index, fill_value=0).astype(int)
+    return totals
+
+def _mean(total, count):
+    return pd.Series(np.divide(total, count, out=np.zeros(len(total)), where=count > 0), index=total.index)
+
+def village_summary(cube, groups=None, villages=None):
+    """Same frame as create_village_summary on the filtered period results"""
+    totals = rollup(cube, 'Village', groups, villages)
+    summary = pd.DataFrame({
+        'Total_Farms': totals['Farms'].astype(int),
+        'Valid_Farms': totals['Valid_Farms'],
+        'Avg_Compliance_Rate_Valid_Farms': _mean(totals['Valid_Proportion_Sum'], totals['Valid_Farms']),
+        'Total_Village_Incentive': totals['Incentive'],
+        'Total_Compliant_Pipes': totals['Pipes_Passing'].astype(int),
+        'Total_Valid_Pipes': totals['Valid_Pipes'].astype(int),
+        'Total_Assigned_Pipes': totals['Assigned_Pipes'].astype(int)
+    })
+    return summary.round(2)
+
+def group_summary(cube, groups=None, villages=None):
+    """Same frame as create_group_summary on the filtered period results"""
+    totals = rollup(cube, 'Group', groups, villages)
+    return pd.DataFrame({
+        'Total_Farms': totals['Farms'].astype(int),
+        'Valid_Farms': totals['Valid_Farms'],
+        'Compliant_Farms': totals['Valid_Farms_Passing'],
+        'Percent_Compliant_Farms': _mean(totals['Valid_Farms_Passing'] * 100.0, totals['Valid_Farms']),
+        'Total_Assigned_Pipes': totals['Assigned_Pipes'].astype(int),
+        'Valid_Pipes_Total': totals['Valid_Pipes'].astype(int),
+        'Pipes_Passing_Total': totals['Pipes_Passing'].astype(int),
+        'Avg_Compliance_Rate_Valid_Farms': _mean(totals['Valid_Proportion_Sum'], totals['Valid_Farms']),
+        'Total_Incentive_Amount': totals['Incentive']
+    })
+
+def group_performance(cube, groups=None, villages=None):
+    """Group Performance Comparison: mean and sample std of compliance over all farms"""
+    totals = rollup(cube, 'Group', groups, villages)
+    farms = totals['Farms'].astype(float)
+    mean = totals['Proportion_Sum'] / farms
+    variance = (totals['Proportion_Sumsq'] - totals['Proportion_Sum'] ** 2 / farms) / (farms - 1)
+    std = np.sqrt(variance.clip(lower=0).where(farms > 1))
+    return pd.DataFrame({
+        'Total_Farms': totals['Farms'].astype(int),
+        'Total_Assigned': totals['Assigned_Pipes'].astype(int),
+        'Total_Valid': totals['Valid_Pipes'].astype(int),
+        'Total_Passing': totals['Pipes_Passing'].astype(int),
+        'Avg_Compliance': mean,
+        'Compliance_StdDev': std,
+        'Total_Incentive': totals['Incentive'],
+        'Avg_Incentive_per_Farm': totals['Incentive'] / farms
+    }).round(2)
+
+def weekly_summary(cube, groups=None, villages=None):
+    """Per-week totals matching the Weekly Summary table (weeks 1..N only)"""
+    totals = rollup(cube, 'Week', groups, villages, week=None)
+    totals = totals[totals.index != FULL_PERIOD_WEEK]
+    return pd.DataFrame({
+        'Farms_Analyzed': totals['Farms'].astype(int),
+        'Total_Assigned': totals['Assigned_Pipes'].astype(int),
+        'Valid_Pipes': totals['Valid_Pipes'].astype(int),
+        'Pipes_Passing': totals['Pipes_Passing'].astype(int),
+        'Avg_Compliance': totals['Proportion_Sum'] / totals['Farms'],
+        'Week_Total_Incentive': totals['Incentive']
+    })
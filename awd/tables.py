@@ -0,0 +1,135 @@
+"""Per-pipe report tables and summary tables built from the analysis results"""
+import numpy as np
+import pandas as pd
+
+from awd import payments, summary_cube, timeseries
+from awd.reporting import LOG
+
+def _window_store(water_df, start_date, end_date, reading_store=None):
+    if reading_store is None:
+        return timeseries.build_reading_store(water_df, start_date, end_date)
+    return timeseries.window_store(reading_store, start_date, end_date)
+
+def create_pipe_readings_table(master_df, water_df, farm_pipe_mapping, start_date, end_date, report=LOG,
+                               reading_store=None):
+    """Create detailed pipe readings table from the compact reading store (every reading listed)
+
+    reading_store is the already built store of water_df; it is windowed
+    instead of packing water_df again.
+    """
+    try:
+        store = _window_store(water_df, start_date, end_date, reading_store)
+        slots = timeseries.assigned_slots(master_df, store)
+        series_text = timeseries.joined_readings(store)
+        compliant = timeseries.series_compliant(store)
+        farms_with_readings = set(store['farm_ids'])
+        slots_by_farm = dict(tuple(slots.groupby('Farm_Position', sort=False)))
+        
+        results = []
+        for position, farm_data in enumerate(master_df[['Farm_ID', 'Village', 'Farmer_Name', 'Group']].itertuples(index=False)):
+            farm_slots = slots_by_farm.get(position, slots.iloc[0:0])
+            
+            # Pipe columns for the first five assigned pipes
+            pipe_columns = {f'Pipe_{i + 1}': 'Not assigned' for i in range(5)}
+            non_compliant_pipes = []
+            for slot in farm_slots.itertuples(index=False):
+                if slot.Slot <= 5:
+                    readings_text = series_text[slot.Series] if slot.Readings else 'No data'
+                    pipe_columns[f'Pipe_{slot.Slot}'] = f"{slot.Pipe_ID}: {readings_text}"
+                
+                # Non-compliant pipes are reported by their (first) pipe number
+                if not slot.Readings:
+                    non_compliant_pipes.append(f"{slot.First_Slot}(no data)")
+                elif not compliant[slot.Series]:
+                    if slot.Readings == 1:
+                        non_compliant_pipes.append(f"{slot.First_Slot}(single reading >200mm)")
+                    else:
+                        non_compliant_pipes.append(str(slot.First_Slot))
+            
+            # Create comments (UPDATED)
+            if non_compliant_pipes:
+                comments = f"Pipe {','.join(non_compliant_pipes)} did not follow compliance"
+            elif len(farm_slots) and str(farm_data.Farm_ID) in farms_with_readings:
+                comments = "All evaluated pipes compliant"
+            else:
+                comments = "No pipe data"
+            
+            results.append({
+                'Date_Range': f"{start_date} to {end_date}",
+                'Village': farm_data.Village,
+                'Farm_ID': farm_data.Farm_ID,
+                'Farmer_Name': farm_data.Farmer_Name,
+                'Group': farm_data.Group,
+                'Valid_Farm': '1' if (farm_slots['Readings'] > 0).any() else '0',  # NEW: Valid farm indicator
+                **pipe_columns,
+                'Comments': comments
+            })
+        
+        return pd.DataFrame(results)
+        
+    except Exception as e:
+        report.error(f"0 Error creating pipe readings table: {str(e)}")
+        return None
+
+def create_pipe_summary_table(master_df, water_df, farm_pipe_mapping, start_date, end_date, report=LOG,
+                              reading_store=None):
+    """Create pipe summary table from the compact reading store, one Reading_k column pair per reading
+
+    reading_store is the already built store of water_df; it is windowed
+    instead of packing water_df again.
+    """
+    try:
+        store = _window_store(water_df, start_date, end_date, reading_store)
+        slots = timeseries.assigned_slots(master_df, store)
+        readings = slots['Readings'].to_numpy()
+        
+        # Farm is valid when at least one of its pipes has ≥1 reading
+        farm_valid = slots.groupby('Farm_Position')['Readings'].transform('max').to_numpy() > 0
+        
+        # 1/0 compliance per pipe, "No Data" without readings
+        compliant = timeseries.series_compliant(store)
+        compliance_status = np.full(len(slots), 'No Data', dtype=object)
+        has_data = readings > 0
+        compliance_status[has_data] = compliant[slots['Series'].to_numpy()[has_data]].astype(int).tolist()
+        
+        summary = pd.DataFrame({
+            'Farm_ID': master_df['Farm_ID'].to_numpy()[slots['Farm_Position'].to_numpy()],
+            'Pipe_ID': slots['Pipe_ID'].to_numpy(),
+            'Farm_Valid': np.where(farm_valid, '1', '0'),
+            'Valid_pipe': np.where(has_data, '1', '0'),
+            'Farmer_Name': master_df['Farmer_Name'].to_numpy()[slots['Farm_Position'].to_numpy()],
+            'Group': master_df['Group'].to_numpy()[slots['Farm_Position'].to_numpy()],
+            'Abiding_AWD_method': compliance_status,
+            **timeseries.reading_columns(store, slots['Series'].to_numpy()),
+            'Total_number_of_readings': readings
+        })
+        return summary
+        
+    except Exception as e:
+        report.error(f"0 Error creating pipe summary table: {str(e)}")
+        return None
+
+def create_village_summary(results_df, report=LOG):
+    """Create village-wise summary"""
+    try:
+        return summary_cube.village_summary(summary_cube.build_summary_cube(results_df))
+    except Exception as e:
+        report.error(f"0 Error creating village summary: {str(e)}")
+        return None
+
+def create_group_summary(results_df, report=LOG):
+    """Create group-wise summary (numeric values, formatted by the caller)"""
+    try:
+        return summary_cube.group_summary(summary_cube.build_summary_cube(results_df))
+    except Exception as e:
+        report.error(f"0 Error creating group summary: {str(e)}")
+        return None
+
+def create_payment_summary(results_df, report=LOG):
+    """Create payment summary table"""
+    try:
+        return payments.payment_summary(results_df)
+        
+    except Exception as e:
+        report.error(f"0 Error creating payment summary: {str(e)}")
+        return None
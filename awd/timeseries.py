@@ -0,0 +1,177 @@
+"""Compact per-pipe reading time series
+
+Readings are packed per (Farm_ID, Pipe_ID) series in CSR layout: readings
+of series i live in [offsets[i], offsets[i + 1]) of two int16 arrays, day
+offsets from the store's epoch and water levels in 0.1 mm. Within a
+series readings are in time order. Five bytes per reading replace a
+Timestamp, two id strings and a float in the water frame.
+
+Levels are stored floored to 0.1 mm, with a flag for readings that had a
+remainder below that. Whole millimetres (level // 10) are then what int()
+gives the tables, and the threshold tests run on the ceiling (level + flag),
+which is at or below 2000 / 1000 exactly when the reading is at or below
+200 / 100 mm, so fractional readings never flip compliance.
+"""
+import numpy as np
+import pandas as pd
+
+from awd.arrow import to_numpy_datetimes
+
+LEVEL_SCALE = 10  # stored level units per mm
+MAX_LEVEL_MM = 200  # every reading must be at or below this
+WET_LEVEL_MM = 100  # with two or more readings, at least one at or below this
+
+def build_reading_store(water_df, start_date=None, end_date=None):
+    """Pack readings (optionally limited to [start_date, end_date]) into the compact store dict"""
+    timestamps = to_numpy_datetimes(water_df['Date']).to_numpy()
+    days = timestamps.astype('datetime64[D]')
+    keep = np.ones(len(water_df), dtype=bool)
+    if start_date is not None:
+        keep &= days >= np.datetime64(start_date, 'D')
+    if end_date is not None:
+        keep &= days <= np.datetime64(end_date, 'D')
+
+    farm_codes, farm_ids = pd.factorize(water_df['Farm_ID'].astype(str).to_numpy()[keep])
+    pipe_codes, pipe_ids = pd.factorize(water_df['Pipe_ID'].astype(str).to_numpy()[keep])
+    n_pipes = max(len(pipe_ids), 1)
+    series, series_keys = pd.factorize(farm_codes.astype(np.int64) * n_pipes + pipe_codes)
+
+    # Group by series, time order within each series
+    timestamps = timestamps[keep]
+    order = np.lexsort((timestamps, series))
+    days = days[keep][order]
+    epoch = days.min() if len(days) else np.datetime64(start_date or '1970-01-01', 'D')
+    tenths = water_df['Water_Level_mm'].to_numpy(dtype=float)[keep][order] * LEVEL_SCALE
+    floored = np.floor(tenths)
+
+    counts = np.bincount(series, minlength=len(series_keys))
+    offsets = np.zeros(len(series_keys) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+
+    return {
+        'epoch': epoch,
+        'farm_ids': np.asarray(farm_ids, dtype=object)[series_keys // n_pipes],
+        'pipe_ids': np.asarray(pipe_ids, dtype=object)[series_keys % n_pipes],
+        'offsets': offsets,
+        'day': (days - epoch).astype(np.int16),
+        'level': floored.astype(np.int16),
+        'level_rem': floored < tenths
+    }
+
+def window_store(store, start_date=None, end_date=None):
+    """The readings of store in [start_date, end_date], without going back to the water frame
+
+    Series without readings in the window are dropped; the epoch is kept.
+    """
+    days = reading_dates(store)
+    keep = np.ones(len(days), dtype=bool)
+    if start_date is not None:
+        keep &= days >= np.datetime64(start_date, 'D')
+    if end_date is not None:
+        keep &= days <= np.datetime64(end_date, 'D')
+
+    series = np.repeat(np.arange(len(store['offsets']) - 1), series_counts(store))
+    counts = np.bincount(series[keep], minlength=len(store['offsets']) - 1)
+    has_readings = counts > 0
+    offsets = np.zeros(int(has_readings.sum()) + 1, dtype=np.int64)
+    np.cumsum(counts[has_readings], out=offsets[1:])
+    return {
+        'epoch': store['epoch'],
+        'farm_ids': store['farm_ids'][has_readings],
+        'pipe_ids': store['pipe_ids'][has_readings],
+        'offsets': offsets,
+        'day': store['day'][keep],
+        'level': store['level'][keep],
+        'level_rem': store['level_rem'][keep]
+    }
+
+def memory_bytes(store):
+    """Bytes held by the per-reading and per-series arrays"""
+    return int(store['offsets'].nbytes + store['day'].nbytes + store['level'].nbytes + store['level_rem'].nbytes +
+               sum(len(str(value)) for value in store['farm_ids']) + sum(len(str(value)) for value in store['pipe_ids']))
+
+def series_counts(store):
+    return np.diff(store['offsets'])
+
+def _counts_for(store, series):
+    """Reading counts for series indices, 0 where the index is -1"""
+    counts = series_counts(store)
+    if not len(counts):
+        return np.zeros(len(series), dtype=np.int64)
+    return np.where(series >= 0, counts[np.clip(series, 0, None)], 0)
+
+def series_compliant(store):
+    """Pipe compliance per series (same rule as analyze_pipe_compliance)"""
+    counts = series_counts(store)
+    if not len(counts):
+        return np.zeros(0, dtype=bool)
+    starts = store['offsets'][:-1]
+    level_ceiling = store['level'] + store['level_rem']
+    max_level = np.maximum.reduceat(level_ceiling, starts)
+    min_level = np.minimum.reduceat(level_ceiling, starts)
+    return ((counts >= 1) & (max_level <= MAX_LEVEL_MM * LEVEL_SCALE) &
+            ((counts == 1) | (min_level <= WET_LEVEL_MM * LEVEL_SCALE)))
+
+def reading_dates(store):
+    """datetime64[D] date of every stored reading"""
+    return store['epoch'] + store['day'].astype('timedelta64[D]')
+
+def reading_whole_mm(store):
+    """Levels truncated to whole millimetres, as the tables display them (int() of the reading)"""
+    return store['level'] // LEVEL_SCALE
+
+def assigned_slots(master_df, store):
+    """One row per assigned pipe slot in master order, linked to its series
+
+    Columns: Farm_Position, Slot (1-based position in Pipe_Codes),
+    First_Slot (first slot holding the same pipe), Farm_ID, Pipe_ID,
+    Series (-1 without readings) and Readings.
+    """
+    pipe_counts = master_df['Pipe_Codes'].map(len).to_numpy(dtype=np.int64)
+    farm_position = np.repeat(np.arange(len(master_df)), pipe_counts)
+    slots = pd.DataFrame({
+        'Farm_Position': farm_position,
+        'Slot': np.arange(len(farm_position)) - np.repeat(np.cumsum(pipe_counts) - pipe_counts, pipe_counts) + 1,
+        'Farm_ID': np.repeat(master_df['Farm_ID'].astype(str).to_numpy(), pipe_counts),
+        'Pipe_ID': [pipe_id for pipe_codes in master_df['Pipe_Codes'] for pipe_id in pipe_codes]
+    })
+    slots['First_Slot'] = slots.groupby(['Farm_Position', 'Pipe_ID'])['Slot'].transform('min')
+
+    series_index = pd.Series(np.arange(len(store['farm_ids'])),
+                             index=pd.MultiIndex.from_arrays([store['farm_ids'], store['pipe_ids']]))
+    slots['Series'] = series_index.reindex(pd.MultiIndex.from_frame(slots[['Farm_ID', 'Pipe_ID']])) \
+        .fillna(-1).astype(int).to_numpy()
+    slots['Readings'] = _counts_for(store, slots['Series'].to_numpy())
+    return slots
+
+def reading_columns(store, series, min_width=6):
+    """Wide Reading_k_mm / Reading_k_Date columns for the given series (-1 for none), every reading included
+
+    Width is the longest series (at least min_width); cells past a series'
+    last reading are empty strings.
+    """
+    series = np.asarray(series)
+    counts = _counts_for(store, series)
+    starts = store['offsets'][np.clip(series, 0, None)]
+    width = max(min_width, int(counts.max()) if len(counts) else 0)
+    level_mm = reading_whole_mm(store)
+    date_labels = pd.DatetimeIndex(reading_dates(store)).strftime('%d/%m/%Y').to_numpy()
+
+    columns = {}
+    for k in range(width):
+        has_reading = counts > k
+        positions = starts[has_reading] + k
+        mm = np.full(len(series), '', dtype=object)
+        dates = np.full(len(series), '', dtype=object)
+        mm[has_reading] = [int(value) for value in level_mm[positions]]
+        dates[has_reading] = date_labels[positions]
+        columns[f'Reading_{k + 1}_mm'] = mm
+        columns[f'Reading_{k + 1}_Date'] = dates
+    return columns
+
+def joined_readings(store, fmt_date='%d/%m'):
+    """Per series '(dd/mm, Nmm), ...' string of every reading, as in the pipe readings table"""
+    date_labels = pd.DatetimeIndex(reading_dates(store)).strftime(fmt_date).to_numpy()
+    tokens = [f"({date_label}, {level}mm)" for date_label, level in zip(date_labels, reading_whole_mm(store))]
+    offsets = store['offsets']
+    return [", ".join(tokens[offsets[i]:offsets[i + 1]]) for i in range(len(offsets) - 1)]
@@ -0,0 +1 @@
+"""Streamlit layer of the dashboard: secrets, process-wide caches and per-session analysis state"""
@@ -0,0 +1,113 @@
+"""Process-wide resources and per-dataset derived stores, cached across reruns and sessions"""
+import io
+
+import streamlit as st
+
+from awd import data_quality, jobs, mapped_readings, search, snapshots, sql_store, summary_cube, timeseries
+from awd.analysis import build_standard_reports
+from awd.cleaning import clean_water_data, process_uploaded_file
+from awd.config import DEFAULT_PROGRAM
+from awd.programs import MB, DatasetCache, ProgramRegistry
+from awd.rolling_compliance import analyze_cumulative_compliance
+from awd.scheduler import ReportScheduler
+from awd.shared_cache import SharedMasterCache
+
+@st.cache_resource
+def get_shared_master_cache(persist_dir, program=DEFAULT_PROGRAM):
+    """One cleaned-master cache per program and server process, shared by every session of the program"""
+    return SharedMasterCache(persist_dir or None)
+
+@st.cache_resource
+def get_job_registry():
+    """Background worker pool shared by all sessions"""
+    return jobs.JobRegistry()
+
+@st.cache_resource
+def get_report_scheduler(snapshot_dir, daily_at, program=DEFAULT_PROGRAM):
+    """One snapshot store and precompute scheduler per program and server process"""
+    return ReportScheduler(snapshots.SnapshotStore(snapshot_dir), build_standard_reports, daily_at or None)
+
+@st.cache_resource
+def get_program_registry(total_budget_mb):
+    """Memory accounting and eviction across the programs this process serves"""
+    return ProgramRegistry(total_budget_mb * MB)
+
+@st.cache_resource
+def get_program_datasets(program=DEFAULT_PROGRAM):
+    """One program's cleaned uploads and derived stores, shared by its sessions and counted against its budget"""
+    return DatasetCache()
+
+def clean_water_upload(file_name, file_bytes, farm_pipe_mapping, use_arrow):
+    """Parse and clean an uploaded water file; returns (water_df, rejections), (None, None) on failure"""
+    upload = io.BytesIO(file_bytes)
+    upload.name = file_name
+    raw_water = process_uploaded_file(upload, 'water', report=st)
+    if raw_water is None:
+        return None, None
+    return clean_water_data(raw_water, farm_pipe_mapping, use_arrow, report=st)
+
+def load_water_upload(datasets, water_key, file_name, file_bytes, farm_pipe_mapping, use_arrow):
+    """Parse and clean an uploaded water file once per water_key (file content, master data, dtype backend)
+
+    The file bytes and pipe mapping are identified by water_key instead of
+    being hashed on every rerun.
+    """
+    def build():
+        with st.spinner("Cleaning water data..."):
+            return clean_water_upload(file_name, file_bytes, farm_pipe_mapping, use_arrow)
+    return datasets.get_or_build(('water', water_key), build)
+
+@st.cache_resource
+def get_mapped_reading_store(reading_map_dir):
+    """Memory-mapped water datasets shared by every worker process using reading_map_dir"""
+    return mapped_readings.MappedReadingStore(reading_map_dir)
+
+def load_mapped_water_upload(mapped_store, water_key, file_name, file_bytes, farm_pipe_mapping, use_arrow):
+    """Map the cleaned upload published by any worker, cleaning and publishing it first when there is none
+
+    Nothing is kept in this process's caches: every worker maps the same
+    files. Returns the mapped dataset, or None when cleaning fails.
+    """
+    mapped = mapped_store.open(water_key)
+    if mapped is None:
+        with st.spinner("Cleaning water data..."):
+            water_df, rejections = clean_water_upload(file_name, file_bytes, farm_pipe_mapping, use_arrow)
+        if water_df is None:
+            return None
+        try:
+            mapped_store.publish(water_key, water_df, rejections)
+        except OSError as e:
+            # Another worker's version may still be current; open whatever is published
+            st.warning(f"⚠️ Could not publish the memory-mapped water data: {str(e)}")
+        mapped = mapped_store.open(water_key)
+    return mapped
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def save_water_dataset(water_key, db_path, _water_df):
+    """Persist a cleaned water upload to the analytics store once; returns its dataset_id"""
+    return sql_store.save_readings(db_path, _water_df)
+
+def get_reading_store(datasets, water_key, water_df):
+    """Compact per-pipe series of all clean readings of the water dataset water_key"""
+    return datasets.get_or_build(('reading_store', water_key), lambda: timeseries.build_reading_store(water_df))
+
+def get_data_quality_store(datasets, water_key, water_df, rejection_report=None):
+    """Precompute data-quality tables once per cleaned water dataset"""
+    return datasets.get_or_build(('data_quality', water_key),
+                                 lambda: data_quality.build_data_quality_store(water_df, rejection_report))
+
+def get_summary_cube(datasets, job_id, results_df, weekly_df=None):
+    """Summary cube over the analyzed farms' results of one job; village/group/week summaries are roll-ups of it"""
+    return datasets.get_or_build(('summary_cube', job_id), lambda: summary_cube.build_summary_cube(results_df, weekly_df))
+
+# Per-farm views of one analysis: small, bounded by max_entries and keyed by program so programs never share them
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def get_farm_search_index(program, results_df, pipe_codes):
+    """Search index over the result farms, shared read-only across reruns and sessions"""
+    return search.FarmSearchIndex(results_df, pipe_codes)
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def get_cumulative_compliance(program, farm_fingerprints, start_date, end_date, rolling_weeks, _master_df, _water_df):
+    """Cumulative and rolling compliance of the analyzed farms, keyed by their per-farm fingerprints"""
+    return analyze_cumulative_compliance(_master_df, _water_df, start_date, end_date, rolling_weeks)
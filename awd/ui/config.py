@@ -0,0 +1,70 @@
+"""App config, credentials and the master sheet, read through Streamlit secrets and caches"""
+import streamlit as st
+
+from awd import sheets
+from awd.config import DEFAULT_APP_CONFIG, DEFAULT_PROGRAM, DEFAULT_TOTAL_MEMORY_BUDGET_MB, parse_app_config, parse_programs
+
+@st.cache_data(ttl=300)  # Cache for 5 minutes
+def connect_to_google_sheets(credentials_dict, sheet_url, worksheet_name=None):
+    """Connect to Google Sheets and return DataFrame"""
+    try:
+        df = sheets.read_sheet(credentials_dict, sheet_url, worksheet_name)
+        st.success(f"1 Connected to Google Sheets: {len(df)} rows loaded")
+        return df
+        
+    except Exception as e:
+        st.error(f"0 Error connecting to Google Sheets: {str(e)}")
+        return None
+
+def get_credentials_from_secrets():
+    """Get Google Sheets credentials from Streamlit secrets"""
+    try:
+        return sheets.credentials_from_secrets(st.secrets["gcp_service_account"])
+        
+    except KeyError as e:
+        st.error(f"0 Missing secret: {str(e)}")
+        st.error("Please check your .streamlit/secrets.toml file configuration")
+        return None
+    except Exception as e:
+        st.error(f"0 Error loading secrets: {str(e)}")
+        return None
+
+def get_app_config_from_secrets():
+    """Get app configuration from Streamlit secrets"""
+    try:
+        return parse_app_config(st.secrets["app_config"])
+    except KeyError:
+        # Return defaults if not in secrets
+        return dict(DEFAULT_APP_CONFIG)
+    except Exception as e:
+        st.error(f"0 Error loading app config: {str(e)}")
+        return dict(DEFAULT_APP_CONFIG)
+
+def get_program_configs_from_secrets():
+    """{program: app config} from the [programs.*] sections, or one default program from [app_config]"""
+    if "programs" not in st.secrets:
+        return {DEFAULT_PROGRAM: get_app_config_from_secrets()}
+    try:
+        program_configs = parse_programs(st.secrets["programs"])
+    except Exception as e:
+        st.error(f"0 Error loading program config: {str(e)}")
+        return {DEFAULT_PROGRAM: dict(DEFAULT_APP_CONFIG)}
+    return program_configs or {DEFAULT_PROGRAM: dict(DEFAULT_APP_CONFIG)}
+
+def get_total_memory_budget_mb():
+    """Memory budget shared by all programs of this server process (0 disables it)"""
+    return float(st.secrets.get("total_memory_budget_mb", DEFAULT_TOTAL_MEMORY_BUDGET_MB))
+
+def get_session_settings():
+    """(program configs, credentials_dict) read from secrets once per session; credentials are None on failure
+
+    A failed read is not kept, so fixed secrets are picked up on the next rerun.
+    """
+    settings = st.session_state.get('settings')
+    if settings is None:
+        program_configs = get_program_configs_from_secrets()
+        credentials_dict = get_credentials_from_secrets()
+        if credentials_dict is None:
+            return program_configs, None
+        settings = st.session_state['settings'] = (program_configs, credentials_dict)
+    return settings
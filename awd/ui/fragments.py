@@ -0,0 +1,212 @@
+"""Page sections that rerun on their own when their widgets change
+
+Each function is a streamlit fragment: interacting with the chart pickers,
+farm search, rolling window or SQL panel reruns only that section, not the
+whole page with its data loading and analysis. The filter fragment returns
+its current values on full runs, which is when the analysis reads them. The
+progress fragment reruns on a timer while the analysis job is active.
+"""
+from functools import partial
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from awd import charts, jobs, sql_store, timeseries
+from awd.rolling_compliance import DEFAULT_ROLLING_WEEKS
+from awd.ui.caches import get_cumulative_compliance, get_farm_search_index
+
+@st.fragment
+def analysis_filters(min_date, max_date, available_groups, available_villages):
+    """Date range, group and village filters; returns (date_range, selected_groups, selected_villages)"""
+    st.header("🔍 Analysis Filters")
+
+    date_range = st.date_input(
+        "📅 Analysis Date Range (Start date = Day 1)",
+        value=(min_date, max_date),
+        min_value=min_date,
+        max_value=max_date,
+        help="Start date will be treated as Day 1 of the analysis period"
+    )
+
+    # Group filter
+    selected_groups = st.multiselect(
+        "👥 Groups",
+        available_groups,
+        default=available_groups
+    )
+
+    # Village filter
+    selected_villages = st.multiselect(
+        "🏘️ Villages",
+        available_villages,
+        default=available_villages
+    )
+    return date_range, selected_groups, selected_villages
+
+@st.fragment(run_every=jobs.POLL_INTERVAL_S)
+def analysis_progress_section(job_registry, job_id, partial_columns):
+    """Progress and partial farm rows of the running analysis job; reruns the whole page once the job leaves ACTIVE_STATES"""
+    job = job_registry.get(job_id)
+    if job is None or job.status not in jobs.ACTIVE_STATES:
+        st.rerun()
+    st.info(f"⏳ {job.job_id}: {job.phase or 'queued'} {job.message} ({job.elapsed_s:.0f}s)")
+    st.progress(job.fraction)
+    if st.button("⛔ Cancel Analysis"):
+        job_registry.cancel(job.job_id)
+        st.rerun()
+    partial_results = job.partials('results')
+    if partial_results:
+        partial_df = pd.concat(partial_results, ignore_index=True)
+        st.subheader(f"📋 Partial Results ({len(partial_df)} farms so far)")
+        st.dataframe(partial_df[partial_columns], use_container_width=True, height=300)
+
+@st.fragment
+def cumulative_compliance_section(program, farm_fingerprints, analysis_master_df, analysis_water_df, start_date, end_date):
+    """Season-to-date and rolling compliance; the rolling window only reruns this section"""
+    rolling_weeks = st.number_input(
+        "📆 Rolling Window (weeks)",
+        min_value=1,
+        max_value=12,
+        value=DEFAULT_ROLLING_WEEKS,
+        help="Weekly breakdown also shows compliance over the trailing N weeks"
+    )
+    st.subheader(f"📈 Cumulative & Rolling ({int(rolling_weeks)}-week) Compliance")
+    cumulative_results = get_cumulative_compliance(
+        program, farm_fingerprints, start_date, end_date, int(rolling_weeks), analysis_master_df, analysis_water_df
+    )
+    # Average over farms with data in each window
+    cumulative_trend = pd.DataFrame({
+        'Cumulative': cumulative_results[cumulative_results['Cumulative_Valid_Pipes'] > 0]
+            .groupby('Week')['Cumulative_Proportion_Passing'].mean(),
+        'Rolling': cumulative_results[cumulative_results['Rolling_Valid_Pipes'] > 0]
+            .groupby('Week')['Rolling_Proportion_Passing'].mean(),
+        'Weekly': cumulative_results[cumulative_results['Week_Valid_Pipes'] > 0]
+            .groupby('Week')['Week_Proportion_Passing'].mean()
+    }) * 100
+    st.line_chart(cumulative_trend, use_container_width=True)
+
+    cumulative_display = cumulative_results.copy()
+    for prefix in ['Week', 'Cumulative', 'Rolling']:
+        column = f'{prefix}_Proportion_Passing'
+        cumulative_display[column] = (cumulative_display[column] * 100).round(1).astype(str) + '%'
+    st.dataframe(cumulative_display, use_container_width=True, height=400)
+
+    st.download_button(
+        "📥 Download Cumulative & Rolling Compliance",
+        partial(cumulative_results.to_csv, index=False),
+        f"awd_cumulative_compliance_{start_date}_to_{end_date}.csv",
+        "text/csv",
+        use_container_width=True,
+        on_click="ignore"
+    )
+
+@st.fragment
+def level_charts_section(analysis_master_df, reading_store, start_date, end_date):
+    """Per-pipe water level charts for one farm or village"""
+    st.subheader("💧 Per-Pipe Water Levels")
+    if not charts.PLOTLY_AVAILABLE:
+        st.info("Install plotly to see the water level charts")
+    else:
+        chart_store = timeseries.window_store(reading_store, start_date, end_date)
+        chart_scope = st.radio("Chart by", ["Farm", "Village"], horizontal=True, key="level_chart_scope")
+        series_farms = pd.Series(chart_store['farm_ids'], dtype=object)
+        if chart_scope == "Farm":
+            charted_farms = set(chart_store['farm_ids'])
+            farm_options = [farm_id for farm_id in analysis_master_df['Farm_ID'].astype(str)
+                            if farm_id in charted_farms]
+            chart_target = st.selectbox("Farm", farm_options, key="level_chart_farm")
+            chart_series = np.flatnonzero(series_farms == chart_target)
+            chart_labels = [str(pipe_id) for pipe_id in chart_store['pipe_ids'][chart_series]]
+        else:
+            village_options = sorted(analysis_master_df['Village'].dropna().astype(str).unique())
+            chart_target = st.selectbox("Village", village_options, key="level_chart_village")
+            village_farms = analysis_master_df.loc[analysis_master_df['Village'].astype(str) == chart_target, 'Farm_ID'].astype(str)
+            chart_series = np.flatnonzero(series_farms.isin(set(village_farms)))
+            chart_labels = [f"{farm_id} · {pipe_id}" for farm_id, pipe_id in
+                            zip(chart_store['farm_ids'][chart_series], chart_store['pipe_ids'][chart_series])]
+
+        if chart_target is None or not len(chart_series):
+            st.warning("No readings to chart for the selected filters")
+        else:
+            level_fig, points_plotted, points_total = charts.level_figure(
+                chart_store, chart_series, chart_labels, f"{chart_scope} {chart_target}: water level by pipe"
+            )
+            st.plotly_chart(level_fig, use_container_width=True)
+            st.caption(f"{len(chart_series)} pipes · showing {points_plotted:,} of {points_total:,} readings "
+                       f"(LTTB downsampled to at most {charts.DEFAULT_MAX_POINTS:,} points)")
+
+@st.fragment
+def farm_search_section(program, results_df, analysis_master_df):
+    """Farm lookup by ID, farmer, village or pipe code with the selected farm's details"""
+    st.subheader("🔎 Search Specific Farm")
+    farm_index = get_farm_search_index(
+        program, results_df, dict(zip(analysis_master_df['Farm_ID'].astype(str), analysis_master_df['Pipe_Codes']))
+    )
+    search_query = st.text_input(
+        "Search by Farm ID, farmer name, village or pipe code:",
+        key="farm_search_query"
+    )
+    search_matches = farm_index.search(search_query) if search_query else []
+    if search_query and not search_matches:
+        st.warning(f"No farms match '{search_query}'")
+    search_farm = st.selectbox(
+        "Select a farm to view details:",
+        options=[''] + search_matches,
+        format_func=lambda farm_id: farm_index.label(farm_id) if farm_id else '',
+        index=0
+    )
+
+    if search_farm:
+        farm_detail = farm_index.record(search_farm)
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.info(f"""
+            **Farm Details:**
+            - **ID:** {farm_detail['Farm_ID']}
+            - **Farmer:** {farm_detail['Farmer_Name']}
+            - **Village:** {farm_detail['Village']}
+            - **Group:** {farm_detail['Group']}
+            - **Total Acres:** {farm_detail['Total_Incentive_Acres']}
+            """)
+
+        with col2:
+            st.info(f"""
+            **Performance:**
+            - **Compliance Rate:** {farm_detail['Farm_Proportion_Passing']:.1%}
+            - **Valid Pipes:** {farm_detail['Valid_Pipes_Count']}/{farm_detail['Total_Assigned_Pipes']}
+            - **Pipes Passing:** {farm_detail['Pipes_Passing']}
+            - **Eligible Acres:** {farm_detail['Eligible_Acres']}
+            - **Final Incentive (₹):** {farm_detail['Final_Incentive_Amount']:,.0f}
+            """)
+
+        st.subheader("📊 Pipe Reading Details")
+        st.code(farm_detail['Pipes_Read'], language=None)
+
+        if farm_detail['Non_Compliant_Pipe_IDs'] != 'None':
+            st.error(f"⚠️ Non-compliant pipes: {farm_detail['Non_Compliant_Pipe_IDs']}")
+        else:
+            st.success("1 All valid pipes are compliant!")
+
+@st.fragment
+def sql_panel(analytics_db_path):
+    """Stored runs and read-only SQL queries against the analytics store"""
+    try:
+        stored_runs = sql_store.list_runs(analytics_db_path)
+        st.write(f"**Stored analysis runs:** {len(stored_runs)}")
+        if not stored_runs.empty:
+            st.dataframe(stored_runs, use_container_width=True)
+
+        sql_text = st.text_area(
+            "Read-only SQL query",
+            value='SELECT Village, COUNT(*) AS Farms, SUM(Final_Incentive_Amount) AS Incentive\n'
+                  'FROM farm_results GROUP BY Village ORDER BY Village',
+            help="Tables: datasets, readings, master, runs, farm_results, payment_runs, payment_rows. "
+                 "Summaries of the current run above come from its in-memory summary cube; "
+                 "query here to summarize across stored runs."
+        )
+        if st.button("▶️ Run Query"):
+            st.dataframe(sql_store.query(analytics_db_path, sql_text, read_only=True), use_container_width=True)
+    except Exception as e:
+        st.error(f"0 Query failed: {str(e)}")
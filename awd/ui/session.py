@@ -0,0 +1,101 @@
+"""Per-session analysis state: the selected program, the uploaded file, the table cache and the background analysis job"""
+import hashlib
+
+import streamlit as st
+
+from awd import incremental, pipe_masks, snapshots
+from awd.analysis import run_analysis_job, run_profiled_analysis_job, seed_table_cache_from_snapshot
+from awd.incremental import compute_farm_fingerprints, select_farms
+
+# Session state that belongs to the program it was computed for
+PROGRAM_SESSION_KEYS = ['analysis_job', 'farm_table_cache']
+
+def select_program(program_configs):
+    """Program this session works on: ?program=<name> or the sidebar choice
+
+    Switching programs drops the previous program's analysis state.
+    """
+    programs = list(program_configs)
+    program = programs[0]
+    if len(programs) > 1:
+        if st.session_state.get('program_choice') not in programs:
+            requested = st.query_params.get('program')
+            st.session_state['program_choice'] = requested if requested in programs else programs[0]
+        program = st.sidebar.selectbox("🏢 Program", programs, key='program_choice')
+        st.query_params['program'] = program
+    if st.session_state.get('program') != program:
+        for key in PROGRAM_SESSION_KEYS:
+            st.session_state.pop(key, None)
+        st.session_state['program'] = program
+    return program
+
+def upload_content_key(uploaded_file):
+    """SHA-256 of an uploaded file's bytes, computed once per upload and kept for the session"""
+    content_keys = st.session_state.setdefault('upload_content_keys', {})
+    if uploaded_file.file_id not in content_keys:
+        content_keys[uploaded_file.file_id] = hashlib.sha256(uploaded_file.getvalue()).hexdigest()
+    return content_keys[uploaded_file.file_id]
+
+def get_incremental_farm_table(table_name, compute_fn, master_df, water_df, farm_pipe_mapping,
+                               start_date, end_date, fingerprints, order_keys=None, notify=st.info):
+    """incremental.get_incremental_farm_table over this session's table cache"""
+    return incremental.get_incremental_farm_table(
+        table_name, compute_fn, master_df, water_df, farm_pipe_mapping, start_date, end_date, fingerprints,
+        st.session_state.setdefault('farm_table_cache', {}), order_keys=order_keys, notify=notify
+    )
+
+def find_report_snapshot(report_scheduler, data_key, start_date, end_date):
+    """Latest snapshot for this data and date range, or None (also when snapshots are disabled)"""
+    if report_scheduler is None:
+        return None
+    snapshot = report_scheduler.store.load(snapshots.report_key(*data_key, start_date, end_date))
+    # Snapshots built before the engine emitted pipe masks are recomputed instead
+    if snapshot is None or not pipe_masks.has_pipe_masks(snapshot['tables']['results']):
+        return None
+    return snapshot
+
+def submit_analysis_job(job_registry, master_df, water_df, farm_pipe_mapping, start_date, end_date,
+                        selected_groups, selected_villages, data_key, snapshot=None, profile=False):
+    """Submit the analysis of the selected farms; returns the session's job record (None for an empty selection)
+
+    A profiled run starts from an empty table cache and no snapshot, so every farm is computed under the profiler.
+    """
+    # Push the group/village filters down: only the selected farms and their readings are analyzed
+    analysis_master_df, analysis_water_df, analysis_pipe_mapping = select_farms(
+        master_df, water_df, farm_pipe_mapping, selected_groups, selected_villages
+    )
+    if analysis_master_df.empty:
+        return None
+    
+    # A new run supersedes this session's previous job
+    previous_job = st.session_state.get('analysis_job')
+    if previous_job:
+        job_registry.cancel(previous_job['job_id'])
+    
+    if profile:
+        table_cache, snapshot = {}, None
+    else:
+        table_cache = st.session_state.setdefault('farm_table_cache', {})
+    if snapshot is not None:
+        seed_table_cache_from_snapshot(table_cache, snapshot, start_date, end_date)
+    
+    # Per-farm fingerprints let every table reuse cached rows for unchanged farms
+    farm_fingerprints = compute_farm_fingerprints(analysis_master_df, analysis_water_df)
+    job_id = job_registry.submit(
+        f"Compliance {start_date} to {end_date}", run_profiled_analysis_job if profile else run_analysis_job,
+        analysis_master_df, analysis_water_df, analysis_pipe_mapping, start_date, end_date,
+        farm_fingerprints, table_cache
+    )
+    st.session_state['analysis_job'] = {
+        'job_id': job_id,
+        'data_key': data_key,
+        'start_date': start_date,
+        'end_date': end_date,
+        'selected_groups': list(selected_groups),
+        'selected_villages': list(selected_villages),
+        'farm_fingerprints': farm_fingerprints,
+        'snapshot': snapshot['meta'] if snapshot else None,
+        'profile': profile,
+        'saved': False
+    }
+    return st.session_state['analysis_job']